@@ -0,0 +1,168 @@
+"""
+Admission control for the Emergency Voice API
+
+Each expensive stage (audio decoding, inference) sits behind a
+ConcurrencyLimiter: at most `max_concurrency` requests run the stage at once
+and at most `max_queue` more may wait for a slot. Anything beyond that is
+rejected immediately so the server can answer 503 instead of letting every
+accepted request slow down together. Waiting requests also give up as soon
+as their client deadline passes.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from metrics import registry
+
+QUEUE_DEPTH = registry.gauge(
+    'emergency_api_queue_depth',
+    'Requests waiting for a slot in each admission-controlled stage',
+    ('stage',)
+)
+IN_FLIGHT = registry.gauge(
+    'emergency_api_in_flight',
+    'Requests currently executing each admission-controlled stage',
+    ('stage',)
+)
+SHED_TOTAL = registry.counter(
+    'emergency_api_shed_total',
+    'Requests rejected by admission control by stage and reason',
+    ('stage', 'reason')
+)
+
+
+class AdmissionRejected(Exception):
+    """Base class for requests refused by admission control"""
+    status_code = 503
+    reason = 'rejected'
+
+    def __init__(self, stage: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Overloaded(AdmissionRejected):
+    """The stage's wait queue is full"""
+    status_code = 503
+    reason = 'queue_full'
+
+
+class DeadlineExceeded(AdmissionRejected):
+    """The client deadline passed before the work could start"""
+    status_code = 504
+    reason = 'deadline'
+
+
+class Ticket:
+    """
+    A held slot in a ConcurrencyLimiter; release() is idempotent
+    """
+
+    def __init__(self, limiter: 'ConcurrencyLimiter'):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ConcurrencyLimiter:
+    """
+    Bounded concurrency with a bounded wait queue in front of it
+    """
+
+    def __init__(self, stage: str, max_concurrency: int, max_queue: int,
+                 max_wait: float = 5.0, retry_after: float = 1.0):
+        self.stage = stage
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline: Optional[float] = None) -> Ticket:
+        """
+        Wait for a slot, raising Overloaded or DeadlineExceeded instead of
+        queueing unboundedly. `deadline` is a time.monotonic() timestamp.
+        """
+        now = time.monotonic()
+        if deadline is not None and deadline <= now:
+            SHED_TOTAL.inc(stage=self.stage, reason=DeadlineExceeded.reason)
+            raise DeadlineExceeded(self.stage, f'Deadline passed before {self.stage} started')
+
+        give_up_at = now + self.max_wait
+        if deadline is not None:
+            give_up_at = min(give_up_at, deadline)
+
+        with self._cond:
+            if self.active >= self.max_concurrency:
+                if self.waiting >= self.max_queue:
+                    SHED_TOTAL.inc(stage=self.stage, reason=Overloaded.reason)
+                    raise Overloaded(self.stage, f'{self.stage} queue is full', self.retry_after)
+                self.waiting += 1
+                QUEUE_DEPTH.set(self.waiting, stage=self.stage)
+                try:
+                    while self.active >= self.max_concurrency:
+                        remaining = give_up_at - time.monotonic()
+                        if remaining <= 0:
+                            if deadline is not None and time.monotonic() >= deadline:
+                                SHED_TOTAL.inc(stage=self.stage, reason=DeadlineExceeded.reason)
+                                raise DeadlineExceeded(self.stage, f'Deadline passed while waiting for {self.stage}')
+                            SHED_TOTAL.inc(stage=self.stage, reason='wait_timeout')
+                            raise Overloaded(self.stage, f'Timed out waiting for {self.stage}', self.retry_after)
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    QUEUE_DEPTH.set(self.waiting, stage=self.stage)
+            self.active += 1
+            IN_FLIGHT.set(self.active, stage=self.stage)
+        return Ticket(self)
+
+    def _release(self):
+        with self._cond:
+            self.active -= 1
+            IN_FLIGHT.set(self.active, stage=self.stage)
+            self._cond.notify()
+
+
+def parse_deadline(headers, default_timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Convert client deadline headers into a time.monotonic() deadline
+
+    `X-Request-Deadline` is an absolute Unix timestamp in seconds;
+    `X-Request-Timeout` is a relative budget in seconds. The earliest wins.
+    """
+    now_wall = time.time()
+    now_mono = time.monotonic()
+    candidates = []
+
+    absolute = headers.get('X-Request-Deadline')
+    if absolute:
+        try:
+            candidates.append(now_mono + (float(absolute) - now_wall))
+        except ValueError:
+            pass
+
+    relative = headers.get('X-Request-Timeout')
+    if relative:
+        try:
+            candidates.append(now_mono + float(relative))
+        except ValueError:
+            pass
+
+    if not candidates and default_timeout:
+        candidates.append(now_mono + default_timeout)
+
+    return min(candidates) if candidates else None
@@ -1,28 +1,125 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flask_cors import CORS
 import numpy as np
 import librosa
 import base64
 import io
+import json
 import tempfile
 import os
+import time
+import math
+import random
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from emergency_voice_model import EmergencyVoiceClassifier
+from metrics import (registry, time_stage, REQUEST_LATENCY, REQUESTS_TOTAL, ERRORS_TOTAL,
+                     REQUEST_BYTES, STAGE_PEAK_MEMORY, REQUEST_PEAK_MEMORY, PROCESS_RSS,
+                     PROMETHEUS_CONTENT_TYPE)
+from profiling import RequestProfile
+import memory_profiling
+from memory_profiling import PeakMeasurement
+from admission import ConcurrencyLimiter, AdmissionRejected, parse_deadline
+from model_reload import ModelReloader
+from batch_io import PCM_FRAMES_CONTENT_TYPE, iter_pcm_frames, decode_audio_bytes
+import signal
 import logging
+from structured_logging import configure_logging, set_sample_rates, log_event
 from werkzeug.utils import secure_filename
 import soundfile as sf
 from pydub import AudioSegment
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging: per-request INFO events are sampled (override with LOG_SAMPLE_RATES).
+# The JSON writer thread replaces the root handlers, so it is only installed by
+# configure_api_logging() when the server is started, never on import.
+DEFAULT_LOG_SAMPLE_RATES = {
+    'audio_input': 0.01,
+    'audio_processing': 0.01,
+    'prediction': 0.1
+}
+set_sample_rates(DEFAULT_LOG_SAMPLE_RATES)
 logger = logging.getLogger(__name__)
+INFO = logging.INFO
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Global model instance
+# Global model instance. Hot reloads replace this reference atomically;
+# request handlers read it once and keep using that instance.
 classifier = None
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUNDLE_PATH = os.path.join(MODEL_DIR, 'emergency_voice_model.evb')
+MODEL_PATH = os.environ.get('MODEL_PATH') or (
+    DEFAULT_BUNDLE_PATH if os.path.exists(DEFAULT_BUNDLE_PATH)
+    else os.path.join(MODEL_DIR, 'emergency_voice_model.h5')
+)
+
+# Hot reload: POST /admin/reload (requires ADMIN_TOKEN) or SIGHUP. A candidate
+# model must reach MIN_RELOAD_ACCURACY on REFERENCE_CLIPS_DIR before swapping in.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+REFERENCE_CLIPS_DIR = os.environ.get('REFERENCE_CLIPS_DIR')
+MIN_RELOAD_ACCURACY = float(os.environ.get('MIN_RELOAD_ACCURACY', '0.8'))
+
+# Profiling mode: clients opt in per request with the `X-Profile: 1` header or
+# `?profile=1`, but only when the server enables it. cProfile traces are taken
+# for a sampled fraction of profiled requests and written to PROFILE_DIR.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_CPROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_CPROFILE_SAMPLE_RATE', '0.0'))
+PROFILED_ENDPOINTS = ('/predict', '/predict_file')
+
+# Memory accounting: with MEMORY_PROFILING on, tracemalloc runs for the life
+# of the process and every stage's peak allocation goes into the
+# emergency_api_*_peak_memory_bytes histograms (and into `profile` stages).
+# Tracing slows allocation-heavy stages; enable it for sizing runs, not
+# permanently. Figures are exact with one request in flight at a time.
+MEMORY_PROFILING = os.environ.get('MEMORY_PROFILING', 'false').lower() in ('1', 'true', 'yes')
+if MEMORY_PROFILING:
+    memory_profiling.start_tracing()
+
+# Admission control: bounded concurrency and wait queues in front of audio
+# decoding and inference. Requests beyond the queue get a fast 503 with
+# Retry-After; requests whose client deadline has passed are dropped with 504.
+CPU_COUNT = os.cpu_count() or 1
+DECODE_LIMITER = ConcurrencyLimiter(
+    'decode',
+    max_concurrency=int(os.environ.get('DECODE_CONCURRENCY', CPU_COUNT * 2)),
+    max_queue=int(os.environ.get('DECODE_QUEUE_SIZE', CPU_COUNT * 4)),
+    max_wait=float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', '5.0')),
+    retry_after=float(os.environ.get('RETRY_AFTER_SECONDS', '1'))
+)
+INFERENCE_LIMITER = ConcurrencyLimiter(
+    'inference',
+    max_concurrency=int(os.environ.get('INFERENCE_CONCURRENCY', CPU_COUNT)),
+    max_queue=int(os.environ.get('INFERENCE_QUEUE_SIZE', CPU_COUNT * 2)),
+    max_wait=float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', '5.0')),
+    retry_after=float(os.environ.get('RETRY_AFTER_SECONDS', '1'))
+)
+DEFAULT_REQUEST_TIMEOUT = float(os.environ.get('DEFAULT_REQUEST_TIMEOUT_SECONDS', '0')) or None
+ADMITTED_ENDPOINTS = ('/predict', '/predict_file', '/predict_batch', '/predict_progressive')
+
+# Batch prediction: clips are decoded on a shared thread pool and scored in
+# chunks of BATCH_CHUNK_SIZE (one batched feature extraction and one model
+# call per chunk); results stream back as NDJSON in input order.
+BATCH_MAX_CLIPS = int(os.environ.get('BATCH_MAX_CLIPS', '64'))
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '16'))
+BATCH_DECODE_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get('BATCH_DECODE_WORKERS', CPU_COUNT)),
+                                       thread_name_prefix='batch-decode')
+
+# /predict_file?mode=timeline: default seconds between window starts
+TIMELINE_HOP_SECONDS = float(os.environ.get('TIMELINE_HOP_SECONDS', '1.5'))
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '5000'))
+
+def configure_api_logging():
+    """
+    Route all logging through the background JSON writer (server entry points only)
+    """
+    configure_logging(level=logging.INFO, sample_rates=DEFAULT_LOG_SAMPLE_RATES)
 
 def initialize_model():
     """
@@ -30,23 +127,155 @@ def initialize_model():
     """
     global classifier
     try:
-        classifier = EmergencyVoiceClassifier('emergency_voice_model.h5')
-        classifier.load_model()
-        logger.info("Model loaded successfully")
+        model_dir = os.path.dirname(os.path.abspath(MODEL_PATH))
+        candidate = EmergencyVoiceClassifier(
+            MODEL_PATH,
+            scaler_path=os.path.join(model_dir, 'scaler.pkl'),
+            label_encoder_path=os.path.join(model_dir, 'label_encoder.pkl')
+        )
+        candidate.load_model()
+        try:
+            stages = candidate.load_prefix_models()
+            if stages:
+                logger.info("Prefix models for progressive prediction: %s", stages)
+        except Exception as e:
+            logger.warning("Prefix models not loaded, progressive prediction uses the full model only: %s", e)
+        classifier = candidate
+        logger.info("Model loaded successfully (version %s)", classifier.model_version)
         return True
     except Exception as e:
-        logger.error(f"Failed to load model: {e}")
+        logger.error("Failed to load model: %s", e)
+        return False
+
+def swap_classifier(new_classifier):
+    """
+    Atomically replace the classifier used by new requests
+    """
+    global classifier
+    classifier = new_classifier
+
+model_reloader = ModelReloader(swap_classifier, REFERENCE_CLIPS_DIR, MIN_RELOAD_ACCURACY)
+
+def install_reload_signal_handler():
+    """
+    Reload the model from MODEL_PATH on SIGHUP (main thread only, POSIX only)
+    """
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: model_reloader.start(MODEL_PATH))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if memory_profiling.is_tracing():
+        g.request_memory = PeakMeasurement().start()
+    if PROFILING_ENABLED and request.path in PROFILED_ENDPOINTS and _profiling_requested():
+        g.profile = RequestProfile(request.path, PROFILE_DIR)
+        if random.random() < PROFILE_CPROFILE_SAMPLE_RATE:
+            g.profile.start_cprofile()
+
+@app.before_request
+def admit_request():
+    """
+    Reserve a decode slot before the request body is read
+    """
+    if request.path in ADMITTED_ENDPOINTS:
+        g.deadline = parse_deadline(request.headers, DEFAULT_REQUEST_TIMEOUT)
+        g.decode_ticket = DECODE_LIMITER.acquire(g.deadline)
+
+@app.teardown_request
+def release_admission(exc=None):
+    ticket = g.pop('decode_ticket', None)
+    if ticket is not None:
+        ticket.release()
+
+@app.teardown_request
+def record_request_memory(exc=None):
+    measurement = g.pop('request_memory', None)
+    if measurement is not None and measurement.stop() is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_PEAK_MEMORY.observe(measurement.peak_bytes, endpoint=endpoint)
+
+@contextmanager
+def inference_slot():
+    """
+    Hand the decode slot back and wait for an inference slot
+    """
+    ticket = g.pop('decode_ticket', None)
+    if ticket is not None:
+        ticket.release()
+    with INFERENCE_LIMITER.acquire(g.get('deadline')):
+        yield
+
+def _profiling_requested():
+    """
+    Check whether the client asked for a profile and is allowed to get one
+    """
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    if flag is None or flag.lower() not in ('1', 'true', 'yes'):
         return False
+    if PROFILING_TOKEN and request.headers.get('X-Profile-Token') != PROFILING_TOKEN:
+        return False
+    return True
+
+@contextmanager
+def timed_stage(stage):
+    """
+    Time a processing stage into the metrics histogram and, when the request
+    is being profiled, into its stage breakdown. With memory tracing on, the
+    stage's peak allocation is recorded too.
+    """
+    profile = g.get('profile')
+    if profile is not None:
+        # The profile stage measures memory itself
+        with time_stage(stage), profile.stage(stage):
+            yield
+        peak = profile.stages[-1].get('peak_memory_bytes')
+    else:
+        with time_stage(stage), PeakMeasurement() as memory:
+            yield
+        peak = memory.peak_bytes
+    if peak is not None:
+        STAGE_PEAK_MEMORY.observe(peak, stage=stage)
+
+def attach_profile(result):
+    """
+    Add the profile breakdown to a response payload if profiling is active
+    """
+    profile = g.pop('profile', None)
+    if profile is not None:
+        result['profile'] = profile.to_dict()
+    return result
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Record latency, status and error cause for every request
+    """
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(response.status_code))
+    if response.status_code >= 400:
+        ERRORS_TOTAL.inc(endpoint=endpoint, cause=g.get('error_cause', 'unknown'))
+    # Make sure a sampled cProfile trace never outlives its request
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.stop_cprofile()
+    return response
 
-def process_audio_data(audio_data, sample_rate=None):
+def process_audio_data(audio_data, sample_rate=None, clf=None):
     """
     Process audio data and extract features
     """
+    if clf is None:
+        clf = classifier
     try:
         if sample_rate is None:
-            sample_rate = classifier.sample_rate
+            sample_rate = clf.sample_rate
         
-        logger.info(f"Processing audio data: shape={audio_data.shape}, sample_rate={sample_rate}Hz")
+        log_event(logger, INFO, 'audio_processing', "Processing audio data: shape=%s, sample_rate=%sHz",
+                  audio_data.shape, sample_rate)
         
         # Check if audio data is valid
         if audio_data is None or len(audio_data) == 0:
@@ -60,31 +289,34 @@ def process_audio_data(audio_data, sample_rate=None):
         
         # Normalize audio if needed
         if np.max(np.abs(audio_data)) > 1.0:
-            logger.info("Normalizing audio data")
+            log_event(logger, INFO, 'audio_processing', "Normalizing audio data")
             audio_data = audio_data / np.max(np.abs(audio_data))
         
         # Ensure audio is the right length and format
         if len(audio_data.shape) > 1:
-            logger.info(f"Converting audio from {len(audio_data.shape)} channels to mono")
+            log_event(logger, INFO, 'audio_processing', "Converting audio from %d channels to mono", len(audio_data.shape))
             audio_data = np.mean(audio_data, axis=1)  # Convert to mono
         
         # Resample if necessary
-        if sample_rate != classifier.sample_rate:
-            logger.info(f"Resampling audio from {sample_rate}Hz to {classifier.sample_rate}Hz")
-            audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=classifier.sample_rate)
+        if sample_rate != clf.sample_rate:
+            log_event(logger, INFO, 'audio_processing', "Resampling audio from %sHz to %sHz",
+                      sample_rate, clf.sample_rate)
+            audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=clf.sample_rate)
         
         # Ensure audio is the right duration
-        target_length = int(classifier.sample_rate * classifier.duration)
+        target_length = int(clf.sample_rate * clf.duration)
         
         # Check if audio is too short (less than 0.5 seconds)
-        if len(audio_data) < (classifier.sample_rate * 0.5):
-            logger.warning(f"Audio too short ({len(audio_data)/classifier.sample_rate:.2f}s), may not contain speech")
+        if len(audio_data) < (clf.sample_rate * 0.5):
+            logger.warning("Audio too short (%.2fs), may not contain speech", len(audio_data) / clf.sample_rate)
         
         if len(audio_data) > target_length:
-            logger.info(f"Trimming audio from {len(audio_data)} to {target_length} samples ({len(audio_data)/classifier.sample_rate:.2f}s to {classifier.duration:.2f}s)")
+            log_event(logger, INFO, 'audio_processing', "Trimming audio from %d to %d samples",
+                      len(audio_data), target_length)
             audio_data = audio_data[:target_length]
         elif len(audio_data) < target_length:
-            logger.info(f"Padding audio from {len(audio_data)} to {target_length} samples ({len(audio_data)/classifier.sample_rate:.2f}s to {classifier.duration:.2f}s)")
+            log_event(logger, INFO, 'audio_processing', "Padding audio from %d to %d samples",
+                      len(audio_data), target_length)
             # Use reflection padding for more natural sound
             pad_length = target_length - len(audio_data)
             if len(audio_data) > pad_length:  # Can use reflection
@@ -93,17 +325,18 @@ def process_audio_data(audio_data, sample_rate=None):
                 audio_data = np.pad(audio_data, (0, pad_length), mode='constant')
         
         # Apply a slight fade in/out to avoid clicks
-        fade_samples = int(0.01 * classifier.sample_rate)  # 10ms fade
+        fade_samples = int(0.01 * clf.sample_rate)  # 10ms fade
         if fade_samples > 0 and len(audio_data) > 2*fade_samples:
             fade_in = np.linspace(0, 1, fade_samples)
             fade_out = np.linspace(1, 0, fade_samples)
             audio_data[:fade_samples] *= fade_in
             audio_data[-fade_samples:] *= fade_out
         
-        logger.info(f"Audio processing complete: {len(audio_data)} samples at {classifier.sample_rate}Hz")
+        log_event(logger, INFO, 'audio_processing', "Audio processing complete: %d samples at %sHz",
+                  len(audio_data), clf.sample_rate)
         return audio_data
     except Exception as e:
-        logger.error(f"Error processing audio data: {e}")
+        logger.error("Error processing audio data: %s", e)
         raise
 
 @app.route('/health', methods=['GET'])
@@ -115,6 +348,7 @@ def health_check():
     status = {
         'status': 'healthy' if classifier is not None else 'unhealthy',
         'model_loaded': classifier is not None,
+        'model_version': classifier.model_version if classifier is not None else None,
         'message': 'Emergency Voice Recognition API is running'
     }
     return jsonify(status)
@@ -125,9 +359,11 @@ def predict_emergency():
     Predict if audio contains emergency voice
     Accepts audio file upload or base64 encoded audio
     """
-    global classifier
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
     
-    if classifier is None:
+    if clf is None:
+        g.error_cause = 'model_not_loaded'
         return jsonify({
             'error': 'Model not loaded',
             'is_emergency': False,
@@ -147,20 +383,23 @@ def predict_emergency():
                 'source': data.get('source', 'unknown'),
                 'timestamp': data.get('timestamp', None)
             }
-            logger.info(f"Request from source: {source_info['source']}")
+            log_event(logger, INFO, 'audio_input', "Request from source: %s", source_info['source'])
         
         # Check if file was uploaded
         if 'audio' in request.files:
             file = request.files['audio']
             if file.filename != '':
-                logger.info(f"Processing uploaded audio file: {file.filename}")
+                log_event(logger, INFO, 'audio_input', "Processing uploaded audio file: %s", file.filename)
                 # Save uploaded file temporarily
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
                     file.save(tmp_file.name)
+                    REQUEST_BYTES.inc(os.path.getsize(tmp_file.name), encoding='multipart')
                     
                     # Load audio file
-                    audio_data, sample_rate = librosa.load(tmp_file.name, sr=classifier.sample_rate)
-                    logger.info(f"Loaded audio file: {len(audio_data)} samples at {sample_rate}Hz")
+                    with timed_stage('librosa_load'):
+                        audio_data, sample_rate = librosa.load(tmp_file.name, sr=clf.sample_rate)
+                    log_event(logger, INFO, 'audio_input', "Loaded audio file: %d samples at %sHz",
+                              len(audio_data), sample_rate)
                     
                     # Clean up temp file
                     os.unlink(tmp_file.name)
@@ -170,9 +409,10 @@ def predict_emergency():
             try:
                 # Decode base64 audio
                 audio_base64 = data['audio_base64']
-                logger.info(f"Received base64 audio data of length: {len(audio_base64)}")
+                log_event(logger, INFO, 'audio_input', "Received base64 audio data of length: %d", len(audio_base64))
                 
                 if not audio_base64:
+                    g.error_cause = 'empty_audio'
                     return jsonify({
                         'error': 'Empty base64 audio data',
                         'is_emergency': False,
@@ -181,9 +421,11 @@ def predict_emergency():
                     }), 400
                 
                 try:
-                    audio_bytes = base64.b64decode(audio_base64)
+                    with timed_stage('base64_decode'):
+                        audio_bytes = base64.b64decode(audio_base64)
                 except Exception as e:
-                    logger.error(f"Base64 decoding error: {e}")
+                    logger.error("Base64 decoding error: %s", e)
+                    g.error_cause = 'base64_decode'
                     return jsonify({
                         'error': f'Invalid base64 encoding: {str(e)}',
                         'is_emergency': False,
@@ -191,9 +433,11 @@ def predict_emergency():
                         'processing_successful': False
                     }), 400
                 
+                REQUEST_BYTES.inc(len(audio_bytes), encoding='base64')
+                
                 # Get mime type
                 mime_type = data.get('mimeType', 'audio/wav')
-                logger.info(f"Audio mime type: {mime_type}")
+                log_event(logger, INFO, 'audio_input', "Audio mime type: %s", mime_type)
                 
                 # Determine file extension based on mime type
                 extension = '.wav'
@@ -221,39 +465,46 @@ def predict_emergency():
                 try:
                     # First try: Convert to WAV using pydub if not already WAV
                     if extension != '.wav':
-                        logger.info(f"Converting {extension} to WAV format using pydub")
+                        log_event(logger, INFO, 'audio_input', "Converting %s to WAV format using pydub", extension)
                         try:
                             # Use pydub to convert
-                            audio = AudioSegment.from_file(tmp_path, format=format_name)
-                            wav_path = tmp_path + '.wav'
-                            audio.export(wav_path, format='wav')
+                            with timed_stage('pydub_convert'):
+                                audio = AudioSegment.from_file(tmp_path, format=format_name)
+                                wav_path = tmp_path + '.wav'
+                                audio.export(wav_path, format='wav')
                             
                             # Load the converted WAV
-                            audio_data, sample_rate = librosa.load(wav_path, sr=classifier.sample_rate)
-                            logger.info(f"Successfully loaded converted audio: {len(audio_data)} samples")
+                            with timed_stage('librosa_load'):
+                                audio_data, sample_rate = librosa.load(wav_path, sr=clf.sample_rate)
+                            log_event(logger, INFO, 'audio_input', "Successfully loaded converted audio: %d samples", len(audio_data))
                             
                             # Clean up converted file
                             os.unlink(wav_path)
                         except Exception as e:
-                            logger.warning(f"Pydub conversion failed: {e}, trying librosa directly")
-                            audio_data, sample_rate = librosa.load(tmp_path, sr=classifier.sample_rate)
+                            logger.warning("Pydub conversion failed: %s, trying librosa directly", e)
+                            with timed_stage('librosa_load'):
+                                audio_data, sample_rate = librosa.load(tmp_path, sr=clf.sample_rate)
                     else:
                         # Load audio file directly if it's WAV
-                        audio_data, sample_rate = librosa.load(tmp_path, sr=classifier.sample_rate)
+                        with timed_stage('librosa_load'):
+                            audio_data, sample_rate = librosa.load(tmp_path, sr=clf.sample_rate)
                     
-                    logger.info(f"Loaded audio data: {len(audio_data)} samples at {sample_rate}Hz")
+                    log_event(logger, INFO, 'audio_input', "Loaded audio data: %d samples at %sHz",
+                              len(audio_data), sample_rate)
                     
                 except Exception as e:
-                    logger.error(f"All audio loading methods failed: {e}")
+                    logger.error("All audio loading methods failed: %s", e)
                     # Try one last approach - soundfile
                     try:
                         logger.info("Attempting to load with soundfile as fallback")
-                        audio_data, sample_rate = sf.read(tmp_path)
-                        if sample_rate != classifier.sample_rate:
-                            audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=classifier.sample_rate)
-                            sample_rate = classifier.sample_rate
+                        with timed_stage('soundfile_load'):
+                            audio_data, sample_rate = sf.read(tmp_path)
+                            if sample_rate != clf.sample_rate:
+                                audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=clf.sample_rate)
+                                sample_rate = clf.sample_rate
                     except Exception as sf_error:
-                        logger.error(f"Soundfile loading also failed: {sf_error}")
+                        logger.error("Soundfile loading also failed: %s", sf_error)
+                        g.error_cause = 'audio_decode'
                         return jsonify({
                             'error': f'Could not process audio format: {str(e)}',
                             'is_emergency': False,
@@ -267,7 +518,8 @@ def predict_emergency():
                         os.unlink(tmp_path)
                     
             except Exception as e:
-                logger.error(f"Error processing base64 audio: {e}")
+                logger.error("Error processing base64 audio: %s", e)
+                g.error_cause = 'audio_decode'
                 return jsonify({
                     'error': f'Failed to process audio data: {str(e)}',
                     'is_emergency': False,
@@ -278,10 +530,12 @@ def predict_emergency():
         # Check for direct numpy array input
         elif request.is_json and 'audio_array' in data:
             audio_data = np.array(data['audio_array'])
-            sample_rate = data.get('sample_rate', classifier.sample_rate)
-            logger.info(f"Received audio array of length: {len(audio_data)}")
+            sample_rate = data.get('sample_rate', clf.sample_rate)
+            REQUEST_BYTES.inc(request.content_length or 0, encoding='audio_array')
+            log_event(logger, INFO, 'audio_input', "Received audio array of length: %d", len(audio_data))
         
         if audio_data is None:
+            g.error_cause = 'no_audio'
             return jsonify({
                 'error': 'No audio data provided',
                 'is_emergency': False,
@@ -291,9 +545,11 @@ def predict_emergency():
         
         # Process audio data
         try:
-            audio_data = process_audio_data(audio_data, sample_rate)
+            with timed_stage('process_audio'):
+                audio_data = process_audio_data(audio_data, sample_rate, clf)
         except Exception as e:
-            logger.error(f"Audio processing error: {e}")
+            logger.error("Audio processing error: %s", e)
+            g.error_cause = 'audio_processing'
             return jsonify({
                 'error': f'Audio processing failed: {str(e)}',
                 'is_emergency': False,
@@ -302,22 +558,32 @@ def predict_emergency():
             }), 400
         
         # Make prediction
-        result = classifier.predict(audio_data)
+        profile = g.get('profile')
+        with inference_slot():
+            with timed_stage('extract_features'):
+                features = clf.extract_features(
+                    audio_data, timings=profile.feature_groups if profile is not None else None)
+            with timed_stage('model_predict'):
+                result = clf.predict_features(features)
         
         # Add additional metadata
-        result['model_version'] = '1.0'
+        result['model_version'] = clf.model_version
         result['processing_successful'] = True
         
         # Add source info if available
         if source_info:
             result.update(source_info)
             
-        logger.info(f"Prediction made: {result}")
+        log_event(logger, INFO, 'prediction', "Prediction made: %s", result.get('class_label'),
+                  is_emergency=result.get('is_emergency'), confidence=result.get('confidence'))
         
-        return jsonify(result)
+        return jsonify(attach_profile(result))
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logger.error(f"Error in prediction: {e}")
+        logger.error("Error in prediction: %s", e)
+        g.error_cause = 'prediction'
         return jsonify({
             'error': f'Prediction failed: {str(e)}',
             'is_emergency': False,
@@ -330,9 +596,11 @@ def predict_from_file():
     """
     Predict emergency from uploaded audio file
     """
-    global classifier
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
     
-    if classifier is None:
+    if clf is None:
+        g.error_cause = 'model_not_loaded'
         return jsonify({
             'error': 'Model not loaded',
             'is_emergency': False,
@@ -340,6 +608,7 @@ def predict_from_file():
         }), 500
     
     if 'file' not in request.files:
+        g.error_cause = 'no_audio'
         return jsonify({
             'error': 'No file provided',
             'is_emergency': False,
@@ -348,48 +617,420 @@ def predict_from_file():
     
     file = request.files['file']
     if file.filename == '':
+        g.error_cause = 'no_audio'
         return jsonify({
             'error': 'No file selected',
             'is_emergency': False,
             'confidence': 0.0
         }), 400
     
+    # mode=timeline scores the whole file in overlapping windows instead of the first `duration` seconds
+    long_audio = (request.args.get('mode') or request.form.get('mode')) == 'timeline'
+    try:
+        hop_seconds = float(request.args.get('hop') or request.form.get('hop') or TIMELINE_HOP_SECONDS)
+        if not 0 < hop_seconds <= clf.duration:
+            raise ValueError(f"hop must be in (0, {clf.duration}]")
+    except ValueError as e:
+        g.error_cause = 'bad_request'
+        return jsonify({
+            'error': f'Invalid hop: {str(e)}',
+            'is_emergency': False,
+            'confidence': 0.0
+        }), 400
+    
     try:
         # Save uploaded file temporarily
         filename = secure_filename(file.filename)
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp_file:
             file.save(tmp_file.name)
+            REQUEST_BYTES.inc(os.path.getsize(tmp_file.name), encoding='file')
             
-            # Make prediction
-            result = classifier.predict_from_file(tmp_file.name)
+            # Make prediction, timing each stage of predict_from_file
+            try:
+                if long_audio:
+                    with inference_slot():
+                        with timed_stage('timeline'):
+                            result = clf.predict_timeline(tmp_file.name, hop_seconds=hop_seconds)
+                else:
+                    with timed_stage('librosa_load'):
+                        audio_data, sr = librosa.load(tmp_file.name, sr=clf.sample_rate, duration=clf.duration)
+                    profile = g.get('profile')
+                    with inference_slot():
+                        with timed_stage('extract_features'):
+                            features = clf.extract_features(
+                                audio_data, sr, timings=profile.feature_groups if profile is not None else None)
+                        with timed_stage('model_predict'):
+                            result = clf.predict_features(features)
+            except AdmissionRejected:
+                os.unlink(tmp_file.name)
+                raise
+            except Exception as e:
+                result = {
+                    'error': f"Failed to process audio file: {str(e)}",
+                    'is_emergency': False,
+                    'confidence': 0.0
+                }
             
             # Clean up temp file
             os.unlink(tmp_file.name)
             
             # Add metadata
             result['filename'] = filename
-            result['model_version'] = '1.0'
+            result['model_version'] = clf.model_version
             
-            logger.info(f"File prediction made for {filename}: {result}")
+            log_event(logger, INFO, 'prediction', "File prediction made for %s: %s", filename, result.get('class_label'),
+                      is_emergency=result.get('is_emergency'), confidence=result.get('confidence'))
             
-            return jsonify(result)
+            return jsonify(attach_profile(result))
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logger.error(f"Error in file prediction: {e}")
+        logger.error("Error in file prediction: %s", e)
+        g.error_cause = 'prediction'
         return jsonify({
             'error': f'File prediction failed: {str(e)}',
             'is_emergency': False,
             'confidence': 0.0
         }), 500
 
+def _labelled_prediction(clf, prediction):
+    """
+    A prediction with `is_emergency` taken from its class label and P(emergency) added
+
+    `confidence` is the raw model output, the probability of encoded
+    class 1, which is 'normal'; see EmergencyVoiceClassifier.emergency_probability().
+    """
+    result = dict(prediction)
+    result['is_emergency'] = result['class_label'] == 'emergency'
+    result['emergency_probability'] = float(clf.emergency_probability(result['confidence']))
+    return result
+
+def _decode_batch_item(item, clf):
+    """
+    Decode one /predict_batch clip and bring it to the model's rate and length
+    (runs on BATCH_DECODE_POOL, outside the request context)
+    """
+    with time_stage('batch_decode'):
+        if 'data' in item:
+            audio_data = decode_audio_bytes(item['data'], item['filename'], clf.sample_rate)
+            sample_rate = clf.sample_rate
+        else:
+            audio_data, sample_rate = item['audio'], item['sample_rate']
+    with time_stage('process_audio'):
+        return process_audio_data(audio_data, sample_rate, clf)
+
+def _stream_batch_results(items, futures, clf):
+    """
+    Yield one NDJSON line per clip, in input order, scoring a chunk at a time
+    """
+    try:
+        for start in range(0, len(items), BATCH_CHUNK_SIZE):
+            chunk = range(start, min(start + BATCH_CHUNK_SIZE, len(items)))
+            decoded = {}
+            errors = {}
+            for i in chunk:
+                try:
+                    decoded[i] = futures[i].result()
+                except Exception as e:
+                    errors[i] = f'Could not process audio: {str(e)}'
+            
+            scored = [i for i in chunk if i in decoded]
+            predictions = {}
+            if scored:
+                try:
+                    with inference_slot():
+                        with timed_stage('extract_features'):
+                            features = clf.extract_features_batch([decoded[i] for i in scored])
+                        with timed_stage('model_predict'):
+                            predictions = dict(zip(scored, clf.predict_features_batch(features)))
+                except AdmissionRejected as e:
+                    # Headers are already sent, so shedding is reported per clip
+                    errors.update((i, f'Server overloaded: {str(e)}') for i in scored)
+                except Exception as e:
+                    logger.error("Batch prediction error: %s", e)
+                    errors.update((i, f'Prediction failed: {str(e)}') for i in scored)
+            
+            for i in chunk:
+                result = {'index': i}
+                if 'filename' in items[i]:
+                    result['filename'] = items[i]['filename']
+                if i in predictions:
+                    result.update(_labelled_prediction(clf, predictions[i]))
+                    result['model_version'] = clf.model_version
+                    result['processing_successful'] = True
+                else:
+                    result.update({
+                        'error': errors[i],
+                        'is_emergency': False,
+                        'confidence': 0.0,
+                        'processing_successful': False
+                    })
+                yield json.dumps(result) + '\n'
+        
+        log_event(logger, INFO, 'prediction', "Batch prediction made for %d clips", len(items))
+    finally:
+        # Client went away (or we failed): don't decode clips nobody will read
+        for future in futures:
+            future.cancel()
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict many clips in one request
+    
+    Accepts multipart/form-data with any number of audio files, or a framed
+    PCM body (Content-Type: application/x-pcm-frames, see batch_io.py).
+    Responds with NDJSON: one result object per clip, in input order, each
+    with the clip's `index` (and `filename` for multipart uploads).
+    """
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
+    
+    if clf is None:
+        g.error_cause = 'model_not_loaded'
+        return jsonify({'error': 'Model not loaded', 'processing_successful': False}), 500
+    
+    if request.mimetype == PCM_FRAMES_CONTENT_TYPE:
+        body = request.get_data()
+        REQUEST_BYTES.inc(len(body), encoding='pcm_frames')
+        try:
+            items = [{'audio': audio_data, 'sample_rate': sample_rate} for audio_data, sample_rate
+                     in iter_pcm_frames(body, request.headers.get('X-Sample-Format', 's16le'))]
+        except ValueError as e:
+            g.error_cause = 'audio_decode'
+            return jsonify({'error': f'Invalid PCM frames: {str(e)}', 'processing_successful': False}), 400
+    else:
+        items = [{'filename': secure_filename(file.filename) or f'clip_{i}', 'data': file.read()}
+                 for i, (_, file) in enumerate(request.files.items(multi=True))]
+        REQUEST_BYTES.inc(sum(len(item['data']) for item in items), encoding='batch_multipart')
+    
+    if not items:
+        g.error_cause = 'no_audio'
+        return jsonify({'error': 'No audio clips provided', 'processing_successful': False}), 400
+    if len(items) > BATCH_MAX_CLIPS:
+        g.error_cause = 'batch_too_large'
+        return jsonify({
+            'error': f'Batch of {len(items)} clips exceeds the limit of {BATCH_MAX_CLIPS}',
+            'processing_successful': False
+        }), 413
+    
+    futures = [BATCH_DECODE_POOL.submit(_decode_batch_item, item, clf) for item in items]
+    return Response(stream_with_context(_stream_batch_results(items, futures, clf)),
+                    mimetype='application/x-ndjson')
+
+@app.route('/predict_features', methods=['POST'])
+def predict_from_features():
+    """
+    Predict from a feature vector computed by the client
+
+    Expects JSON {"features": [...], "feature_set_version": "v1"}. The
+    vector must match the loaded model's feature set (GET /model_info
+    returns its version, names and audio parameters); only scaling and
+    inference run on the server.
+    """
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
+
+    if clf is None:
+        g.error_cause = 'model_not_loaded'
+        return jsonify({
+            'error': 'Model not loaded',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 500
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'features' not in data or 'feature_set_version' not in data:
+        g.error_cause = 'no_features'
+        return jsonify({
+            'error': 'Expected a JSON body with "features" and "feature_set_version"',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 400
+    REQUEST_BYTES.inc(request.content_length or 0, encoding='features')
+
+    feature_set = clf.get_feature_set()
+    declared_version = data.get('feature_set_version')
+    if declared_version != feature_set['version']:
+        g.error_cause = 'feature_set_mismatch'
+        return jsonify({
+            'error': f"Feature set version {declared_version!r} does not match the model's "
+                     f"{feature_set['version']!r}",
+            'feature_set': feature_set,
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 409
+
+    try:
+        features = np.asarray(data['features'], dtype=np.float64)
+    except (TypeError, ValueError):
+        features = None
+    if features is None or features.shape != (feature_set['count'],) or not np.isfinite(features).all():
+        g.error_cause = 'invalid_features'
+        return jsonify({
+            'error': f"Expected {feature_set['count']} finite numbers in \"features\"",
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 400
+
+    try:
+        g.deadline = parse_deadline(request.headers, DEFAULT_REQUEST_TIMEOUT)
+        with inference_slot():
+            with timed_stage('model_predict'):
+                result = _labelled_prediction(clf, clf.predict_features(features))
+
+        result['model_version'] = clf.model_version
+        result['processing_successful'] = True
+
+        log_event(logger, INFO, 'prediction', "Prediction made from client features: %s", result.get('class_label'),
+                  is_emergency=result.get('is_emergency'), confidence=result.get('confidence'))
+
+        return jsonify(result)
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error("Error in feature prediction: %s", e)
+        g.error_cause = 'prediction'
+        return jsonify({
+            'error': f'Prediction failed: {str(e)}',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 500
+
+def _stream_progressive_results(clf, audio_data, sample_rate, partial, after_seconds):
+    """
+    Yield one NDJSON line per progressive stage, as soon as it is scored
+    """
+    stages = clf.predict_progressive(audio_data, sample_rate, partial=partial, after_seconds=after_seconds)
+    while True:
+        try:
+            # One inference slot per stage, so a slow reader does not hold a slot between lines
+            with inference_slot():
+                with timed_stage('progressive_stage'):
+                    result = next(stages, None)
+        except AdmissionRejected as e:
+            # Headers are already sent, so shedding is reported in the stream
+            yield json.dumps({'error': f'Server overloaded: {str(e)}', 'processing_successful': False}) + '\n'
+            return
+        except Exception as e:
+            logger.error("Progressive prediction error: %s", e)
+            yield json.dumps({'error': f'Prediction failed: {str(e)}', 'processing_successful': False}) + '\n'
+            return
+        if result is None:
+            return
+        result['model_version'] = clf.model_version
+        result['processing_successful'] = True
+        if result['early_decision'] or result['final']:
+            log_event(logger, INFO, 'prediction', "Progressive %s decision at %ss: %s",
+                      'final' if result['final'] else 'early', result['stage_seconds'], result['class_label'],
+                      is_emergency=result['is_emergency'], emergency_probability=result['emergency_probability'])
+        yield json.dumps(result) + '\n'
+
+@app.route('/predict_progressive', methods=['POST'])
+def predict_progressive():
+    """
+    Predict on growing prefixes of the audio, with early decisions
+
+    Accepts the same inputs as /predict (`audio` upload, `audio_base64`
+    with `mimeType`, or `audio_array` with `sample_rate`). Responds with
+    NDJSON: one line per stage (1 s, 2 s, ... prefix models, then the full
+    model), each streamed as soon as it is scored. `partial=1` marks the
+    audio as the start of a recording still in progress; `after=<seconds>`
+    skips stages already scored from an earlier, shorter post.
+    """
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
+
+    if clf is None:
+        g.error_cause = 'model_not_loaded'
+        return jsonify({
+            'error': 'Model not loaded',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 500
+
+    data = request.get_json(silent=True) if request.is_json else None
+    data = data if isinstance(data, dict) else {}
+    try:
+        partial = str(request.args.get('partial') or request.form.get('partial') or data.get('partial', '')).lower() \
+            in ('1', 'true', 'yes')
+        after_seconds = float(request.args.get('after') or request.form.get('after') or data.get('after') or 0)
+        if not 0 <= after_seconds < clf.duration:
+            raise ValueError(f"after must be in [0, {clf.duration})")
+    except ValueError as e:
+        g.error_cause = 'bad_request'
+        return jsonify({
+            'error': f'Invalid parameters: {str(e)}',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 400
+
+    try:
+        sample_rate = clf.sample_rate
+        file = request.files.get('audio')
+        with timed_stage('progressive_decode'):
+            if file is not None and file.filename != '':
+                audio_bytes = file.read()
+                REQUEST_BYTES.inc(len(audio_bytes), encoding='multipart')
+                audio_data = decode_audio_bytes(audio_bytes, secure_filename(file.filename), clf.sample_rate)
+            elif data.get('audio_base64'):
+                audio_bytes = base64.b64decode(data['audio_base64'])
+                REQUEST_BYTES.inc(len(audio_bytes), encoding='base64')
+                mime_type = data.get('mimeType', 'audio/wav')
+                extension = next((ext for key, ext in (('webm', 'webm'), ('mp3', 'mp3'), ('ogg', 'ogg'),
+                                                       ('mp4', 'm4a'), ('aac', 'm4a')) if key in mime_type), 'wav')
+                audio_data = decode_audio_bytes(audio_bytes, f'audio.{extension}', clf.sample_rate)
+            elif 'audio_array' in data:
+                REQUEST_BYTES.inc(request.content_length or 0, encoding='audio_array')
+                audio_data = np.asarray(data['audio_array'], dtype=np.float32)
+                sample_rate = int(data.get('sample_rate', clf.sample_rate))
+            else:
+                g.error_cause = 'no_audio'
+                return jsonify({
+                    'error': 'No audio data provided',
+                    'is_emergency': False,
+                    'confidence': 0.0,
+                    'processing_successful': False
+                }), 400
+        if audio_data.ndim > 1:
+            audio_data = np.mean(audio_data, axis=1)
+        audio_data = np.nan_to_num(audio_data)
+        peak = np.max(np.abs(audio_data)) if len(audio_data) else 0.0
+        if peak > 1.0:
+            audio_data = audio_data / peak
+        if len(audio_data) == 0:
+            raise ValueError("Empty audio data")
+    except Exception as e:
+        logger.error("Progressive prediction audio error: %s", e)
+        g.error_cause = 'audio_decode'
+        return jsonify({
+            'error': f'Could not process audio: {str(e)}',
+            'is_emergency': False,
+            'confidence': 0.0,
+            'processing_successful': False
+        }), 400
+
+    return Response(stream_with_context(_stream_progressive_results(clf, audio_data, sample_rate, partial, after_seconds)),
+                    mimetype='application/x-ndjson')
+
 @app.route('/model_info', methods=['GET'])
 def model_info():
     """
     Get information about the loaded model
     """
-    global classifier
+    # Pin the classifier for the whole request so a hot reload cannot swap it mid-flight
+    clf = classifier
     
-    if classifier is None:
+    if clf is None:
         return jsonify({
             'error': 'Model not loaded',
             'model_loaded': False
@@ -398,32 +1039,72 @@ def model_info():
     try:
         info = {
             'model_loaded': True,
-            'model_path': classifier.model_path,
-            'sample_rate': classifier.sample_rate,
-            'duration': classifier.duration,
-            'n_mfcc': classifier.n_mfcc,
-            'expected_features': classifier.get_feature_count(),
-            'model_version': '1.0',
+            'model_path': clf.model_path,
+            'sample_rate': clf.sample_rate,
+            'duration': clf.duration,
+            'n_mfcc': clf.n_mfcc,
+            'expected_features': clf.get_feature_count(),
+            'feature_set': clf.get_feature_set(),
+            'progressive_stages': [seconds for seconds, _ in clf.progressive_stages()],
+            'model_version': clf.model_version,
             'supported_formats': ['wav', 'mp3', 'flac', 'm4a'],
             'api_version': '1.0'
         }
         
-        if classifier.model is not None:
+        if clf.model is not None:
             info['model_summary'] = {
-                'input_shape': classifier.model.input_shape,
-                'output_shape': classifier.model.output_shape,
-                'total_params': classifier.model.count_params()
+                'input_shape': clf.model.input_shape,
+                'output_shape': clf.model.output_shape,
+                'total_params': clf.model.count_params()
             }
         
         return jsonify(info)
         
     except Exception as e:
-        logger.error(f"Error getting model info: {e}")
+        logger.error("Error getting model info: %s", e)
         return jsonify({
             'error': f'Failed to get model info: {str(e)}',
             'model_loaded': False
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Expose request, stage latency and error metrics in Prometheus text format
+    """
+    # ru_maxrss is only refreshed periodically, so it can trail the current RSS
+    current_rss = memory_profiling.current_rss_bytes()
+    peak_rss = max(memory_profiling.peak_rss_bytes() or 0, current_rss or 0)
+    if peak_rss:
+        PROCESS_RSS.set(peak_rss, kind='peak')
+    if current_rss is not None:
+        PROCESS_RSS.set(current_rss, kind='current')
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def reload_model():
+    """
+    Start a background model reload (POST) or report the last reload status (GET)
+    """
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        g.error_cause = 'forbidden'
+        return jsonify({'error': 'Model reload is not permitted'}), 403
+    
+    if request.method == 'GET':
+        return jsonify(model_reloader.status)
+    
+    data = request.get_json(silent=True) or {}
+    model_path = data.get('model_path', MODEL_PATH)
+    if not model_reloader.start(model_path, data.get('scaler_path'), data.get('label_encoder_path')):
+        g.error_cause = 'reload_in_progress'
+        return jsonify({'error': 'A reload is already in progress', 'status': model_reloader.status}), 409
+    
+    return jsonify({
+        'message': 'Reload started',
+        'current_model_version': classifier.model_version if classifier is not None else None,
+        'status': model_reloader.status
+    }), 202
+
 @app.route('/test', methods=['POST'])
 def test_endpoint():
     """
@@ -446,6 +1127,20 @@ def test_endpoint():
             'error': f'Test failed: {str(e)}'
         }), 500
 
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    g.error_cause = error.reason
+    response = jsonify({
+        'error': str(error),
+        'is_emergency': False,
+        'confidence': 0.0,
+        'processing_successful': False
+    })
+    response.status_code = error.status_code
+    if error.retry_after:
+        response.headers['Retry-After'] = str(int(math.ceil(error.retry_after)))
+    return response
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -454,7 +1149,12 @@ def not_found(error):
             '/health',
             '/predict',
             '/predict_file',
+            '/predict_batch',
+            '/predict_features',
+            '/predict_progressive',
             '/model_info',
+            '/metrics',
+            '/admin/reload',
             '/test'
         ]
     }), 404
@@ -468,19 +1168,26 @@ def internal_error(error):
 
 if __name__ == '__main__':
     print("Starting Emergency Voice Recognition API Server...")
+    configure_api_logging()
     
     # Initialize model
     if initialize_model():
+        install_reload_signal_handler()
         print("Model loaded successfully!")
-        print("API Server starting on http://localhost:5000")
+        print(f"API Server starting on http://localhost:{PORT}")
         print("Available endpoints:")
         print("  GET  /health - Health check")
         print("  POST /predict - Predict from audio data")
         print("  POST /predict_file - Predict from uploaded file")
+        print("  POST /predict_batch - Predict many clips, NDJSON results")
+        print("  POST /predict_features - Predict from a precomputed feature vector")
+        print("  POST /predict_progressive - Early decisions on partial audio, NDJSON per stage")
         print("  GET  /model_info - Get model information")
+        print("  GET  /metrics - Prometheus metrics")
+        print("  POST /admin/reload - Hot-reload the model")
         print("  POST /test - Test endpoint")
         
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host=HOST, port=PORT, debug=False)
     else:
         print("Failed to load model. Please ensure the model files exist.")
         print("Run train_model.py first to train the model.")
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""
+NumPy audio effects for dataset generation and data augmentation
+
+Float32 implementations of the noise, speed, pitch and echo effects used by
+dataset_generator.py and of its emergency / normal simulation recipes. They
+operate on mono float arrays in [-1, 1] and take an explicit numpy
+Generator, so they can run inside a training input pipeline and produce a
+fresh random variant of a base clip on every call.
+
+The *_batch variants take an (n_clips, n_samples) array and per-clip
+parameter arrays and return an array of the same shape (clips are trimmed or
+zero-padded back to n_samples).
+
+Run `python audio_effects.py` to check these effects against the original
+pydub implementations on a synthetic clip; it fails with an AssertionError
+when an effect drifts outside PARITY_TOLERANCES.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def _db_to_gain(db: float) -> float:
+    return float(10.0 ** (db / 20.0))
+
+
+def fix_length(audio: np.ndarray, length: int) -> np.ndarray:
+    """
+    Trim or zero-pad to exactly `length` samples
+    """
+    if len(audio) >= length:
+        return audio[:length]
+    return np.pad(audio, (0, length - len(audio)))
+
+
+def add_noise(audio: np.ndarray, noise_level: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Overlay full-scale white noise attenuated by (60 - noise_level * 60) dB
+    """
+    gain = _db_to_gain(-(60.0 - noise_level * 60.0))
+    noise = rng.uniform(-1.0, 1.0, size=audio.shape).astype(np.float32)
+    return np.clip(audio + noise * np.float32(gain), -1.0, 1.0)
+
+
+def change_speed(audio: np.ndarray, speed_factor: float, sr: int, frame_ms: float = 40.0,
+                 tolerance_ms: float = 5.0) -> np.ndarray:
+    """
+    Change tempo without changing pitch using waveform-similarity overlap-add
+
+    Frames of `frame_ms` are written every `hop` samples (hop = half a frame)
+    with a Hann window and read about every `hop * speed_factor` samples;
+    each read position is moved by up to `tolerance_ms` to where the frame
+    best lines up with the natural continuation of the previous one. Plain
+    overlap-add skips that alignment and loses about 1 dB to phase
+    cancellation between overlapping frames.
+
+    Each read position depends on the previous one, so the alignment search
+    is a loop over frames; the overlap-add then gathers every frame through
+    a strided view and sums them as two half-frame streams, without a loop.
+
+    The output is exactly round(len(audio) / speed_factor) samples. pydub's
+    speedup() drops whole chunks and comes out about 2.4% longer at 1.2x;
+    this deviation is deliberate, see PARITY_TOLERANCES.
+    """
+    frame = max(4, int(sr * frame_ms / 1000.0) // 2 * 2)
+    if speed_factor == 1.0 or len(audio) < frame:
+        return audio.copy()
+    hop = frame // 2
+    tolerance = int(sr * tolerance_ms / 1000.0)
+    out_length = max(1, int(round(len(audio) / speed_factor)))
+    # Enough frames to cover out_length; the last ones may read past the end of the audio
+    n_frames = max(1, -(-(out_length - frame) // hop) + 1)
+    nominal = np.round(np.arange(n_frames) * hop * speed_factor).astype(np.int64)
+    # Padding lets read positions move by the full tolerance at both ends and run past the end
+    padded = np.pad(np.asarray(audio, dtype=np.float32),
+                    (tolerance, max(0, int(nominal[-1]) + frame + 2 * tolerance - len(audio))))
+
+    starts = np.empty(n_frames, dtype=np.int64)
+    starts[0] = tolerance
+    for k in range(1, n_frames):
+        continuation = padded[starts[k - 1] + hop:starts[k - 1] + frame]
+        search = padded[nominal[k]:nominal[k] + 2 * tolerance + hop]
+        starts[k] = nominal[k] + np.argmax(np.correlate(search, continuation, mode='valid'))
+
+    window = np.hanning(frame).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame)[starts] * window
+    out = np.zeros((n_frames + 1, hop), dtype=np.float32)
+    out[:-1] += frames[:, :hop]
+    out[1:] += frames[:, hop:]
+    norm = np.zeros((n_frames + 1, hop), dtype=np.float32)
+    norm[:-1] += window[:hop]
+    norm[1:] += window[hop:]
+    return (out / np.maximum(norm, 1e-3)).reshape(-1)[:out_length]
+
+
+def change_pitch(audio: np.ndarray, semitones: float) -> np.ndarray:
+    """
+    Shift pitch by playing the samples back at a different rate
+
+    Like the pydub version (reinterpret the frame rate, then convert back),
+    this changes duration along with pitch.
+    """
+    if semitones == 0 or len(audio) < 2:
+        return audio.copy()
+    ratio = 2.0 ** (semitones / 12.0)
+    out_length = max(1, int(round(len(audio) / ratio)))
+    positions = np.arange(out_length, dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def add_echo(audio: np.ndarray, delay_ms: float, decay: float, sr: int) -> np.ndarray:
+    """
+    Overlay a delayed copy attenuated by (60 - decay * 60) dB, keeping length
+    """
+    delay = int(sr * delay_ms / 1000.0)
+    if delay >= len(audio):
+        return audio.copy()
+    out = audio.astype(np.float32, copy=True)
+    out[delay:] += audio[:len(audio) - delay] * np.float32(_db_to_gain(-(60.0 - decay * 60.0)))
+    return np.clip(out, -1.0, 1.0)
+
+
+def simulate_emergency_stress(audio: np.ndarray, sr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized panic-speech variant: faster, pitch-shifted, noisy, sometimes echoing
+    """
+    audio = change_speed(audio, rng.uniform(1.1, 1.3), sr)
+    audio = change_pitch(audio, int(rng.integers(-2, 4)))
+    audio = add_noise(audio, rng.uniform(0.05, 0.15), rng)
+    if rng.random() < 0.3:
+        audio = add_echo(audio, int(rng.integers(50, 151)), rng.uniform(0.2, 0.4), sr)
+    return audio
+
+
+def simulate_normal_conversation(audio: np.ndarray, sr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized calm-speech variant: mild speed and pitch changes, light noise
+    """
+    audio = change_speed(audio, rng.uniform(0.9, 1.1), sr)
+    audio = change_pitch(audio, int(rng.integers(-1, 2)))
+    audio = add_noise(audio, rng.uniform(0.01, 0.05), rng)
+    return audio
+
+
+def augment_clip(audio: np.ndarray, label: str, sr: int, rng: Optional[np.random.Generator] = None,
+                 length: Optional[int] = None) -> np.ndarray:
+    """
+    Apply the label's simulation recipe and restore the clip length
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    length = length or len(audio)
+    audio = np.asarray(audio, dtype=np.float32)
+    if label == 'emergency':
+        audio = simulate_emergency_stress(audio, sr, rng)
+    else:
+        audio = simulate_normal_conversation(audio, sr, rng)
+    return fix_length(audio, length)
+
+
+def add_noise_batch(clips: np.ndarray, noise_levels: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    add_noise for a batch, with one noise level per clip
+    """
+    gains = (10.0 ** (-(60.0 - np.asarray(noise_levels) * 60.0) / 20.0)).astype(np.float32)
+    noise = rng.random(clips.shape, dtype=np.float32)
+    noise *= 2.0
+    noise -= 1.0
+    noise *= gains[:, None]
+    noise += clips
+    return np.clip(noise, -1.0, 1.0, out=noise)
+
+
+def add_echo_batch(clips: np.ndarray, delays_ms: np.ndarray, decays: np.ndarray, sr: int,
+                   mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    add_echo for a batch; clips where `mask` is False are left unchanged
+    """
+    delays = (np.asarray(delays_ms) * sr / 1000.0).astype(np.int64)
+    gains = (10.0 ** (-(60.0 - np.asarray(decays) * 60.0) / 20.0)).astype(np.float32)
+    out = np.array(clips, dtype=np.float32)
+    rows = np.arange(len(out)) if mask is None else np.flatnonzero(mask)
+    for row in rows:
+        delay = delays[row]
+        if delay < out.shape[1]:
+            out[row, delay:] += clips[row, :out.shape[1] - delay] * gains[row]
+    return np.clip(out, -1.0, 1.0, out=out)
+
+
+def change_pitch_batch(clips: np.ndarray, semitones: np.ndarray) -> np.ndarray:
+    """
+    change_pitch for a batch, trimmed or zero-padded back to the input length
+    """
+    n, length = clips.shape
+    ratios = 2.0 ** (np.asarray(semitones, dtype=np.float64) / 12.0)
+    source = np.arange(length, dtype=np.float64)
+    out = np.zeros((n, length), dtype=np.float32)
+    # One np.interp per row; rows sharing a ratio share the resampling grid
+    for ratio in np.unique(ratios):
+        out_length = min(length, max(1, int(round(length / ratio))))
+        positions = np.arange(out_length, dtype=np.float64) * ratio
+        for row in np.flatnonzero(ratios == ratio):
+            out[row, :len(positions)] = np.interp(positions, source, clips[row])
+    return out
+
+
+def change_speed_batch(clips: np.ndarray, speed_factors: np.ndarray, sr: int) -> np.ndarray:
+    """
+    change_speed for a batch, trimmed or zero-padded back to the input length
+
+    Unlike the other batch effects this loops over clips: each clip has its
+    own factor and frame positions, and the alignment search is sequential.
+    """
+    length = clips.shape[1]
+    return np.stack([fix_length(change_speed(clip, float(factor), sr), length)
+                     for clip, factor in zip(clips, speed_factors)])
+
+
+def simulate_emergency_stress_batch(clips: np.ndarray, sr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    simulate_emergency_stress for a batch, with independent parameters per clip
+    """
+    n = clips.shape[0]
+    clips = change_speed_batch(clips, rng.uniform(1.1, 1.3, n), sr)
+    clips = change_pitch_batch(clips, rng.integers(-2, 4, n))
+    clips = add_noise_batch(clips, rng.uniform(0.05, 0.15, n), rng)
+    return add_echo_batch(clips, rng.integers(50, 151, n), rng.uniform(0.2, 0.4, n), sr,
+                          mask=rng.random(n) < 0.3)
+
+
+def simulate_normal_conversation_batch(clips: np.ndarray, sr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    simulate_normal_conversation for a batch, with independent parameters per clip
+    """
+    n = clips.shape[0]
+    clips = change_speed_batch(clips, rng.uniform(0.9, 1.1, n), sr)
+    clips = change_pitch_batch(clips, rng.integers(-1, 2, n))
+    return add_noise_batch(clips, rng.uniform(0.01, 0.05, n), rng)
+
+
+def augment_batch(clips: np.ndarray, labels: Sequence[str], sr: int,
+                  rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Apply each clip's label recipe to an (n_clips, n_samples) batch
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    clips = np.asarray(clips, dtype=np.float32)
+    out = np.empty_like(clips)
+    emergency = np.asarray(labels) == 'emergency'
+    if emergency.any():
+        out[emergency] = simulate_emergency_stress_batch(clips[emergency], sr, rng)
+    if (~emergency).any():
+        out[~emergency] = simulate_normal_conversation_batch(clips[~emergency], sr, rng)
+    return out
+
+
+def segment_to_array(segment) -> np.ndarray:
+    """
+    Convert a pydub AudioSegment to a mono float32 array in [-1, 1]
+    """
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+    return samples / float(1 << (8 * segment.sample_width - 1))
+
+
+def array_to_segment(audio: np.ndarray, frame_rate: int):
+    """
+    Convert a float array in [-1, 1] to a 16-bit mono pydub AudioSegment
+    """
+    from pydub import AudioSegment
+
+    pcm = np.round(np.clip(audio, -1.0, 1.0) * 32767.0).astype('<i2')
+    return AudioSegment(pcm.tobytes(), frame_rate=frame_rate, sample_width=2, channels=1)
+
+
+# Parity tolerances of the NumPy effects against pydub on a 2 s, -6 dBFS 440 Hz tone
+PARITY_TOLERANCES = {
+    # Deterministic and sample-aligned: only int16 rounding differs
+    'add_echo': {'max_abs_diff': 1e-3},
+    'change_pitch': {'length_samples': 1, 'max_abs_diff': 5e-3, 'min_corr': 0.999},
+    # Random: compare the energy of the added noise
+    'add_noise': {'rms_rel': 0.1},
+    # Different algorithm (overlap-add vs chunk dropping): compare level and
+    # pitch with pydub. Durations are not compared with each other: the NumPy
+    # version is held to the nominal len / speed, and pydub's overshoot (about
+    # 2.4% at 1.2x) is checked against its own chunk arithmetic instead, see
+    # _pydub_speedup_ms().
+    'change_speed': {'rms_rel': 0.05, 'peak_hz': 5.0, 'length_samples_nominal': 1, 'pydub_length_ms': 1},
+}
+
+
+def _pydub_speedup_ms(duration_ms: int, speed: float, chunk_ms: int = 150, crossfade_ms: int = 25) -> int:
+    """
+    Output duration of pydub's speedup() for speed < 2
+
+    pydub cuts chunks of chunk_ms + remove ms (remove rounded down), keeps
+    chunk_ms of each once the crossfades have overlapped, gives one
+    crossfade back and appends the last, partial chunk whole. The result is
+    longer than duration / speed by the crossfade plus the rounding.
+    """
+    remove = int(chunk_ms * (1 - 1 / speed) / (1 / speed))
+    full_chunks = -(-duration_ms // (chunk_ms + remove)) - 1
+    last_chunk = duration_ms - full_chunks * (chunk_ms + remove)
+    return full_chunks * chunk_ms + min(crossfade_ms, remove - 1) + last_chunk
+
+
+def _compare_with_pydub(tolerances: Optional[dict] = None):
+    """
+    Assert that the NumPy effects match the original pydub versions
+
+    Raises AssertionError naming the effect and the measured value when a
+    check falls outside its entry in PARITY_TOLERANCES.
+    """
+    from pydub import AudioSegment
+    from pydub.generators import Sine, WhiteNoise
+
+    tolerances = tolerances or PARITY_TOLERANCES
+    sr = 22050
+    segment = Sine(440, sample_rate=sr).to_audio_segment(duration=2000, volume=-6).set_channels(1)
+    audio = segment_to_array(segment)
+    rng = np.random.default_rng(0)
+
+    def rms(x):
+        return float(np.sqrt(np.mean(np.square(x))))
+
+    def peak_hz(x):
+        return float(np.argmax(np.abs(np.fft.rfft(x))) * sr / len(x))
+
+    def check(name, measured, limit, ok):
+        print(f"{name:<40} {measured:>10.4f}  (limit {limit})  {'ok' if ok else 'FAIL'}")
+        assert ok, f"{name} = {measured:.6f} outside tolerance {limit}"
+
+    def check_aligned(name, reference, candidate):
+        tolerance = tolerances[name]
+        length = min(len(reference), len(candidate))
+        if 'length_samples' in tolerance:
+            check(f"{name} length difference (samples)", abs(len(reference) - len(candidate)),
+                  tolerance['length_samples'], abs(len(reference) - len(candidate)) <= tolerance['length_samples'])
+        diff = float(np.max(np.abs(reference[:length] - candidate[:length])))
+        check(f"{name} max|diff|", diff, tolerance['max_abs_diff'], diff <= tolerance['max_abs_diff'])
+        if 'min_corr' in tolerance:
+            corr = float(np.corrcoef(reference[:length], candidate[:length])[0, 1])
+            check(f"{name} correlation", corr, f">= {tolerance['min_corr']}", corr >= tolerance['min_corr'])
+
+    echo = segment - (60 - 0.3 * 60)
+    check_aligned('add_echo',
+                  segment_to_array(segment.overlay(AudioSegment.silent(duration=100, frame_rate=sr) + echo)),
+                  add_echo(audio, 100, 0.3, sr))
+    pitched = segment._spawn(segment.raw_data, overrides={'frame_rate': int(sr * 2 ** (3 / 12.0))}).set_frame_rate(sr)
+    check_aligned('change_pitch', segment_to_array(pitched), change_pitch(audio, 3))
+
+    noise = WhiteNoise(sample_rate=sr).to_audio_segment(duration=len(segment)) - (60 - 0.1 * 60)
+    pydub_noise = rms(segment_to_array(segment.overlay(noise)) - audio)
+    numpy_noise = rms(add_noise(audio, 0.1, rng) - audio)
+    relative = abs(numpy_noise - pydub_noise) / pydub_noise
+    check("add_noise added-noise rms (relative)", relative, tolerances['add_noise']['rms_rel'],
+          relative <= tolerances['add_noise']['rms_rel'])
+
+    tolerance = tolerances['change_speed']
+    sped = segment_to_array(segment.speedup(playback_speed=1.2))
+    numpy_sped = change_speed(audio, 1.2, sr)
+    relative = abs(rms(numpy_sped) - rms(sped)) / rms(sped)
+    check("change_speed rms vs pydub (relative)", relative, tolerance['rms_rel'], relative <= tolerance['rms_rel'])
+    shift = abs(peak_hz(numpy_sped) - peak_hz(sped))
+    check("change_speed pitch vs pydub (Hz)", shift, tolerance['peak_hz'], shift <= tolerance['peak_hz'])
+    difference = abs(len(numpy_sped) - len(audio) / 1.2)
+    check("change_speed length vs nominal (samples)", difference, tolerance['length_samples_nominal'],
+          difference <= tolerance['length_samples_nominal'])
+    difference = abs(len(sped) * 1000.0 / sr - _pydub_speedup_ms(len(segment), 1.2))
+    check("pydub speedup length vs its chunking (ms)", difference, tolerance['pydub_length_ms'],
+          difference <= tolerance['pydub_length_ms'])
+    print("All effects within parity tolerances")
+
+
+if __name__ == '__main__':
+    _compare_with_pydub()
@@ -0,0 +1,98 @@
+"""
+Wire formats for batch prediction (/predict_batch)
+
+Framed PCM: the request body is a sequence of frames, one per clip, with no
+container around them:
+
+    uint32 LE  sample rate (Hz)
+    uint32 LE  number of samples
+    samples    mono, little-endian, in the request's sample format
+
+The sample format is `s16le` (default) or `f32le`, chosen with the
+X-Sample-Format header. Clips in one body may have different rates and
+lengths.
+
+Multipart uploads carry encoded files (WAV, FLAC, OGG through soundfile;
+WebM, MP3, M4A through pydub/ffmpeg), decoded by decode_audio_bytes.
+"""
+
+import io
+import os
+import struct
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+PCM_FRAMES_CONTENT_TYPE = 'application/x-pcm-frames'
+SAMPLE_FORMATS = {
+    's16le': (np.dtype('<i2'), 32768.0),
+    'f32le': (np.dtype('<f4'), 1.0),
+}
+FRAME_HEADER = struct.Struct('<II')
+
+
+def encode_pcm_frames(clips: List[Tuple[np.ndarray, int]], sample_format: str = 's16le') -> bytes:
+    """
+    Encode (audio, sample_rate) pairs, audio as floats in [-1, 1], into a framed PCM body
+    """
+    dtype, scale = SAMPLE_FORMATS[sample_format]
+    parts = []
+    for audio, sample_rate in clips:
+        audio = np.asarray(audio, dtype=np.float32)
+        if dtype.kind == 'i':
+            samples = np.round(np.clip(audio, -1.0, 1.0) * (scale - 1)).astype(dtype)
+        else:
+            samples = audio.astype(dtype)
+        parts.append(FRAME_HEADER.pack(int(sample_rate), len(samples)))
+        parts.append(samples.tobytes())
+    return b''.join(parts)
+
+
+def iter_pcm_frames(body: bytes, sample_format: str = 's16le') -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Yield (float32 audio, sample_rate) for each frame of a framed PCM body
+
+    Raises ValueError for an unknown sample format or a truncated frame.
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unknown sample format {sample_format!r}; expected one of {sorted(SAMPLE_FORMATS)}")
+    dtype, scale = SAMPLE_FORMATS[sample_format]
+    view = memoryview(body)
+    offset = 0
+    index = 0
+    while offset < len(view):
+        if offset + FRAME_HEADER.size > len(view):
+            raise ValueError(f"Frame {index}: truncated header")
+        sample_rate, n_samples = FRAME_HEADER.unpack_from(view, offset)
+        offset += FRAME_HEADER.size
+        n_bytes = n_samples * dtype.itemsize
+        if offset + n_bytes > len(view):
+            raise ValueError(f"Frame {index}: expected {n_samples} samples, body ends early")
+        if sample_rate == 0:
+            raise ValueError(f"Frame {index}: sample rate must be positive")
+        samples = np.frombuffer(view[offset:offset + n_bytes], dtype=dtype)
+        offset += n_bytes
+        index += 1
+        yield samples.astype(np.float32) / scale, sample_rate
+
+
+def decode_audio_bytes(data: bytes, filename: str, sample_rate: int) -> np.ndarray:
+    """
+    Decode an encoded audio file held in memory to mono float32 at sample_rate
+    """
+    import librosa
+
+    try:
+        audio, _ = librosa.load(io.BytesIO(data), sr=sample_rate)
+        return audio
+    except Exception:
+        # Not a soundfile format (WebM/Opus, MP3, AAC): go through ffmpeg
+        from pydub import AudioSegment
+        from audio_effects import segment_to_array
+
+        extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+        segment = AudioSegment.from_file(io.BytesIO(data), format=extension or None)
+        audio = segment_to_array(segment)
+        if segment.frame_rate != sample_rate:
+            audio = librosa.resample(audio, orig_sr=segment.frame_rate, target_sr=sample_rate)
+        return audio
@@ -0,0 +1,366 @@
+"""
+Benchmark suite for the feature, inference and API hot paths
+
+Every case runs on deterministic synthetic clips (harmonic "voice" with
+vibrato, syllable envelope and background noise), so results are
+comparable between runs and machines. Cases:
+
+    extract_features                 full feature vector for a 3 s clip
+    extract_features.<group>         per feature group (mfcc, spectral, ...)
+    process_audio_data               clip already at the model rate
+    process_audio_data.resample_<sr> clip at a common input rate
+    predict                          EmergencyVoiceClassifier.predict
+    api.predict.<encoding>           /predict through the Flask test client:
+                                     multipart_wav, base64_webm, audio_array
+
+For each case the suite reports ops/sec and p50/p95/p99 latency, plus peak
+traced memory from one extra iteration under tracemalloc (kept out of the
+timed loop because tracing slows allocation-heavy code). The API cases also
+break the peak down by server stage (decode, process_audio, extract_features,
+model_predict).
+
+Without --model, a small model with fixed random weights is built and
+bundled in a temporary directory, so the suite runs without a trained model.
+
+Usage:
+    python benchmark_suite.py --save-baseline benchmark_baseline.json
+    python benchmark_suite.py --compare benchmark_baseline.json    # exit 1 on regression
+    python benchmark_suite.py --groups api --iterations 50
+"""
+
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.15
+# Slowdowns smaller than this are timer noise on sub-millisecond cases
+MIN_REGRESSION_MS = 0.25
+RESAMPLE_RATES = (8000, 16000, 44100, 48000)
+API_INPUT_RATE = 16000
+
+
+def synthetic_clip(seed: int = 0, duration: float = 3.0, sr: int = 22050) -> np.ndarray:
+    """
+    Deterministic speech-like test signal in [-1, 1]
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    f0 = rng.uniform(110, 260) * (1 + 0.03 * np.sin(2 * np.pi * rng.uniform(4, 7) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * rng.uniform(2, 5) * t), 0, None) ** 2
+    audio = 0.5 * voice * syllables + 0.02 * rng.normal(size=t.shape)
+    return (audio / np.max(np.abs(audio)) * 0.8).astype(np.float32)
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    times_ms = np.asarray(times) * 1000.0
+    return {
+        'iterations': len(times),
+        'ops_per_sec': float(len(times) / np.sum(times)) if np.sum(times) > 0 else 0.0,
+        'mean_ms': float(np.mean(times_ms)),
+        'p50_ms': float(np.percentile(times_ms, 50)),
+        'p95_ms': float(np.percentile(times_ms, 95)),
+        'p99_ms': float(np.percentile(times_ms, 99)),
+    }
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    """
+    Peak traced allocation (bytes) during one call
+    """
+    from memory_profiling import PeakMeasurement
+
+    # PeakMeasurement, not the raw counter: instrumented stages inside fn reset it
+    tracemalloc.start()
+    try:
+        with PeakMeasurement() as memory:
+            fn()
+        return memory.peak_bytes
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(fn: Callable[[], Any], iterations: int, warmup: int = 3) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result = summarize(times)
+    result['peak_memory_bytes'] = peak_memory(fn)
+    return result
+
+
+def build_benchmark_classifier(work_dir: str, model_path: Optional[str] = None):
+    """
+    Load the given model, or bundle a fixed-seed untrained model into work_dir
+    """
+    from tensorflow import keras
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    classifier = EmergencyVoiceClassifier(model_path) if model_path else EmergencyVoiceClassifier()
+    if model_path:
+        classifier.load_model()
+        return classifier
+
+    keras.utils.set_random_seed(0)
+    X = np.vstack([classifier.extract_features(synthetic_clip(seed)) for seed in range(8)])
+    classifier.scaler.fit(X)
+    classifier.label_encoder.fit(['emergency', 'normal'])
+    classifier.model = classifier.build_model(X.shape[1])
+    bundle_path = os.path.join(work_dir, 'benchmark_model.evb')
+    classifier.save_bundle(bundle_path, metadata={'benchmark': True})
+    classifier = EmergencyVoiceClassifier(bundle_path)
+    classifier.load_model()
+    return classifier
+
+
+def encode_wav(audio: np.ndarray, sr: int) -> bytes:
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def encode_webm(audio: np.ndarray, sr: int) -> Optional[bytes]:
+    """
+    WebM/Opus bytes as a browser MediaRecorder would send, or None without ffmpeg
+    """
+    if shutil.which('ffmpeg') is None:
+        return None
+    from audio_effects import array_to_segment
+
+    buffer = io.BytesIO()
+    array_to_segment(audio, sr).export(buffer, format='webm', codec='libopus')
+    return buffer.getvalue()
+
+
+def feature_cases(classifier, iterations: int, results: Dict[str, Any]):
+    clip = synthetic_clip(1, classifier.duration, classifier.sample_rate)
+    results['extract_features'] = run_case(lambda: classifier.extract_features(clip), iterations)
+
+    # Per-group timings from the extractor's own instrumentation, one sample per call
+    group_times: Dict[str, List[float]] = {}
+    for _ in range(iterations):
+        timings: Dict[str, Dict[str, float]] = {}
+        classifier.extract_features(clip, timings=timings)
+        for name, entry in timings.items():
+            group_times.setdefault(name, []).append(entry['wall_ms'] / 1000.0)
+    for name, times in group_times.items():
+        results[f'extract_features.{name}'] = summarize(times)
+
+    # Per-group peak memory from one traced call (the extractor records it while tracing)
+    timings = {}
+    tracemalloc.start()
+    try:
+        classifier.extract_features(clip, timings=timings)
+    finally:
+        tracemalloc.stop()
+    for name, entry in timings.items():
+        results[f'extract_features.{name}']['peak_memory_bytes'] = entry['peak_memory_bytes']
+
+
+def processing_cases(classifier, iterations: int, results: Dict[str, Any]):
+    import api_server
+
+    clip = synthetic_clip(2, classifier.duration, classifier.sample_rate)
+    results['process_audio_data'] = run_case(
+        lambda: api_server.process_audio_data(clip.copy(), classifier.sample_rate, clf=classifier), iterations)
+    for rate in RESAMPLE_RATES:
+        source = synthetic_clip(2, classifier.duration, rate)
+        results[f'process_audio_data.resample_{rate}'] = run_case(
+            lambda: api_server.process_audio_data(source.copy(), rate, clf=classifier), iterations)
+
+
+def predict_cases(classifier, iterations: int, results: Dict[str, Any]):
+    clip = synthetic_clip(3, classifier.duration, classifier.sample_rate)
+    results['predict'] = run_case(lambda: classifier.predict(clip), iterations)
+
+
+def api_stage_memory(client, request_kwargs: Callable[[], Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Peak traced allocation per /predict stage for one request, read from the
+    server's profile breakdown
+    """
+    import api_server
+
+    profiling_enabled, token = api_server.PROFILING_ENABLED, api_server.PROFILING_TOKEN
+    api_server.PROFILING_ENABLED, api_server.PROFILING_TOKEN = True, None
+    tracemalloc.start()
+    try:
+        response = client.post('/predict', headers={'X-Profile': '1'}, **request_kwargs())
+    finally:
+        tracemalloc.stop()
+        api_server.PROFILING_ENABLED, api_server.PROFILING_TOKEN = profiling_enabled, token
+    stages = response.get_json()['profile']['stages']
+    return {stage['stage']: stage['peak_memory_bytes'] for stage in stages if 'peak_memory_bytes' in stage}
+
+
+def api_cases(classifier, iterations: int, results: Dict[str, Any], skipped: Dict[str, str]):
+    import api_server
+
+    api_server.swap_classifier(classifier)
+    client = api_server.app.test_client()
+    audio = synthetic_clip(4, classifier.duration, API_INPUT_RATE)
+    wav = encode_wav(audio, API_INPUT_RATE)
+    webm = encode_webm(audio, API_INPUT_RATE)
+
+    # Request arguments are rebuilt per call: multipart bodies are consumed by the client
+    encodings: Dict[str, Optional[Callable[[], Dict[str, Any]]]] = {
+        'multipart_wav': lambda: {'data': {'audio': (io.BytesIO(wav), 'clip.wav')},
+                                  'content_type': 'multipart/form-data'},
+        'base64_webm': None if webm is None else lambda: {'json': {
+            'audio_base64': base64.b64encode(webm).decode('ascii'), 'mimeType': 'audio/webm;codecs=opus'}},
+        'audio_array': lambda: {'json': {'audio_array': audio.tolist(), 'sample_rate': API_INPUT_RATE}},
+    }
+
+    def post(request_kwargs):
+        def call():
+            response = client.post('/predict', **request_kwargs())
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        return call
+
+    for encoding, request_kwargs in encodings.items():
+        if request_kwargs is None:
+            skipped[f'api.predict.{encoding}'] = 'ffmpeg not found'
+            continue
+        result = run_case(post(request_kwargs), iterations)
+        result['stage_peak_memory_bytes'] = api_stage_memory(client, request_kwargs)
+        results[f'api.predict.{encoding}'] = result
+
+
+CASE_GROUPS = ('features', 'processing', 'predict', 'api')
+
+
+def run_suite(iterations: int = 30, model_path: Optional[str] = None,
+              groups: Optional[List[str]] = None) -> Dict[str, Any]:
+    # Per-request INFO logs would dominate the API cases
+    logging.disable(logging.INFO)
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        classifier = build_benchmark_classifier(work_dir, model_path)
+        runners = {
+            'features': lambda: feature_cases(classifier, iterations, results),
+            'processing': lambda: processing_cases(classifier, iterations, results),
+            'predict': lambda: predict_cases(classifier, iterations, results),
+            'api': lambda: api_cases(classifier, iterations, results, skipped),
+        }
+        for group in groups or CASE_GROUPS:
+            print(f"Running {group} cases...")
+            runners[group]()
+        model_version = classifier.model_version
+
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+        },
+        'model_version': model_version,
+        'iterations': iterations,
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Cases whose p50 or p95 latency grew by more than `tolerance` (and by at
+    least MIN_REGRESSION_MS) over the baseline
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if (reference[metric] > 0 and result[metric] > reference[metric] * (1 + tolerance)
+                    and result[metric] - reference[metric] >= MIN_REGRESSION_MS):
+                regressions.append({'case': name, 'metric': metric, 'baseline': reference[metric],
+                                    'current': result[metric], 'change': result[metric] / reference[metric] - 1})
+    return regressions
+
+
+def format_results(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    lines = [f"{'case':<40} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}"
+             + (f" {'vs base':>8}" if baseline else '')]
+    for name, r in report['results'].items():
+        peak = f"{r['peak_memory_bytes'] / 1e6:>8.2f}" if 'peak_memory_bytes' in r else f"{'-':>8}"
+        line = f"{name:<40} {r['ops_per_sec']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {peak}"
+        if baseline:
+            reference = baseline['results'].get(name)
+            line += f" {r['p50_ms'] / reference['p50_ms'] - 1:>+8.1%}" if reference else f" {'new':>8}"
+        lines.append(line)
+    for name, reason in report['skipped'].items():
+        lines.append(f"{name:<40} skipped ({reason})")
+    stage_memory = {name: r['stage_peak_memory_bytes'] for name, r in report['results'].items()
+                    if r.get('stage_peak_memory_bytes')}
+    if stage_memory:
+        lines.append('')
+        lines.append('Peak memory by stage (MB):')
+        for name, stages in stage_memory.items():
+            lines.append(f"  {name:<38} " + ', '.join(f"{stage} {value / 1e6:.2f}" for stage, value in stages.items()))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feature extraction, inference and the /predict API')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--model', default=None, help='Model (.evb or .h5) to benchmark instead of a synthetic one')
+    parser.add_argument('--groups', nargs='+', choices=CASE_GROUPS, default=None,
+                        help='Case groups to run (default: all)')
+    parser.add_argument('--output', default=None, help='Write this run as JSON')
+    parser.add_argument('--save-baseline', default=None, help='Write this run as the new baseline')
+    parser.add_argument('--compare', default=None, help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative p50/p95 slowdown before flagging a regression')
+    args = parser.parse_args()
+
+    report = run_suite(args.iterations, args.model, args.groups)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print()
+    print(format_results(report, baseline))
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {path}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for r in regressions:
+                print(f"  {r['case']} {r['metric']}: {r['baseline']:.2f} -> {r['current']:.2f} ms ({r['change']:+.1%})")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
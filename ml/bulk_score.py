@@ -0,0 +1,306 @@
+"""
+Offline bulk scoring of stored recordings
+
+Scores every audio file under a directory tree, or inside a tar/zip
+archive, without going through the HTTP API:
+
+    parent                          workers (spawned processes)
+    list / read archive members --> decode + extract_features_batch per chunk
+    predict_features_batch      <-- feature matrix per chunk
+    append rows to JSONL / CSV
+
+Like predict_from_file, each file is scored on its first `duration` seconds.
+Directory files are read by the workers; archive members are read by the
+parent, sequentially, so compressed tarballs are never seeked, and their
+bytes are handed to the workers. At most `2 x workers` chunks are in
+flight, so memory does not grow with the size of the source.
+
+Resume: after each chunk's rows are flushed, the output's byte offset and
+the chunk's files are appended to `<output>.checkpoint`. A rerun truncates
+the output to the last checkpointed offset (dropping rows from a chunk
+that was interrupted mid-write) and skips every checkpointed file, so each
+file appears exactly once. Pass --restart to start over.
+
+Usage:
+    python bulk_score.py /data/clips --output scores.jsonl --workers 8
+    python bulk_score.py nightly.tar.gz --output scores.csv --model emergency_voice_model.evb
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3', '.m4a', '.webm', '.opus', '.aac')
+OUTPUT_COLUMNS = ['file', 'is_emergency', 'confidence', 'emergency_probability', 'class_label',
+                  'model_version', 'error']
+DEFAULT_CHUNK_SIZE = 32
+
+# Worker state, set by the initializer
+_worker: Dict[str, Any] = {}
+
+
+def is_audio_file(name: str) -> bool:
+    return name.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def iter_directory(root: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (key, item) for audio files under root, in sorted order; keys are relative paths
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if is_audio_file(filename):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root), {'path': path}
+
+
+def iter_archive(path: str, skip: Set[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (key, item) for audio members of a tar or zip archive, with their bytes
+
+    Members in `skip` are passed over without reading their data.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_audio_file(info.filename):
+                    continue
+                if info.filename in skip:
+                    yield info.filename, {}
+                    continue
+                yield info.filename, {'data': archive.read(info), 'name': info.filename}
+        return
+    # Stream mode: members are read in order, without seeking the (compressed) file
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not is_audio_file(member.name):
+                continue
+            if member.name in skip:
+                yield member.name, {}
+                continue
+            yield member.name, {'data': archive.extractfile(member).read(), 'name': member.name}
+
+
+def iter_source(source: str, skip: Set[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if os.path.isdir(source):
+        return iter_directory(source)
+    return iter_archive(source, skip)
+
+
+def _init_bulk_worker(audio_config: Dict[str, Any]):
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    classifier = EmergencyVoiceClassifier()
+    for name, value in audio_config.items():
+        setattr(classifier, name, value)
+    _worker['classifier'] = classifier
+
+
+def _featurize_chunk(chunk: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[str], Optional[np.ndarray], Dict[str, str]]:
+    """
+    Decode a chunk of files and extract their features in one batch
+
+    Returns (keys of decoded files, feature matrix, {key: error} for the rest).
+    """
+    import librosa
+    from batch_io import decode_audio_bytes
+
+    classifier = _worker['classifier']
+    length = int(classifier.sample_rate * classifier.duration)
+    keys, clips, errors = [], [], {}
+    for key, item in chunk:
+        try:
+            if 'path' in item:
+                audio_data, _ = librosa.load(item['path'], sr=classifier.sample_rate, duration=classifier.duration)
+            else:
+                audio_data = decode_audio_bytes(item['data'], item['name'], classifier.sample_rate)[:length]
+            if len(audio_data) == 0:
+                raise ValueError("no audio samples")
+            keys.append(key)
+            clips.append(audio_data)
+        except Exception as e:
+            errors[key] = str(e) or type(e).__name__
+    features = classifier.extract_features_batch(clips) if clips else None
+    return keys, features, errors
+
+
+class ResultWriter:
+    """
+    Appends result rows to a JSONL or CSV file and checkpoints completed files
+    """
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        self.completed: Set[str] = set()
+        offset = 0
+        if restart:
+            for stale in (path, self.checkpoint_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        elif os.path.exists(self.checkpoint_path):
+            valid = 0
+            with open(self.checkpoint_path, 'r+b') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from an interrupted write
+                    offset = entry['offset']
+                    self.completed.update(entry['files'])
+                    valid += len(line)
+                f.truncate(valid)
+        if os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._file = open(path, 'a', newline='')
+        self._csv = None
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore')
+            if offset == 0:
+                self._csv.writeheader()
+        self._checkpoint = open(self.checkpoint_path, 'a')
+
+    def write_chunk(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            if self._csv is not None:
+                self._csv.writerow(row)
+            else:
+                self._file.write(json.dumps(row) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        files = [row['file'] for row in rows]
+        self._checkpoint.write(json.dumps({'offset': self._file.tell(), 'files': files}) + '\n')
+        self._checkpoint.flush()
+        self.completed.update(files)
+
+    def close(self):
+        self._file.close()
+        self._checkpoint.close()
+
+
+def score_rows(classifier, keys: List[str], features: Optional[np.ndarray],
+               errors: Dict[str, str], order: List[str]) -> List[Dict[str, Any]]:
+    """
+    One output row per file of a chunk, in the chunk's original order
+
+    `confidence` is the raw model output (P(class 1), i.e. 'normal');
+    `is_emergency` follows the class label and `emergency_probability` is
+    P(emergency).
+    """
+    predictions = dict(zip(keys, classifier.predict_features_batch(features))) if keys else {}
+    rows = []
+    for key in order:
+        row = {'file': key, 'model_version': classifier.model_version}
+        if key in predictions:
+            prediction = predictions[key]
+            row.update(is_emergency=prediction['class_label'] == 'emergency',
+                       confidence=prediction['confidence'],
+                       emergency_probability=float(classifier.emergency_probability(prediction['confidence'])),
+                       class_label=prediction['class_label'], error=None)
+        else:
+            row.update(is_emergency=None, confidence=None, emergency_probability=None, class_label=None,
+                       error=errors.get(key, 'unknown'))
+        rows.append(row)
+    return rows
+
+
+def bulk_score(source: str, output: str, model_path: str = 'emergency_voice_model.evb',
+               n_workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               restart: bool = False) -> Dict[str, Any]:
+    """
+    Score every audio file in `source` (directory or tar/zip) into `output`
+    """
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    classifier = EmergencyVoiceClassifier(model_path)
+    classifier.load_model()
+    audio_config = {name: getattr(classifier, name)
+                    for name in ('sample_rate', 'duration', 'n_mfcc', 'n_fft', 'hop_length')}
+
+    writer = ResultWriter(output, restart=restart)
+    resumed = len(writer.completed)
+    if resumed:
+        print(f"Resuming: {resumed} files already scored")
+    n_workers = max(1, n_workers or os.cpu_count() or 1)
+    max_in_flight = 2 * n_workers
+
+    def chunks() -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        chunk = []
+        for key, item in iter_source(source, writer.completed):
+            if key in writer.completed:
+                continue
+            chunk.append((key, item))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    scored = failed = 0
+    start = time.time()
+    # Spawned workers, so TensorFlow state from the parent is never forked
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_bulk_worker,
+                                 initargs=(audio_config,)) as executor:
+            pending = {}
+            source_chunks = chunks()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    chunk = next(source_chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    pending[executor.submit(_featurize_chunk, chunk)] = [key for key, _ in chunk]
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    order = pending.pop(future)
+                    keys, features, errors = future.result()
+                    writer.write_chunk(score_rows(classifier, keys, features, errors, order))
+                    scored += len(keys)
+                    failed += len(errors)
+                elapsed = time.time() - start
+                print(f"Scored {scored} files ({failed} failed), "
+                      f"{(scored + failed) / elapsed if elapsed > 0 else 0:.1f} files/s")
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    summary = {'scored': scored, 'failed': failed, 'resumed': resumed,
+               'seconds': elapsed, 'output': output, 'model_version': classifier.model_version}
+    print(f"Done: {scored} scored, {failed} failed in {elapsed:.0f}s -> {output}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a directory tree or tar/zip archive of recordings')
+    parser.add_argument('source', help='Directory, .tar(.gz/.bz2/.xz) or .zip')
+    parser.add_argument('--output', required=True, help='Results file, .jsonl or .csv')
+    parser.add_argument('--model', default='emergency_voice_model.evb')
+    parser.add_argument('--workers', type=int, default=None, help='Decode/featurize processes (default: all CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Files per worker task')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and rescore everything')
+    args = parser.parse_args()
+
+    bulk_score(args.source, args.output, model_path=args.model, n_workers=args.workers,
+               chunk_size=args.chunk_size, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
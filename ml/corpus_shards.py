@@ -0,0 +1,265 @@
+"""
+Canonicalized, sharded audio corpus
+
+compact_corpus() decodes every WAV under dataset/{emergency,normal}/ once,
+resamples it to the classifier's sample rate, pads/trims it to the
+classifier's clip duration and packs the clips into large shard files:
+
+    corpus_index.json   sample rate, clip length, dtype, shard list, clip records,
+                        source manifest (size and mtime of every WAV compacted)
+    labels.npy          one label per clip (0 = emergency, 1 = normal), int8
+    shard-00000.npy     (clips, samples) int16 or float32 array
+    shard-00001.npy     ...
+
+ShardedCorpus opens the shards with np.load(mmap_mode='r'), so training and
+evaluation read fixed-size clips straight from the page cache with no
+per-file open, decode or resample. manifest_changes() compares the
+manifest with the dataset directory as it is now, so callers can tell when
+the shards no longer reflect it and must be rebuilt.
+
+Usage:
+    python corpus_shards.py dataset dataset_shards --dtype int16
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_FILENAME = 'corpus_index.json'
+LABELS = ('emergency', 'normal')
+INT16_SCALE = 32767.0
+
+# Decode parameters for pool workers, set by the initializer
+_decode_params: Dict[str, Any] = {}
+
+
+def _init_decode_worker(sample_rate: int, length: int):
+    _decode_params['sample_rate'] = sample_rate
+    _decode_params['length'] = length
+
+
+def _decode_clip(filepath: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    Decode, resample and pad/trim one file to the canonical clip length
+    """
+    import librosa
+
+    try:
+        sample_rate = _decode_params['sample_rate']
+        length = _decode_params['length']
+        audio, _ = librosa.load(filepath, sr=sample_rate, duration=length / sample_rate)
+        if len(audio) < length:
+            audio = np.pad(audio, (0, length - len(audio)))
+        return audio[:length].astype(np.float32), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _list_clips(dataset_dir: str) -> List[Tuple[str, str]]:
+    entries = []
+    for label in LABELS:
+        label_dir = os.path.join(dataset_dir, label)
+        if os.path.isdir(label_dir):
+            entries.extend((os.path.join(label_dir, name), label)
+                           for name in sorted(os.listdir(label_dir)) if name.endswith('.wav'))
+    return entries
+
+
+def dataset_manifest(dataset_dir: str) -> Dict[str, List[int]]:
+    """
+    {path relative to dataset_dir: [size, mtime_ns]} for every clip compact_corpus() would read
+    """
+    manifest = {}
+    for path, _ in _list_clips(dataset_dir):
+        stat = os.stat(path)
+        manifest[os.path.relpath(path, dataset_dir)] = [stat.st_size, stat.st_mtime_ns]
+    return manifest
+
+
+def manifest_changes(index: Dict[str, Any], dataset_dir: str) -> List[str]:
+    """
+    Differences between a corpus index's manifest and dataset_dir, one line each
+
+    An empty list means the shards were built from exactly the clips now in
+    dataset_dir. Indexes written before the manifest existed cannot be
+    checked and are reported as changed.
+    """
+    recorded = index.get('manifest')
+    if recorded is None:
+        return ['corpus index has no source manifest (built by an older corpus_shards.py)']
+    current = dataset_manifest(dataset_dir)
+    changes = [f'added: {path}' for path in sorted(current.keys() - recorded.keys())]
+    changes += [f'removed: {path}' for path in sorted(recorded.keys() - current.keys())]
+    changes += [f'modified: {path}' for path in sorted(current.keys() & recorded.keys())
+                if list(current[path]) != list(recorded[path])]
+    return changes
+
+
+def compact_corpus(dataset_dir: str, output_dir: str, sample_rate: int = 22050, duration: float = 3.0,
+                   dtype: str = 'int16', shard_size: int = 1024, n_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Decode, canonicalize and pack a WAV dataset into memory-mappable shards
+    """
+    if dtype not in ('int16', 'float32'):
+        raise ValueError("dtype must be 'int16' or 'float32'")
+
+    entries = _list_clips(dataset_dir)
+    # Stat before decoding, so a file rewritten during compaction shows up as modified
+    manifest = dataset_manifest(dataset_dir)
+    length = int(sample_rate * duration)
+    n_workers = max(1, n_workers or os.cpu_count() or 1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Compacting {len(entries)} clips into shards of {shard_size} ({dtype}, {sample_rate}Hz, {duration}s)")
+    start = time.time()
+
+    clips = []
+    labels = []
+    shards = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_decode_worker,
+                             initargs=(sample_rate, length)) as executor:
+        for group_start in range(0, len(entries), shard_size):
+            group = entries[group_start:group_start + shard_size]
+            decoded = executor.map(_decode_clip, [path for path, _ in group],
+                                   chunksize=max(1, len(group) // (n_workers * 4)))
+            rows = []
+            for (path, label), (audio, error) in zip(group, decoded):
+                if audio is None:
+                    errors.append({'path': path, 'error': error})
+                    continue
+                rows.append(audio)
+                clips.append({
+                    'path': os.path.relpath(path, dataset_dir),
+                    'label': label,
+                    'shard': len(shards),
+                    'row': len(rows) - 1
+                })
+                labels.append(LABELS.index(label))
+            if not rows:
+                continue
+
+            block = np.stack(rows)
+            if dtype == 'int16':
+                block = np.round(np.clip(block, -1.0, 1.0) * INT16_SCALE).astype(np.int16)
+            shard_name = f'shard-{len(shards):05d}.npy'
+            np.save(os.path.join(output_dir, shard_name), block)
+            shards.append({'file': shard_name, 'clips': len(rows)})
+            print(f"Wrote {shard_name}: {len(rows)} clips ({group_start + len(group)}/{len(entries)} files, "
+                  f"{time.time() - start:.1f}s)")
+
+    np.save(os.path.join(output_dir, 'labels.npy'), np.asarray(labels, dtype=np.int8))
+    index = {
+        'format_version': 2,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'source_dir': os.path.abspath(dataset_dir),
+        'sample_rate': sample_rate,
+        'duration': duration,
+        'length': length,
+        'dtype': dtype,
+        'scale': 1.0 / INT16_SCALE if dtype == 'int16' else 1.0,
+        'label_names': list(LABELS),
+        'shards': shards,
+        'clips': clips,
+        'errors': errors,
+        'manifest': manifest
+    }
+    tmp_path = os.path.join(output_dir, INDEX_FILENAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(output_dir, INDEX_FILENAME))
+
+    print(f"Corpus compacted: {len(clips)} clips in {len(shards)} shards, {len(errors)} errors, "
+          f"{time.time() - start:.1f}s")
+    return index
+
+
+class ShardedCorpus:
+    """
+    Read-only, memory-mapped view of a compacted corpus
+    """
+
+    def __init__(self, corpus_dir: str):
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, INDEX_FILENAME)) as f:
+            self.index = json.load(f)
+        self.sample_rate = self.index['sample_rate']
+        self.duration = self.index['duration']
+        self.length = self.index['length']
+        self.scale = self.index['scale']
+        self.label_names = self.index['label_names']
+        self.clips = self.index['clips']
+        self.labels = np.load(os.path.join(corpus_dir, 'labels.npy'), mmap_mode='r')
+        self.shards = [np.load(os.path.join(corpus_dir, shard['file']), mmap_mode='r')
+                       for shard in self.index['shards']]
+        # Global clip index -> (shard, row) as flat arrays for vectorised lookup
+        self._shard_of = np.array([clip['shard'] for clip in self.clips], dtype=np.int32)
+        self._row_of = np.array([clip['row'] for clip in self.clips], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.clips)
+
+    def label_name(self, i: int) -> str:
+        return self.label_names[int(self.labels[i])]
+
+    def raw_clip(self, i: int) -> np.ndarray:
+        """
+        Clip i exactly as stored in its shard (int16 or float32)
+        """
+        return self.shards[self._shard_of[i]][self._row_of[i]]
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """
+        Clip i as float32 in [-1, 1]
+        """
+        raw = self.shards[self._shard_of[i]][self._row_of[i]]
+        return raw.astype(np.float32) * np.float32(self.scale) if raw.dtype == np.int16 else np.array(raw)
+
+    def get_batch(self, indices) -> np.ndarray:
+        """
+        Gather several clips into one (n, length) float32 array
+        """
+        indices = np.asarray(indices)
+        out = np.empty((len(indices), self.length), dtype=np.float32)
+        for shard_index in np.unique(self._shard_of[indices]):
+            positions = np.nonzero(self._shard_of[indices] == shard_index)[0]
+            rows = self._row_of[indices[positions]]
+            order = np.argsort(rows)
+            block = self.shards[shard_index][rows[order]]
+            out[positions[order]] = block * np.float32(self.scale) if block.dtype == np.int16 else block
+        return out
+
+    def iter_batches(self, indices=None, batch_size: int = 256) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (clips, labels) batches in the given index order
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        indices = np.asarray(indices)
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            yield self.get_batch(batch), np.asarray(self.labels[batch])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack a WAV dataset into memory-mappable shards')
+    parser.add_argument('dataset_dir', nargs='?', default='dataset')
+    parser.add_argument('output_dir', nargs='?', default='dataset_shards')
+    parser.add_argument('--sample-rate', type=int, default=22050)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--dtype', choices=['int16', 'float32'], default='int16')
+    parser.add_argument('--shard-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    compact_corpus(args.dataset_dir, args.output_dir, sample_rate=args.sample_rate, duration=args.duration,
+                   dtype=args.dtype, shard_size=args.shard_size, n_workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
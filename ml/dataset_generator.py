@@ -1,22 +1,69 @@
 import numpy as np
 import librosa
 import soundfile as sf
-from gtts import gTTS
 import os
 import pandas as pd
 from pydub import AudioSegment
-from pydub.generators import Sine, WhiteNoise
 import random
-import tempfile
-from typing import List, Tuple
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 import warnings
+import audio_effects
+from audio_effects import segment_to_array, array_to_segment
+from tts_engines import CachedSynthesizer, get_synthesizer
 warnings.filterwarnings('ignore')
 
+LABELS = ('emergency', 'normal')
+METADATA_COLUMNS = ['filepath', 'label', 'category', 'filename', 'phrase', 'language', 'seed']
+
+# Generator instance for pool workers, set by the initializer
+_worker_generator = None
+
+
+def _sample_key(path: str) -> str:
+    """
+    `<label>/<filename>` of a sample path, for matching metadata rows
+
+    Rows may have been written on Windows (backslashes) or relative to
+    another working directory, so only the part under the dataset
+    directory is compared.
+    """
+    parts = os.path.normpath(str(path).replace('\\', '/')).split(os.sep)
+    return '/'.join(parts[-2:])
+
+
+def _init_generation_worker(output_dir: str, engine: str, tts_cache_dir: Optional[str]):
+    global _worker_generator
+    _worker_generator = EmergencyVoiceDatasetGenerator(output_dir, engine=engine, use_tts_cache=bool(tts_cache_dir),
+                                                       tts_cache_dir=tts_cache_dir)
+
+
+def _generate_sample_task(task: Tuple[str, int, int]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    label, index, seed = task
+    try:
+        return _worker_generator.generate_sample(label, index, seed), None
+    except Exception as e:
+        return None, f"{label} sample {index}: {e}"
+
+
 class EmergencyVoiceDatasetGenerator:
-    def __init__(self, output_dir: str = 'dataset'):
+    def __init__(self, output_dir: str = 'dataset', engine: str = 'gtts', use_tts_cache: bool = True,
+                 tts_cache_dir: Optional[str] = None):
         self.output_dir = output_dir
         self.sample_rate = 22050
         self.duration = 3000  # milliseconds for pydub
+        self.rng = np.random.default_rng()
+        
+        # TTS engine, with base utterances cached per (phrase, lang, engine)
+        self.engine = engine
+        self.tts_cache_dir = (tts_cache_dir or os.path.join(output_dir, '.tts_cache')) if use_tts_cache else None
+        self.synthesizer = get_synthesizer(engine)
+        if self.tts_cache_dir:
+            self.synthesizer = CachedSynthesizer(self.synthesizer, self.tts_cache_dir)
         
         # Create output directories
         os.makedirs(f"{output_dir}/emergency", exist_ok=True)
@@ -113,85 +160,65 @@ class EmergencyVoiceDatasetGenerator:
         # Available languages for TTS
         self.languages = ['en', 'en-us', 'en-uk', 'en-au']
         
+    # The effects below run on float32 arrays (audio_effects.py); AudioSegments
+    # are converted once on the way in and once on the way out
+    
     def add_noise(self, audio: AudioSegment, noise_level: float = 0.1) -> AudioSegment:
         """
         Add background noise to audio
         """
-        noise = WhiteNoise().to_audio_segment(duration=len(audio))
-        noise = noise - (60 - noise_level * 60)  # Adjust noise level
-        return audio.overlay(noise)
+        samples = audio_effects.add_noise(segment_to_array(audio), noise_level, self.rng)
+        return array_to_segment(samples, audio.frame_rate)
     
     def change_speed(self, audio: AudioSegment, speed_factor: float) -> AudioSegment:
         """
         Change the speed of audio
         """
-        return audio.speedup(playback_speed=speed_factor)
+        samples = audio_effects.change_speed(segment_to_array(audio), speed_factor, audio.frame_rate)
+        return array_to_segment(samples, audio.frame_rate)
     
     def change_pitch(self, audio: AudioSegment, semitones: int) -> AudioSegment:
         """
         Change the pitch of audio
         """
-        new_sample_rate = int(audio.frame_rate * (2.0 ** (semitones / 12.0)))
-        return audio._spawn(audio.raw_data, overrides={"frame_rate": new_sample_rate}).set_frame_rate(audio.frame_rate)
+        samples = audio_effects.change_pitch(segment_to_array(audio), semitones)
+        return array_to_segment(samples, audio.frame_rate)
     
     def add_echo(self, audio: AudioSegment, delay_ms: int = 100, decay: float = 0.3) -> AudioSegment:
         """
         Add echo effect to audio
         """
-        echo = audio - (60 - decay * 60)  # Reduce volume for echo
-        echo = AudioSegment.silent(duration=delay_ms) + echo
-        return audio.overlay(echo)
+        samples = audio_effects.add_echo(segment_to_array(audio), delay_ms, decay, audio.frame_rate)
+        return array_to_segment(samples, audio.frame_rate)
     
     def simulate_emergency_stress(self, audio: AudioSegment) -> AudioSegment:
         """
         Apply effects to simulate stress/panic in emergency situations
+        (faster speech, pitch variation, background noise, sometimes echo)
         """
-        # Increase speed slightly (panic speech)
-        audio = self.change_speed(audio, random.uniform(1.1, 1.3))
-        
-        # Slight pitch variation
-        audio = self.change_pitch(audio, random.randint(-2, 3))
-        
-        # Add some background noise
-        audio = self.add_noise(audio, random.uniform(0.05, 0.15))
-        
-        # Sometimes add echo (shouting in a room)
-        if random.random() < 0.3:
-            audio = self.add_echo(audio, random.randint(50, 150), random.uniform(0.2, 0.4))
-        
-        return audio
+        samples = audio_effects.simulate_emergency_stress(segment_to_array(audio), audio.frame_rate, self.rng)
+        return array_to_segment(samples, audio.frame_rate)
     
     def simulate_normal_conversation(self, audio: AudioSegment) -> AudioSegment:
         """
         Apply effects to simulate normal conversation
+        (speed and pitch variation, minimal background noise)
         """
-        # Normal speed variation
-        audio = self.change_speed(audio, random.uniform(0.9, 1.1))
-        
-        # Slight pitch variation
-        audio = self.change_pitch(audio, random.randint(-1, 1))
-        
-        # Minimal background noise
-        audio = self.add_noise(audio, random.uniform(0.01, 0.05))
-        
-        return audio
+        samples = audio_effects.simulate_normal_conversation(segment_to_array(audio), audio.frame_rate, self.rng)
+        return array_to_segment(samples, audio.frame_rate)
+    
+    def synthesize_tts(self, text: str, lang: str = 'en') -> AudioSegment:
+        """
+        Generate audio from text using TTS, raising on failure
+        """
+        return self.synthesizer.synthesize(text, lang)
     
     def generate_tts_audio(self, text: str, lang: str = 'en') -> AudioSegment:
         """
         Generate audio from text using TTS
         """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-                tts = gTTS(text=text, lang=lang, slow=False)
-                tts.save(tmp_file.name)
-                
-                # Load and convert to AudioSegment
-                audio = AudioSegment.from_mp3(tmp_file.name)
-                
-                # Clean up temp file
-                os.unlink(tmp_file.name)
-                
-                return audio
+            return self.synthesize_tts(text, lang)
         except Exception as e:
             print(f"Error generating TTS for '{text}': {e}")
             # Return silence if TTS fails
@@ -277,6 +304,163 @@ class EmergencyVoiceDatasetGenerator:
         
         return generated_files
     
+    def sample_path(self, label: str, index: int) -> str:
+        return os.path.join(self.output_dir, label, f"{label}_{index:04d}.wav")
+    
+    def sample_plan(self, label: str, index: int, seed: int) -> Tuple[np.random.Generator, str, str]:
+        """
+        Per-sample random generator, phrase and language
+        
+        Everything random about a sample is drawn from a generator seeded by
+        (seed, label, index), so a sample's content does not depend on which
+        worker produces it or on what was generated before it.
+        """
+        rng = np.random.default_rng(np.random.SeedSequence([seed, LABELS.index(label), index]))
+        phrases = self.emergency_phrases if label == 'emergency' else self.normal_phrases
+        phrase = phrases[rng.integers(len(phrases))]
+        lang = self.languages[rng.integers(len(self.languages))]
+        return rng, phrase, lang
+    
+    def metadata_row(self, label: str, index: int, seed: int, phrase: str, lang: str) -> Dict[str, Any]:
+        filepath = self.sample_path(label, index)
+        return {
+            'filepath': filepath,
+            'label': label,
+            'category': label,
+            'filename': os.path.basename(filepath),
+            'phrase': phrase,
+            'language': lang,
+            'seed': seed
+        }
+    
+    def generate_sample(self, label: str, index: int, seed: int) -> Dict[str, Any]:
+        """
+        Generate, augment and save one sample; returns its metadata row
+        
+        The WAV is written to a temporary name and renamed into place, so an
+        interrupted run never leaves a truncated file that looks complete.
+        Its metadata row is written to a `<wav>.meta.json` sidecar before the
+        rename, so a WAV from a run interrupted before the row reached
+        dataset_metadata.csv can be recorded without guessing its content.
+        """
+        rng, phrase, lang = self.sample_plan(label, index, seed)
+        audio = self.synthesize_tts(phrase, lang)
+        
+        recipe = (audio_effects.simulate_emergency_stress if label == 'emergency'
+                  else audio_effects.simulate_normal_conversation)
+        audio = array_to_segment(recipe(segment_to_array(audio), audio.frame_rate, rng), audio.frame_rate)
+        
+        # Ensure duration is consistent
+        if len(audio) > self.duration:
+            audio = audio[:self.duration]
+        else:
+            audio = audio + AudioSegment.silent(duration=self.duration - len(audio), frame_rate=audio.frame_rate)
+        
+        filepath = self.sample_path(label, index)
+        row = self.metadata_row(label, index, seed, phrase, lang)
+        tmp_path = filepath + '.partial'
+        audio.export(tmp_path, format="wav")
+        with open(filepath + '.meta.json', 'w') as f:
+            json.dump(row, f)
+        os.replace(tmp_path, filepath)
+        return row
+    
+    def generate_dataset_parallel(self, emergency_samples: int = 300, normal_samples: int = 300,
+                                  n_workers: Optional[int] = None, seed: int = 0) -> pd.DataFrame:
+        """
+        Generate the dataset on a process pool, resuming an interrupted run
+        
+        Samples whose WAV already exists are skipped, and each finished
+        sample is appended to dataset_metadata.csv immediately; existing rows
+        are never rewritten. A WAV missing from the CSV is only recorded from
+        the `.meta.json` sidecar generate_sample() wrote for it; WAVs without
+        one were not made by this generator and are left unrecorded. Output
+        is identical for any worker count given the same seed.
+        """
+        n_workers = max(1, n_workers or os.cpu_count() or 1)
+        metadata_path = os.path.join(self.output_dir, 'dataset_metadata.csv')
+        
+        # Rows keyed by <label>/<filename>; existing ones are kept as written
+        rows: Dict[str, Dict[str, Any]] = {}
+        fieldnames = METADATA_COLUMNS
+        if os.path.exists(metadata_path) and os.path.getsize(metadata_path) > 0:
+            existing = pd.read_csv(metadata_path)
+            fieldnames = list(existing.columns)
+            for row in existing.to_dict('records'):
+                rows[_sample_key(row['filepath'])] = row
+        
+        tasks = []
+        recovered = []
+        unrecorded = []
+        for label, count in (('emergency', emergency_samples), ('normal', normal_samples)):
+            for index in range(count):
+                filepath = self.sample_path(label, index)
+                if not os.path.exists(filepath):
+                    tasks.append((label, index, seed))
+                elif _sample_key(filepath) not in rows:
+                    sidecar = filepath + '.meta.json'
+                    if os.path.exists(sidecar):
+                        # Written before an interruption but not yet recorded
+                        with open(sidecar) as f:
+                            recovered.append(json.load(f))
+                    else:
+                        unrecorded.append(filepath)
+        if unrecorded:
+            print(f"{len(unrecorded)} existing WAVs are not in {metadata_path} and have no generation "
+                  f"record; leaving them unrecorded (e.g. {unrecorded[0]})")
+        
+        total = emergency_samples + normal_samples
+        print(f"Generating {len(tasks)} samples with {n_workers} workers "
+              f"({total - len(tasks)}/{total} already present, seed {seed})")
+        start = time.time()
+        errors = []
+        write_header = not os.path.exists(metadata_path) or os.path.getsize(metadata_path) == 0
+        with open(metadata_path, 'a', newline='') as f:
+            # An older CSV may have fewer columns; new rows follow its header
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            if write_header:
+                writer.writeheader()
+            
+            def record(row, error):
+                if row is None:
+                    errors.append(error)
+                    print(f"Error generating {error}")
+                    return
+                writer.writerow(row)
+                f.flush()
+                rows[_sample_key(row['filepath'])] = row
+                sidecar = row['filepath'] + '.meta.json'
+                if os.path.exists(sidecar):
+                    os.remove(sidecar)
+                done = len(rows)
+                if done % 50 == 0:
+                    print(f"Generated {done}/{total} samples ({time.time() - start:.1f}s)")
+            
+            for row in recovered:
+                record(row, None)
+            
+            if n_workers == 1:
+                _init_generation_worker(self.output_dir, self.engine, self.tts_cache_dir)
+                for task in tasks:
+                    record(*_generate_sample_task(task))
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_generation_worker,
+                                         initargs=(self.output_dir, self.engine, self.tts_cache_dir)) as executor:
+                    futures = [executor.submit(_generate_sample_task, task) for task in tasks]
+                    for future in as_completed(futures):
+                        record(*future.result())
+        
+        df = pd.DataFrame(sorted(rows.values(), key=lambda row: (LABELS.index(row['label']), row['filename'])),
+                          columns=fieldnames)
+        
+        print(f"\nDataset generation complete in {time.time() - start:.1f}s")
+        print(f"Emergency samples: {int((df['label'] == 'emergency').sum())}")
+        print(f"Normal samples: {int((df['label'] == 'normal').sum())}")
+        print(f"Recovered from sidecars: {len(recovered)}")
+        print(f"Errors: {len(errors)} (rerun to retry)")
+        print(f"Dataset saved in: {self.output_dir}")
+        return df
+    
     def create_dataset_metadata(self, emergency_files: List[str], normal_files: List[str]) -> pd.DataFrame:
         """
         Create metadata DataFrame for the dataset
@@ -333,8 +517,27 @@ class EmergencyVoiceDatasetGenerator:
         return metadata_df
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate the synthetic emergency voice dataset')
+    parser.add_argument('--output-dir', default='dataset')
+    parser.add_argument('--emergency', type=int, default=250)
+    parser.add_argument('--normal', type=int, default=250)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel, resumable generation on this many processes')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Parallel, resumable generation with per-sample seeds derived from this seed')
+    parser.add_argument('--engine', default='gtts', help='TTS engine: gtts (network) or espeak (offline)')
+    parser.add_argument('--tts-cache', default=None, help='TTS utterance cache directory (default: <output-dir>/.tts_cache)')
+    parser.add_argument('--no-tts-cache', action='store_true')
+    args = parser.parse_args()
+    
     # Generate dataset
-    generator = EmergencyVoiceDatasetGenerator()
-    dataset_df = generator.generate_complete_dataset(emergency_samples=250, normal_samples=250)
+    generator = EmergencyVoiceDatasetGenerator(args.output_dir, engine=args.engine, use_tts_cache=not args.no_tts_cache,
+                                               tts_cache_dir=args.tts_cache)
+    if args.workers is not None or args.seed is not None:
+        dataset_df = generator.generate_dataset_parallel(args.emergency, args.normal,
+                                                         n_workers=args.workers, seed=args.seed or 0)
+    else:
+        dataset_df = generator.generate_complete_dataset(emergency_samples=args.emergency,
+                                                         normal_samples=args.normal)
     print("\nDataset summary:")
     print(dataset_df.groupby('label').size())
\ No newline at end of file
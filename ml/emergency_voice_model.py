@@ -10,17 +10,45 @@ from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import os
 import json
-from typing import Tuple, List, Dict, Any
+import hashlib
+from contextlib import nullcontext
+from typing import Tuple, List, Dict, Any, Optional, Iterator
+from profiling import time_feature_group
+from memory_profiling import record_peak, is_tracing
+import model_bundle
 import warnings
 warnings.filterwarnings('ignore')
 
+# Bump whenever extract_features changes what it computes or in which order,
+# so bundles and cached features from an older feature set are rejected
+FEATURE_SET_VERSION = 'v1'
+
+# Default network shape; build_model accepts overrides (see model_search.py)
+DEFAULT_HIDDEN_UNITS = (256, 128, 64, 32, 16)
+DEFAULT_DROPOUT_RATES = (0.3, 0.3, 0.2, 0.2, 0.0)
+DEFAULT_BATCH_NORM_LAYERS = 3
+DEFAULT_LEARNING_RATE = 0.001
+
 class EmergencyVoiceClassifier:
-    def __init__(self, model_path: str = 'emergency_voice_model.h5'):
+    def __init__(self, model_path: str = 'emergency_voice_model.h5',
+                 scaler_path: str = 'scaler.pkl', label_encoder_path: str = 'label_encoder.pkl'):
         self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.label_encoder_path = label_encoder_path
         self.model = None
+        self.model_version = None
+        self.threshold = 0.5
+        self.bundle_metadata = {}
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
         self.feature_columns = []
+        self.training_config = None
+        self.throughput = None
+        self.memory_profile = None
+        # Positions in the training X of the validation split (set by train)
+        self.validation_indices = None
+        # Models for the first 1 s, 2 s, ... of a clip (predict_progressive), shortest first
+        self.prefix_models = []
         
         # Audio processing parameters
         self.sample_rate = 22050
@@ -29,12 +57,22 @@ class EmergencyVoiceClassifier:
         self.n_fft = 2048
         self.hop_length = 512
         
-    def extract_features(self, audio_data: np.ndarray, sr: int = None) -> np.ndarray:
+    def extract_features(self, audio_data: np.ndarray, sr: int = None,
+                         timings: Optional[Dict[str, Dict[str, float]]] = None,
+                         raise_on_error: bool = False) -> np.ndarray:
         """
         Extract comprehensive audio features for emergency detection
+        
+        If `timings` is given, wall and CPU time per feature group are
+        accumulated into it (used by the API profiling mode). A failed
+        extraction returns all-zero features unless `raise_on_error`, which
+        training uses so that failures are dropped instead of learned from.
         """
         if sr is None:
             sr = self.sample_rate
+        
+        def group(name):
+            return time_feature_group(timings, name) if timings is not None else nullcontext()
             
         features = []
         
@@ -47,16 +85,18 @@ class EmergencyVoiceClassifier:
                 audio_data = np.pad(audio_data, (0, target_length - len(audio_data)))
             
             # 1. MFCC features (Mel-frequency cepstral coefficients)
-            mfccs = librosa.feature.mfcc(y=audio_data, sr=sr, n_mfcc=self.n_mfcc)
-            mfcc_mean = np.mean(mfccs, axis=1)
-            mfcc_std = np.std(mfccs, axis=1)
+            with group('mfcc'):
+                mfccs = librosa.feature.mfcc(y=audio_data, sr=sr, n_mfcc=self.n_mfcc)
+                mfcc_mean = np.mean(mfccs, axis=1)
+                mfcc_std = np.std(mfccs, axis=1)
             features.extend(mfcc_mean)
             features.extend(mfcc_std)
             
             # 2. Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio_data, sr=sr)[0]
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio_data, sr=sr)[0]
+            with group('spectral'):
+                spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sr)[0]
+                spectral_rolloff = librosa.feature.spectral_rolloff(y=audio_data, sr=sr)[0]
+                spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio_data, sr=sr)[0]
             
             features.extend([
                 np.mean(spectral_centroids),
@@ -68,102 +108,250 @@ class EmergencyVoiceClassifier:
             ])
             
             # 3. Zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(audio_data)[0]
+            with group('zcr'):
+                zcr = librosa.feature.zero_crossing_rate(audio_data)[0]
             features.extend([np.mean(zcr), np.std(zcr)])
             
             # 4. Chroma features
-            chroma = librosa.feature.chroma_stft(y=audio_data, sr=sr)
+            with group('chroma'):
+                chroma = librosa.feature.chroma_stft(y=audio_data, sr=sr)
             features.extend([np.mean(chroma), np.std(chroma)])
             
             # 5. Tempo and rhythm
-            tempo, _ = librosa.beat.beat_track(y=audio_data, sr=sr)
+            with group('tempo'):
+                tempo, _ = librosa.beat.beat_track(y=audio_data, sr=sr)
             features.append(tempo)
             
             # 6. RMS Energy
-            rms = librosa.feature.rms(y=audio_data)[0]
+            with group('rms'):
+                rms = librosa.feature.rms(y=audio_data)[0]
             features.extend([np.mean(rms), np.std(rms)])
             
             # 7. Pitch and fundamental frequency
-            pitches, magnitudes = librosa.piptrack(y=audio_data, sr=sr)
-            pitch_mean = np.mean(pitches[pitches > 0]) if np.any(pitches > 0) else 0
+            with group('pitch'):
+                pitches, magnitudes = librosa.piptrack(y=audio_data, sr=sr)
+                pitch_mean = np.mean(pitches[pitches > 0]) if np.any(pitches > 0) else 0
             features.append(pitch_mean)
             
             # 8. Spectral contrast
-            contrast = librosa.feature.spectral_contrast(y=audio_data, sr=sr)
+            with group('contrast'):
+                contrast = librosa.feature.spectral_contrast(y=audio_data, sr=sr)
             features.extend([np.mean(contrast), np.std(contrast)])
             
             # 9. Tonnetz (harmonic features)
-            tonnetz = librosa.feature.tonnetz(y=audio_data, sr=sr)
+            with group('tonnetz'):
+                tonnetz = librosa.feature.tonnetz(y=audio_data, sr=sr)
             features.extend([np.mean(tonnetz), np.std(tonnetz)])
             
             return np.array(features)
             
         except Exception as e:
+            if raise_on_error:
+                raise
             print(f"Error extracting features: {e}")
             # Return zero features if extraction fails
             return np.zeros(self.get_feature_count())
     
+    def extract_features_batch(self, clips: List[np.ndarray], sr: int = None,
+                               timings: Optional[Dict[str, Dict[str, float]]] = None) -> np.ndarray:
+        """
+        Extract features for several clips at once; one row per clip
+        
+        Gives the same features as extract_features (to float32 rounding),
+        but computes the STFT and mel spectrogram once for the whole batch
+        and reuses them for MFCC, spectral, chroma, onset/tempo, pitch and
+        contrast features instead of recomputing them per feature. Time-domain
+        features (ZCR, RMS) and tonnetz (CQT-based) are computed per clip.
+        """
+        if sr is None:
+            sr = self.sample_rate
+        if len(clips) == 0:
+            return np.zeros((0, self.get_feature_count()))
+        
+        def group(name):
+            return time_feature_group(timings, name) if timings is not None else nullcontext()
+        
+        target_length = int(sr * self.duration)
+        batch = np.zeros((len(clips), target_length), dtype=np.float32)
+        for i, clip in enumerate(clips):
+            clip = np.asarray(clip, dtype=np.float32)[:target_length]
+            batch[i, :len(clip)] = clip
+        
+        try:
+            with group('stft'):
+                magnitude = np.abs(librosa.stft(batch, n_fft=self.n_fft, hop_length=self.hop_length))
+                power = magnitude ** 2
+                mel = librosa.feature.melspectrogram(S=power, sr=sr)
+            
+            rows = []
+            for i, audio_data in enumerate(batch):
+                S = magnitude[i]
+                features = []
+                
+                with group('mfcc'):
+                    # power_to_db clips relative to the maximum, so it must run per clip
+                    mel_db = librosa.power_to_db(mel[i])
+                    mfccs = librosa.feature.mfcc(S=mel_db, n_mfcc=self.n_mfcc)
+                features.extend(np.mean(mfccs, axis=1))
+                features.extend(np.std(mfccs, axis=1))
+                
+                with group('spectral'):
+                    spectral_centroids = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
+                    spectral_rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)[0]
+                    spectral_bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]
+                features.extend([
+                    np.mean(spectral_centroids), np.std(spectral_centroids),
+                    np.mean(spectral_rolloff), np.std(spectral_rolloff),
+                    np.mean(spectral_bandwidth), np.std(spectral_bandwidth)
+                ])
+                
+                with group('zcr'):
+                    zcr = librosa.feature.zero_crossing_rate(audio_data)[0]
+                features.extend([np.mean(zcr), np.std(zcr)])
+                
+                with group('chroma'):
+                    chroma = librosa.feature.chroma_stft(S=power[i], sr=sr)
+                features.extend([np.mean(chroma), np.std(chroma)])
+                
+                with group('tempo'):
+                    # Same onset envelope beat_track(y=...) computes internally
+                    onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+                    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr)
+                features.append(tempo)
+                
+                with group('rms'):
+                    rms = librosa.feature.rms(y=audio_data)[0]
+                features.extend([np.mean(rms), np.std(rms)])
+                
+                with group('pitch'):
+                    pitches, magnitudes = librosa.piptrack(S=S, sr=sr)
+                    pitch_mean = np.mean(pitches[pitches > 0]) if np.any(pitches > 0) else 0
+                features.append(pitch_mean)
+                
+                with group('contrast'):
+                    contrast = librosa.feature.spectral_contrast(S=S, sr=sr)
+                features.extend([np.mean(contrast), np.std(contrast)])
+                
+                with group('tonnetz'):
+                    tonnetz = librosa.feature.tonnetz(y=audio_data, sr=sr)
+                features.extend([np.mean(tonnetz), np.std(tonnetz)])
+                
+                rows.append(features)
+            
+            return np.array(rows, dtype=np.float64)
+        
+        except Exception as e:
+            print(f"Batched feature extraction failed ({e}), extracting per clip")
+            return np.array([self.extract_features(clip, sr) for clip in batch])
+    
     def get_feature_count(self) -> int:
         """Get the expected number of features"""
         return (self.n_mfcc * 2) + 6 + 2 + 2 + 1 + 2 + 1 + 2 + 2
     
-    def build_model(self, input_shape: int) -> keras.Model:
+    def get_feature_names(self) -> List[str]:
+        """Names of the features returned by extract_features, in order"""
+        names = [f'mfcc_{i}_mean' for i in range(self.n_mfcc)]
+        names += [f'mfcc_{i}_std' for i in range(self.n_mfcc)]
+        names += ['spectral_centroid_mean', 'spectral_centroid_std',
+                  'spectral_rolloff_mean', 'spectral_rolloff_std',
+                  'spectral_bandwidth_mean', 'spectral_bandwidth_std',
+                  'zcr_mean', 'zcr_std', 'chroma_mean', 'chroma_std', 'tempo',
+                  'rms_mean', 'rms_std', 'pitch_mean', 'contrast_mean', 'contrast_std',
+                  'tonnetz_mean', 'tonnetz_std']
+        return names
+    
+    def get_feature_set(self) -> Dict[str, Any]:
+        """Definition of the feature set, stored in bundles and feature caches"""
+        return {
+            'version': FEATURE_SET_VERSION,
+            'count': self.get_feature_count(),
+            'names': self.get_feature_names(),
+            'sample_rate': self.sample_rate,
+            'duration': self.duration,
+            'n_mfcc': self.n_mfcc
+        }
+    
+    def build_model(self, input_shape: int, hidden_units: Optional[List[int]] = None,
+                    dropout_rates: Optional[List[float]] = None,
+                    batch_norm_layers: int = DEFAULT_BATCH_NORM_LAYERS,
+                    learning_rate: float = DEFAULT_LEARNING_RATE, jit_compile: bool = False) -> keras.Model:
         """
         Build a deep neural network for emergency voice classification
+        
+        Each hidden layer is Dense(relu), followed by BatchNormalization for
+        the first `batch_norm_layers` layers and by Dropout where its rate
+        is non-zero. The defaults give the original 256-128-64-32-16 network.
         """
-        model = keras.Sequential([
-            layers.Dense(256, activation='relu', input_shape=(input_shape,)),
-            layers.BatchNormalization(),
-            layers.Dropout(0.3),
-            
-            layers.Dense(128, activation='relu'),
-            layers.BatchNormalization(),
-            layers.Dropout(0.3),
-            
-            layers.Dense(64, activation='relu'),
-            layers.BatchNormalization(),
-            layers.Dropout(0.2),
-            
-            layers.Dense(32, activation='relu'),
-            layers.Dropout(0.2),
-            
-            layers.Dense(16, activation='relu'),
-            
-            # Output layer for binary classification (emergency vs normal)
-            layers.Dense(1, activation='sigmoid')
-        ])
+        hidden_units = list(hidden_units or DEFAULT_HIDDEN_UNITS)
+        dropout_rates = list(dropout_rates if dropout_rates is not None else DEFAULT_DROPOUT_RATES)
+        if len(dropout_rates) != len(hidden_units):
+            raise ValueError("dropout_rates must have one entry per hidden layer")
+        
+        model = keras.Sequential([layers.InputLayer(input_shape=(input_shape,))])
+        for i, (units, rate) in enumerate(zip(hidden_units, dropout_rates)):
+            model.add(layers.Dense(units, activation='relu'))
+            if i < batch_norm_layers:
+                model.add(layers.BatchNormalization())
+            if rate > 0:
+                model.add(layers.Dropout(rate))
+        
+        # Output layer for binary classification (emergency vs normal)
+        model.add(layers.Dense(1, activation='sigmoid'))
         
         model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=0.001),
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
             loss='binary_crossentropy',
-            metrics=['accuracy', tf.keras.metrics.Precision(), tf.keras.metrics.Recall()]
+            metrics=['accuracy', tf.keras.metrics.Precision(), tf.keras.metrics.Recall()],
+            jit_compile=jit_compile
         )
         
         return model
     
-    def train(self, X: np.ndarray, y: np.ndarray, validation_split: float = 0.2, epochs: int = 100):
+    def train(self, X: np.ndarray, y: np.ndarray, validation_split: float = 0.2, epochs: int = 100,
+              batch_size: int = 32, optimized: bool = False, intra_op_threads: Optional[int] = None,
+              verbose: int = 1):
         """
         Train the emergency voice classification model
+        
+        `optimized` switches to the CPU-optimized mode (XLA-compiled train
+        step, sized thread pools, larger batch with a scaled learning rate;
+        see training_perf.py). Per-epoch throughput is recorded in
+        `self.throughput`; with memory tracing on (memory_profiling.py), peak
+        allocation per training stage goes into `self.memory_profile`.
         """
+        from training_perf import ThroughputCallback, configure_cpu_training, optimized_hyperparameters
+        
+        if optimized:
+            print(f"Optimized CPU training: {configure_cpu_training(intra_op_threads)}")
+        
         print("Preparing data for training...")
+        memory = {} if is_tracing() else None
         
         # Encode labels
         y_encoded = self.label_encoder.fit_transform(y)
         
         # Scale features
-        X_scaled = self.scaler.fit_transform(X)
+        with record_peak(memory, 'scale'):
+            X_scaled = self.scaler.fit_transform(X)
         
-        # Split data
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_scaled, y_encoded, test_size=validation_split, random_state=42, stratify=y_encoded
-        )
+        # Split data (keeping the validation positions, so callers can record which clips were held out)
+        with record_peak(memory, 'split'):
+            X_train, X_val, y_train, y_val, _, val_idx = train_test_split(
+                X_scaled, y_encoded, np.arange(len(X)), test_size=validation_split, random_state=42,
+                stratify=y_encoded
+            )
+        self.validation_indices = np.sort(val_idx)
         
         print(f"Training set size: {X_train.shape[0]}")
         print(f"Validation set size: {X_val.shape[0]}")
         print(f"Feature dimensions: {X_train.shape[1]}")
         
         # Build model
-        self.model = self.build_model(X_train.shape[1])
+        self.training_config = {'batch_size': batch_size, 'learning_rate': DEFAULT_LEARNING_RATE, 'jit_compile': False}
+        if optimized:
+            self.training_config = optimized_hyperparameters(DEFAULT_LEARNING_RATE)
+        self.model = self.build_model(X_train.shape[1], learning_rate=self.training_config['learning_rate'],
+                                      jit_compile=self.training_config['jit_compile'])
         
         print("Model architecture:")
         self.model.summary()
@@ -188,26 +376,56 @@ class EmergencyVoiceClassifier:
                 verbose=1
             )
         ]
+        self.throughput = ThroughputCallback(X_train.shape[0])
+        callbacks.append(self.throughput)
         
         # Train model
         print("Starting training...")
-        history = self.model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val),
-            epochs=epochs,
-            batch_size=32,
-            callbacks=callbacks,
-            verbose=1
-        )
+        with record_peak(memory, 'fit'):
+            history = self.model.fit(
+                X_train, y_train,
+                validation_data=(X_val, y_val),
+                epochs=epochs,
+                batch_size=self.training_config['batch_size'],
+                callbacks=callbacks,
+                verbose=verbose
+            )
+        print(self.throughput.report())
+        # EarlyStopping restored the best-val_loss epoch, but the .h5 checkpoint holds the
+        # best-val_accuracy one; use the checkpoint so the .h5 and any bundle saved from
+        # self.model are the same model
+        self.model.load_weights(self.model_path)
         
         # Evaluate on validation set
-        val_predictions = (self.model.predict(X_val) > 0.5).astype(int)
+        with record_peak(memory, 'evaluate'):
+            val_predictions = (self.model.predict(X_val) > 0.5).astype(int)
+        self.memory_profile = memory
         print("\nValidation Results:")
         print(classification_report(y_val, val_predictions, target_names=['Normal', 'Emergency']))
         
         # Save preprocessing objects
-        joblib.dump(self.scaler, 'scaler.pkl')
-        joblib.dump(self.label_encoder, 'label_encoder.pkl')
+        joblib.dump(self.scaler, self.scaler_path)
+        joblib.dump(self.label_encoder, self.label_encoder_path)
+        
+        return history
+    
+    def train_streaming(self, source, validation_split: float = 0.2, epochs: int = 100,
+                        batch_size: int = 32, cache_dir: Optional[str] = None, augment: bool = False):
+        """
+        Train from sharded storage through a tf.data pipeline instead of an in-memory X
+        
+        `source` is a streaming_training.ClipSource (raw clips, featurized on
+        the fly) or FeatureArraySource (precomputed feature rows). `augment`
+        applies randomized waveform effects to training clips every epoch.
+        """
+        from streaming_training import train_streaming
+        
+        history = train_streaming(self, source, validation_split=validation_split, epochs=epochs,
+                                  batch_size=batch_size, cache_dir=cache_dir, augment=augment)
+        
+        # Save preprocessing objects
+        joblib.dump(self.scaler, self.scaler_path)
+        joblib.dump(self.label_encoder, self.label_encoder_path)
         
         return history
     
@@ -215,19 +433,94 @@ class EmergencyVoiceClassifier:
         """
         Load trained model and preprocessing objects
         """
+        if self.model_path.endswith(model_bundle.BUNDLE_EXTENSION):
+            self.load_bundle(self.model_path)
+            return
+        
         if os.path.exists(self.model_path):
             self.model = keras.models.load_model(self.model_path)
             print(f"Model loaded from {self.model_path}")
         else:
             raise FileNotFoundError(f"Model file {self.model_path} not found")
             
-        if os.path.exists('scaler.pkl'):
-            self.scaler = joblib.load('scaler.pkl')
+        if os.path.exists(self.scaler_path):
+            self.scaler = joblib.load(self.scaler_path)
             print("Scaler loaded")
             
-        if os.path.exists('label_encoder.pkl'):
-            self.label_encoder = joblib.load('label_encoder.pkl')
+        if os.path.exists(self.label_encoder_path):
+            self.label_encoder = joblib.load(self.label_encoder_path)
             print("Label encoder loaded")
+        
+        self.model_version = self.compute_model_version()
+    
+    def compute_model_version(self) -> str:
+        """
+        Content hash of the model and preprocessing files, used as the model version
+        """
+        digest = hashlib.sha256()
+        for path in (self.model_path, self.scaler_path, self.label_encoder_path):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+        return digest.hexdigest()[:12]
+    
+    def save_bundle(self, bundle_path: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Save model, scaler and labels as a single memory-mappable bundle
+        
+        Returns the bundle's model version.
+        """
+        if self.model is None:
+            raise ValueError("No model to save. Train or load a model first.")
+        
+        layers = self.model.layers if isinstance(self.model, model_bundle.BundleModel) \
+            else model_bundle.export_dense_layers(self.model)
+        version = model_bundle.write_bundle(
+            bundle_path,
+            layers=layers,
+            scaler=self.scaler,
+            labels=list(self.label_encoder.classes_),
+            feature_set=self.get_feature_set(),
+            audio_config={
+                'sample_rate': self.sample_rate,
+                'duration': self.duration,
+                'n_mfcc': self.n_mfcc,
+                'n_fft': self.n_fft,
+                'hop_length': self.hop_length
+            },
+            threshold=self.threshold,
+            metadata=metadata
+        )
+        print(f"Model bundle saved to {bundle_path} (version {version})")
+        return version
+    
+    def load_bundle(self, bundle_path: str, verify: bool = True):
+        """
+        Load model, scaler and labels from a bundle written by save_bundle
+        """
+        bundle = model_bundle.ModelBundle(bundle_path, verify=verify)
+        
+        feature_set = bundle.feature_set
+        if feature_set['version'] != FEATURE_SET_VERSION:
+            raise ValueError(f"Bundle feature set {feature_set['version']} does not match "
+                             f"this code's feature set {FEATURE_SET_VERSION}")
+        
+        audio = bundle.header['audio']
+        self.sample_rate = audio['sample_rate']
+        self.duration = audio['duration']
+        self.n_mfcc = audio['n_mfcc']
+        self.n_fft = audio.get('n_fft', self.n_fft)
+        self.hop_length = audio.get('hop_length', self.hop_length)
+        
+        self.model = bundle.build_model()
+        self.scaler = bundle.build_scaler()
+        self.label_encoder = bundle.build_label_encoder()
+        self.threshold = bundle.threshold
+        self.model_version = bundle.model_version
+        self.model_path = bundle.path
+        self.bundle_metadata = bundle.metadata
+        print(f"Model bundle loaded from {bundle_path} (version {bundle.model_version})")
     
     def predict(self, audio_data: np.ndarray, sr: int = None) -> Dict[str, Any]:
         """
@@ -238,14 +531,24 @@ class EmergencyVoiceClassifier:
         
         # Extract features
         features = self.extract_features(audio_data, sr)
-        features = features.reshape(1, -1)
+        
+        return self.predict_features(features)
+    
+    def predict_features(self, features: np.ndarray) -> Dict[str, Any]:
+        """
+        Predict from an already extracted feature vector
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Call load_model() first.")
+        
+        features = np.asarray(features).reshape(1, -1)
         
         # Scale features
         features_scaled = self.scaler.transform(features)
         
         # Make prediction
         prediction_prob = self.model.predict(features_scaled, verbose=0)[0][0]
-        prediction_class = int(prediction_prob > 0.5)
+        prediction_class = int(prediction_prob > self.threshold)
         
         # Get class label
         class_label = self.label_encoder.inverse_transform([prediction_class])[0]
@@ -257,11 +560,109 @@ class EmergencyVoiceClassifier:
             'features_extracted': len(features[0])
         }
     
-    def predict_from_file(self, audio_file_path: str) -> Dict[str, Any]:
+    def predict_features_batch(self, features: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Predict from a matrix of feature vectors (one row per clip) with a single model call
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Call load_model() first.")
+        
+        features = np.asarray(features).reshape(len(features), -1)
+        if len(features) == 0:
+            return []
+        
+        probabilities = self.model.predict(self.scaler.transform(features), verbose=0).reshape(-1)
+        classes = (probabilities > self.threshold).astype(int)
+        class_labels = self.label_encoder.inverse_transform(classes)
+        
+        return [{
+            'is_emergency': bool(prediction_class),
+            'confidence': float(prediction_prob),
+            'class_label': class_label,
+            'features_extracted': features.shape[1]
+        } for prediction_prob, prediction_class, class_label in zip(probabilities, classes, class_labels)]
+    
+    def emergency_probability(self, probability):
+        """
+        P(emergency) from the model output (a float or array)
+        
+        The model outputs the probability of encoded class 1; with the
+        label encoder's sorted classes that is 'normal', not 'emergency'.
+        """
+        if list(self.label_encoder.classes_).index('emergency') == 1:
+            return probability
+        return 1.0 - probability
+    
+    def predict_timeline(self, audio_file_path: str, hop_seconds: float = 1.5,
+                         batch_size: int = 16) -> Dict[str, Any]:
+        """
+        Score a whole recording with overlapping windows every `hop_seconds`
+        
+        Returns per-window results and merged emergency segments; the
+        file is streamed, so memory does not grow with its length. See
+        timeline.py.
+        """
+        from timeline import score_timeline
+        
+        return score_timeline(self, audio_file_path, hop_seconds=hop_seconds, batch_size=batch_size)
+    
+    def load_prefix_models(self, bundle_paths: Optional[List[str]] = None) -> List[float]:
+        """
+        Load the prefix models used by predict_progressive
+        
+        By default these are the `<model>.<N>s.evb` bundles next to the model
+        file (see progressive.py). Returns the prefix lengths loaded.
+        """
+        from progressive import early_threshold, find_prefix_bundles
+        
+        if bundle_paths is None:
+            bundle_paths = [path for _, path in find_prefix_bundles(self.model_path)]
+        prefix_models = []
+        for path in bundle_paths:
+            prefix_model = EmergencyVoiceClassifier(path)
+            prefix_model.load_model()
+            if early_threshold(prefix_model) is None:
+                print(f"Skipping prefix model {path}: no P(emergency) early threshold, "
+                      f"retrain it with `python progressive.py train`")
+                continue
+            if prefix_model.sample_rate != self.sample_rate or not prefix_model.duration < self.duration:
+                raise ValueError(f"Prefix model {path} ({prefix_model.sample_rate}Hz/{prefix_model.duration}s) "
+                                 f"does not fit this model ({self.sample_rate}Hz/{self.duration}s)")
+            prefix_models.append(prefix_model)
+        self.prefix_models = sorted(prefix_models, key=lambda prefix_model: prefix_model.duration)
+        return [prefix_model.duration for prefix_model in self.prefix_models]
+    
+    def progressive_stages(self) -> List[Tuple[float, 'EmergencyVoiceClassifier']]:
+        """
+        (seconds, model) for each stage of predict_progressive; the last is this model
+        """
+        return [(prefix_model.duration, prefix_model) for prefix_model in self.prefix_models] + [(self.duration, self)]
+    
+    def predict_progressive(self, audio_data: np.ndarray, sr: int = None, partial: bool = False,
+                            after_seconds: float = 0.0) -> Iterator[Dict[str, Any]]:
+        """
+        Score growing prefixes (1 s, 2 s, ...) and then the full clip, one result per stage
+        
+        A prefix stage sets `early_decision` when its model is confident
+        beyond its calibrated, stricter threshold; the last stage (`final`)
+        is the full model's decision. Results are yielded as each stage is
+        scored. See progressive.py.
+        """
+        from progressive import iter_progressive
+        
+        return iter_progressive(self, audio_data, sr, partial=partial, after_seconds=after_seconds)
+    
+    def predict_from_file(self, audio_file_path: str, long_audio: bool = False,
+                          hop_seconds: float = 1.5) -> Dict[str, Any]:
         """
         Predict emergency from audio file
+        
+        By default only the first `duration` seconds are scored; with
+        `long_audio` the whole file is scored as a timeline (predict_timeline).
         """
         try:
+            if long_audio:
+                return self.predict_timeline(audio_file_path, hop_seconds=hop_seconds)
             audio_data, sr = librosa.load(audio_file_path, sr=self.sample_rate, duration=self.duration)
             return self.predict(audio_data, sr)
         except Exception as e:
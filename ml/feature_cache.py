@@ -0,0 +1,174 @@
+"""
+Persistent on-disk feature cache for training
+
+Rows are keyed by the content hash of the audio they were extracted from:
+the file bytes for WAVs (load_cached_features), or the stored clip for
+corpus shards (array_content_hash). Features are stored per feature-set fingerprint (a hash of
+EmergencyVoiceClassifier.get_feature_set()), so changing the feature
+extraction invalidates the cache automatically. Within a fingerprint
+directory:
+
+    index.json          content hash -> [segment, row], plus a stat memo
+                        path -> [size, mtime_ns, content hash]
+    segment-<id>.npy    feature rows added by one run (float64, 2-D)
+
+Each run that featurizes new files appends one segment; lookups read all
+segments with np.load(mmap_mode='r') and gather rows in one pass. When too
+many segments accumulate they are compacted into one.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAX_SEGMENTS = 16
+
+
+def feature_set_fingerprint(feature_set: Dict[str, Any]) -> str:
+    encoded = json.dumps(feature_set, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def file_content_hash(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Feature rows keyed by audio content hash, for one feature set
+    """
+
+    def __init__(self, cache_dir: str, feature_set: Dict[str, Any]):
+        self.fingerprint = feature_set_fingerprint(feature_set)
+        self.directory = os.path.join(cache_dir, self.fingerprint)
+        self.index_path = os.path.join(self.directory, 'index.json')
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.entries: Dict[str, List[int]] = {}
+        self.stat_memo: Dict[str, List[Any]] = {}
+        self.segments: List[str] = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self.entries = index.get('entries', {})
+            self.stat_memo = index.get('stat_memo', {})
+            self.segments = index.get('segments', [])
+        else:
+            with open(os.path.join(self.directory, 'feature_set.json'), 'w') as f:
+                json.dump(feature_set, f, indent=2, sort_keys=True)
+
+        self._pending_hashes: List[str] = []
+        self._pending_rows: List[np.ndarray] = []
+
+    def content_hash(self, filepath: str) -> str:
+        """
+        Content hash of a file, skipping the read when size and mtime are unchanged
+        """
+        key = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        memo = self.stat_memo.get(key)
+        if memo is not None and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+        content_hash = file_content_hash(filepath)
+        self.stat_memo[key] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        return content_hash
+
+    def lookup(self, content_hashes: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Return ({position: feature row} for cached hashes, [positions not cached])
+        """
+        found = {}
+        missing = []
+        by_segment: Dict[int, List[Tuple[int, int]]] = {}
+        for position, content_hash in enumerate(content_hashes):
+            entry = self.entries.get(content_hash)
+            if entry is None:
+                missing.append(position)
+            else:
+                by_segment.setdefault(entry[0], []).append((position, entry[1]))
+
+        for segment_index, items in by_segment.items():
+            segment = np.load(os.path.join(self.directory, self.segments[segment_index]), mmap_mode='r')
+            positions, rows = zip(*items)
+            block = np.asarray(segment[np.asarray(rows)])
+            for position, row in zip(positions, block):
+                found[position] = row
+        return found, missing
+
+    def add(self, content_hash: str, features: np.ndarray):
+        if content_hash in self.entries:
+            return
+        self._pending_hashes.append(content_hash)
+        self._pending_rows.append(np.asarray(features, dtype=np.float64))
+
+    def save(self):
+        """
+        Write pending rows as a new segment and update the index atomically
+        """
+        if self._pending_rows:
+            segment_name = f'segment-{uuid.uuid4().hex[:12]}.npy'
+            np.save(os.path.join(self.directory, segment_name), np.vstack(self._pending_rows))
+            segment_index = len(self.segments)
+            self.segments.append(segment_name)
+            for row, content_hash in enumerate(self._pending_hashes):
+                self.entries[content_hash] = [segment_index, row]
+            self._pending_hashes = []
+            self._pending_rows = []
+            if len(self.segments) > MAX_SEGMENTS:
+                self._compact()
+        self._write_index()
+
+    def _compact(self):
+        hashes = list(self.entries.keys())
+        found, _ = self.lookup(hashes)
+        merged = np.vstack([found[i] for i in range(len(hashes))])
+        old_segments = self.segments
+        segment_name = f'segment-{uuid.uuid4().hex[:12]}.npy'
+        np.save(os.path.join(self.directory, segment_name), merged)
+        self.segments = [segment_name]
+        self.entries = {content_hash: [0, row] for row, content_hash in enumerate(hashes)}
+        self._write_index()
+        for name in old_segments:
+            os.remove(os.path.join(self.directory, name))
+
+    def _write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'entries': self.entries, 'stat_memo': self.stat_memo, 'segments': self.segments}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def array_content_hash(array: np.ndarray) -> str:
+    """
+    Content hash of an in-memory clip (e.g. a corpus shard row), dtype and shape included
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256(f'{array.dtype.str}{array.shape}'.encode('ascii'))
+    digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def default_cache_dir(dataset_dir: str) -> str:
+    return os.path.join(dataset_dir, '.feature_cache')
+
+
+def load_cached_features(filepaths: List[str], cache: Optional[FeatureCache]) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+    """
+    Hash files and fill in cached features; returns (features or None, hashes)
+    """
+    if cache is None:
+        return [None] * len(filepaths), []
+    hashes = [cache.content_hash(path) for path in filepaths]
+    found, _ = cache.lookup(hashes)
+    return [found.get(i) for i in range(len(filepaths))], hashes
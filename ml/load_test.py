@@ -0,0 +1,391 @@
+"""
+Load generation and replay harness for api_server
+
+Sends an open-loop stream of /predict requests: arrival times follow a
+Poisson process at the offered rate and do not wait for earlier responses,
+so a slow server builds a backlog instead of slowing the load (no
+coordinated omission). Latency is measured from each request's scheduled
+arrival time. Requests in flight are capped by --concurrency, and anything
+beyond that queues on the client and counts toward latency.
+
+Request mix:
+    synthetic   --encodings / --durations / --sample-rates / --silence-ratio
+    replay      --replay requests.jsonl, one request per line:
+                {"t": 0.25, "encoding": "multipart_wav", "duration": 2.0,
+                 "sample_rate": 16000, "silent": false, "file": "clip.wav"}
+                "t" (seconds from start) keeps the recorded timing; without
+                it, requests are replayed at the offered rate. "file" sends a
+                recorded audio file instead of a synthetic clip.
+
+Each rate step reports throughput, latency percentiles, errors by cause and
+the server process's CPU and RSS. The first step where throughput falls
+behind the offered rate, p99 exceeds --slo-ms or errors exceed 1% is
+reported as the saturation point.
+
+Usage:
+    python load_test.py --rates 2 4 8 16 --step-seconds 30 --concurrency 32
+    python load_test.py --url http://host:5000 --replay recorded.jsonl
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+from benchmark_suite import encode_wav, encode_webm, synthetic_clip
+
+ENCODINGS = ('multipart_wav', 'base64_wav', 'base64_webm', 'audio_array')
+
+
+class RequestFactory:
+    """
+    Builds /predict request payloads, caching encoded clips per spec
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self._cache: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def build(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        key = json.dumps(spec, sort_keys=True)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self._build(spec)
+            return self._cache[key]
+
+    def _audio(self, spec: Dict[str, Any]):
+        if spec.get('file'):
+            import librosa
+
+            audio, sr = librosa.load(spec['file'], sr=None, mono=True)
+            return audio.astype(np.float32), sr
+        sr = int(spec.get('sample_rate', 16000))
+        duration = float(spec.get('duration', 3.0))
+        if spec.get('silent'):
+            return np.zeros(int(sr * duration), dtype=np.float32), sr
+        return synthetic_clip(self.seed + len(self._cache), duration, sr), sr
+
+    def _build(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        audio, sr = self._audio(spec)
+        encoding = spec.get('encoding', 'multipart_wav')
+        if encoding == 'multipart_wav':
+            return {'files': {'audio': ('clip.wav', encode_wav(audio, sr), 'audio/wav')}}
+        if encoding == 'base64_wav':
+            return {'json': {'audio_base64': base64.b64encode(encode_wav(audio, sr)).decode('ascii'),
+                             'mimeType': 'audio/wav'}}
+        if encoding == 'base64_webm':
+            webm = encode_webm(audio, sr)
+            if webm is None:
+                raise RuntimeError("base64_webm requires ffmpeg")
+            return {'json': {'audio_base64': base64.b64encode(webm).decode('ascii'),
+                             'mimeType': 'audio/webm;codecs=opus'}}
+        if encoding == 'audio_array':
+            return {'json': {'audio_array': audio.tolist(), 'sample_rate': sr}}
+        raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def synthetic_specs(n: int, encodings: List[str], durations: List[float], sample_rates: List[int],
+                    silence_ratio: float, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    return [{
+        'encoding': str(rng.choice(encodings)),
+        'duration': float(rng.choice(durations)),
+        'sample_rate': int(rng.choice(sample_rates)),
+        'silent': bool(rng.random() < silence_ratio),
+    } for _ in range(n)]
+
+
+def load_replay(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ProcessSampler:
+    """
+    Samples CPU% and RSS of a process from /proc (Linux) or psutil
+    """
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self):
+        try:
+            import psutil
+
+            process = psutil.Process(self.pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+        except ImportError:
+            with open(f'/proc/{self.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            ticks = os.sysconf('SC_CLK_TCK')
+            cpu = (int(fields[11]) + int(fields[12])) / ticks
+            rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+            return cpu, rss
+
+    def _run(self):
+        last_cpu, _ = self._read()
+        last_time = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                cpu, rss = self._read()
+            except (OSError, ProcessLookupError):
+                return
+            now = time.monotonic()
+            self.samples.append({'cpu_percent': (cpu - last_cpu) / (now - last_time) * 100.0, 'rss_bytes': rss})
+            last_cpu, last_time = cpu, now
+
+    def start(self):
+        if self.pid is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> Dict[str, Optional[float]]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.samples:
+            return {'cpu_percent_mean': None, 'cpu_percent_max': None, 'rss_mb_max': None}
+        cpu = [s['cpu_percent'] for s in self.samples]
+        return {
+            'cpu_percent_mean': float(np.mean(cpu)),
+            'cpu_percent_max': float(np.max(cpu)),
+            'rss_mb_max': max(s['rss_bytes'] for s in self.samples) / 1e6,
+        }
+
+
+def run_step(url: str, specs: List[Dict[str, Any]], offsets: np.ndarray, factory: RequestFactory,
+             concurrency: int, timeout: float, server_pid: Optional[int],
+             offered_rps: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fire specs[i] at offsets[i] seconds from the start and collect outcomes
+    """
+    local = threading.local()
+    outcomes: List[Dict[str, Any]] = []
+    outcomes_lock = threading.Lock()
+
+    def send(spec, scheduled):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        outcome = {'encoding': spec.get('encoding', 'multipart_wav'), 'status': None, 'cause': None}
+        try:
+            response = session.post(url + '/predict', timeout=timeout, **factory.build(spec))
+            outcome['status'] = response.status_code
+            if response.status_code != 200:
+                outcome['cause'] = f"http_{response.status_code}"
+        except requests.Timeout:
+            outcome['cause'] = 'timeout'
+        except requests.RequestException:
+            outcome['cause'] = 'connection'
+        outcome['latency'] = time.monotonic() - scheduled
+        with outcomes_lock:
+            outcomes.append(outcome)
+
+    # Encode payloads up front so encoding cost is not part of the load
+    for spec in specs:
+        factory.build(spec)
+
+    sampler = ProcessSampler(server_pid)
+    sampler.start()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for spec, offset in zip(specs, offsets):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, spec, start + offset)
+    elapsed = time.monotonic() - start
+    server = sampler.stop()
+
+    latencies = np.array([o['latency'] for o in outcomes if o['cause'] is None]) * 1000.0
+    errors: Dict[str, int] = {}
+    for o in outcomes:
+        if o['cause'] is not None:
+            errors[o['cause']] = errors.get(o['cause'], 0) + 1
+    by_encoding: Dict[str, List[float]] = {}
+    for o in outcomes:
+        if o['cause'] is None:
+            by_encoding.setdefault(o['encoding'], []).append(o['latency'] * 1000.0)
+
+    def percentile(values, q):
+        return float(np.percentile(values, q)) if len(values) else None
+
+    return {
+        'requests': len(outcomes),
+        'offered_rps': offered_rps,
+        'throughput_rps': (len(outcomes) - sum(errors.values())) / elapsed,
+        'elapsed_seconds': elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': float(latencies.max()) if len(latencies) else None,
+        'error_rate': sum(errors.values()) / max(1, len(outcomes)),
+        'errors': errors,
+        'p50_ms_by_encoding': {name: percentile(values, 50) for name, values in by_encoding.items()},
+        **server,
+    }
+
+
+def start_local_server(port: int, model_path: Optional[str], env_overrides: Dict[str, str]):
+    """
+    Start api_server.py in a subprocess and wait until /health reports healthy
+    """
+    work_dir = None
+    if model_path is None:
+        from benchmark_suite import build_benchmark_classifier
+
+        work_dir = tempfile.mkdtemp(prefix='load_test_')
+        model_path = build_benchmark_classifier(work_dir).model_path
+
+    env = dict(os.environ, PORT=str(port), MODEL_PATH=os.path.abspath(model_path), **env_overrides)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+    process = subprocess.Popen([sys.executable, script], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api_server exited with code {process.returncode}")
+        try:
+            if requests.get(url + '/health', timeout=1).json().get('model_loaded'):
+                return process, url, work_dir
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("api_server did not become healthy within 120s")
+
+
+def find_saturation(steps: List[Dict[str, Any]], slo_ms: float) -> Optional[Dict[str, Any]]:
+    for step in steps:
+        behind = step['offered_rps'] and step['throughput_rps'] < 0.95 * step['offered_rps']
+        slow = step['p99_ms'] is None or step['p99_ms'] > slo_ms
+        if behind or slow or step['error_rate'] > 0.01:
+            return step
+    return None
+
+
+def format_steps(steps: List[Dict[str, Any]]) -> str:
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+
+    lines = [f"{'rate':>6} {'reqs':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+             f"{'err%':>6} {'cpu% avg':>8} {'cpu% max':>8} {'rss MB':>7}  errors"]
+    for step in steps:
+        lines.append(
+            f"{fmt(step['offered_rps'], '6.1f')} {step['requests']:>6} {step['throughput_rps']:>7.2f} "
+            f"{fmt(step['p50_ms'], '8.0f')} {fmt(step['p95_ms'], '8.0f')} {fmt(step['p99_ms'], '8.0f')} "
+            f"{step['error_rate'] * 100:>6.1f} {fmt(step['cpu_percent_mean'], '8.0f')} "
+            f"{fmt(step['cpu_percent_max'], '8.0f')} {fmt(step['rss_mb_max'], '7.0f')}  "
+            f"{json.dumps(step['errors']) if step['errors'] else ''}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load test for the /predict endpoint')
+    parser.add_argument('--url', default=None, help='Target server (default: start api_server locally)')
+    parser.add_argument('--server-pid', type=int, default=None, help='PID to sample CPU/RSS from with --url')
+    parser.add_argument('--port', type=int, default=5055, help='Port for the locally started server')
+    parser.add_argument('--model', default=None, help='Model for the local server (default: synthetic bundle)')
+    parser.add_argument('--server-env', nargs='*', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the local server, e.g. INFERENCE_CONCURRENCY=2')
+    parser.add_argument('--rates', type=float, nargs='+', default=[2.0, 4.0, 8.0], help='Offered requests/sec per step')
+    parser.add_argument('--step-seconds', type=float, default=20.0)
+    parser.add_argument('--concurrency', type=int, default=32, help='Max requests in flight')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--encodings', nargs='+', default=['multipart_wav', 'base64_wav', 'audio_array'],
+                        choices=ENCODINGS)
+    parser.add_argument('--durations', type=float, nargs='+', default=[1.0, 3.0, 5.0])
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[16000, 22050, 44100, 48000])
+    parser.add_argument('--silence-ratio', type=float, default=0.1)
+    parser.add_argument('--replay', default=None, help='JSONL of recorded requests')
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help='p99 latency budget for the saturation check')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests sent before the first step')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write per-step results as JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    factory = RequestFactory(args.seed)
+    replay = load_replay(args.replay) if args.replay else None
+
+    process = None
+    work_dir = None
+    url, server_pid = args.url, args.server_pid
+    if url is None:
+        overrides = dict(item.split('=', 1) for item in args.server_env)
+        print(f"Starting api_server on port {args.port}...")
+        process, url, work_dir = start_local_server(args.port, args.model, overrides)
+        server_pid = process.pid
+
+    steps = []
+    try:
+        # Warm-up outside the measured steps (first-call tracing, lazy imports)
+        warmup_specs = synthetic_specs(args.warmup, args.encodings, args.durations, args.sample_rates, 0.0, rng)
+        for spec in warmup_specs:
+            requests.post(url + '/predict', timeout=args.timeout, **factory.build(spec))
+        if replay is not None and all('t' in spec for spec in replay):
+            # Recorded timing: one step that keeps the original arrival times
+            offsets = np.array([float(spec['t']) for spec in replay])
+            order = np.argsort(offsets, kind='stable')
+            print(f"Replaying {len(replay)} recorded requests over {offsets.max():.1f}s...")
+            span = offsets.max() - offsets.min()
+            steps.append(run_step(url, [replay[i] for i in order], offsets[order] - offsets.min(), factory,
+                                  args.concurrency, args.timeout, server_pid,
+                                  offered_rps=len(replay) / span if span > 0 else None))
+        else:
+            for rate in args.rates:
+                n = max(1, int(rate * args.step_seconds))
+                offsets = np.cumsum(rng.exponential(1.0 / rate, size=n))
+                if replay is not None:
+                    specs = [replay[i % len(replay)] for i in range(n)]
+                else:
+                    specs = synthetic_specs(n, args.encodings, args.durations, args.sample_rates,
+                                            args.silence_ratio, rng)
+                print(f"Step: {rate:g} req/s for {offsets[-1]:.1f}s ({n} requests)...")
+                steps.append(run_step(url, specs, offsets, factory, args.concurrency, args.timeout,
+                                      server_pid, offered_rps=rate))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print(format_steps(steps))
+    saturation = find_saturation(steps, args.slo_ms)
+    if saturation is None:
+        print(f"\nNo saturation up to {steps[-1]['offered_rps'] or 0:.1f} req/s (p99 SLO {args.slo_ms:.0f} ms)")
+    else:
+        print(f"\nSaturation at ~{saturation['offered_rps'] or 0:.1f} req/s: "
+              f"{saturation['throughput_rps']:.2f} req/s served, p99 {saturation['p99_ms'] or 0:.0f} ms, "
+              f"{saturation['error_rate']:.1%} errors")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': url, 'concurrency': args.concurrency, 'steps': steps,
+                       'saturation_rps': saturation['offered_rps'] if saturation else None}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Peak-memory accounting for pipeline stages
+
+PeakMeasurement records the peak tracemalloc-traced allocation above the
+level at which a stage started, i.e. the transient memory the stage needs
+on top of what is already live. Measurements nest: a stage inside another
+stage gets its own peak, and the outer stage still sees the inner one's
+peak. NumPy buffers are traced, so decoded audio, float64 copies and
+librosa intermediates (STFT, CQT, piptrack matrices) are included;
+TensorFlow's native allocator is not, which is why the process peak RSS
+is reported alongside.
+
+tracemalloc's peak counter is process-wide. Per-thread stacks keep nesting
+correct, but with several requests in flight their allocations overlap, so
+exact per-stage figures need one request at a time (e.g.
+DECODE_CONCURRENCY=1 INFERENCE_CONCURRENCY=1 during a sizing run).
+
+Tracing costs CPU on allocation-heavy code, so it is off unless started
+with start_tracing() (MEMORY_PROFILING=1 for the API and train_model.py).
+Without it, every measurement is a no-op with peak_bytes None.
+
+Process RSS comes from `resource` and /proc where they exist (Linux,
+macOS) and from psutil elsewhere (Windows); without either it is None.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_local = threading.local()
+
+
+def start_tracing(nframes: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(nframes)
+
+
+def is_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def _stack() -> List['PeakMeasurement']:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class PeakMeasurement:
+    """
+    Peak traced allocation (bytes) above the starting level between start() and stop()
+    """
+
+    def __init__(self):
+        self.peak_bytes: Optional[int] = None
+        self._active = False
+
+    def start(self) -> 'PeakMeasurement':
+        if not tracemalloc.is_tracing():
+            return self
+        current, peak = tracemalloc.get_traced_memory()
+        stack = _stack()
+        if stack:
+            # Credit the enclosing stage with the peak so far before resetting it
+            stack[-1]._peak = max(stack[-1]._peak, peak)
+        tracemalloc.reset_peak()
+        self._start = current
+        self._peak = current
+        self._active = True
+        stack.append(self)
+        return self
+
+    def stop(self) -> Optional[int]:
+        if not self._active:
+            return self.peak_bytes
+        self._active = False
+        if not tracemalloc.is_tracing():
+            return None
+        self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+        stack = _stack()
+        if self in stack:
+            stack.remove(self)
+        if stack:
+            stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        self.peak_bytes = self._peak - self._start
+        return self.peak_bytes
+
+    def __enter__(self) -> 'PeakMeasurement':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class _RecordingMeasurement(PeakMeasurement):
+    def __init__(self, stats: Optional[Dict[str, int]], name: str):
+        super().__init__()
+        self._stats = stats
+        self._name = name
+
+    def stop(self) -> Optional[int]:
+        peak = super().stop()
+        if peak is not None and self._stats is not None:
+            self._stats[self._name] = max(self._stats.get(self._name, 0), peak)
+        return peak
+
+
+def record_peak(stats: Optional[Dict[str, int]], name: str) -> PeakMeasurement:
+    """
+    Context manager that keeps the largest peak seen for `name` in `stats`
+
+        with record_peak(stats, 'extract_features'):
+            ...
+    """
+    return _RecordingMeasurement(stats, name)
+
+
+def merge_peaks(stats: Dict[str, int], other: Dict[str, int]):
+    for name, value in other.items():
+        stats[name] = max(stats.get(name, 0), value)
+
+
+def _psutil_memory_info():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of this process so far, or None if the platform can't tell
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    info = _psutil_memory_info()
+    # peak_wset is Windows' peak working set
+    return getattr(info, 'peak_wset', None) if info is not None else None
+
+
+def current_rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # No /proc (or no os.sysconf, on Windows)
+        pass
+    info = _psutil_memory_info()
+    return info.rss if info is not None else None
+
+
+def format_peaks(stats: Dict[str, int], title: str = 'Peak memory by stage:') -> str:
+    lines = [title]
+    width = max((len(name) for name in stats), default=0)
+    for name, value in sorted(stats.items(), key=lambda item: -item[1]):
+        lines.append(f"  {name:<{width}}  {value / 1e6:>9.2f} MB")
+    return '\n'.join(lines)
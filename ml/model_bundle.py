@@ -0,0 +1,379 @@
+"""
+Single-file, memory-mappable model bundle
+
+Replaces the emergency_voice_model.h5 + scaler.pkl + label_encoder.pkl trio
+with one versioned file that needs neither Keras nor pickle to load:
+
+    offset 0   magic b'EVBUNDLE'
+    offset 8   format version (uint32, little endian)
+    offset 12  header length in bytes, padding included (uint64, little endian)
+    offset 20  JSON header (utf-8), padded with spaces to a 64-byte boundary
+               (JSON ignores trailing whitespace, so the padded header parses as is)
+    ...        array payload, each array 64-byte aligned, little endian
+
+The header describes the network as a list of dense layers (batch
+normalisation is folded into the following dense layer at export time), the
+scaler statistics, class labels, feature-set definition, decision threshold,
+training metadata and a SHA-256 checksum of the payload. Arrays are read
+through a single read-only np.memmap, so loading costs a header parse and
+the weight pages are shared between worker processes via the page cache.
+
+Usage:
+    python model_bundle.py convert --model emergency_voice_model.h5 --out emergency_voice_model.evb
+    python model_bundle.py inspect emergency_voice_model.evb
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'EVBUNDLE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+BUNDLE_EXTENSION = '.evb'
+_PREAMBLE = struct.Struct('<8sIQ')
+
+SUPPORTED_ACTIVATIONS = ('linear', 'relu', 'sigmoid', 'tanh', 'softmax')
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _activate(x: np.ndarray, activation: str) -> np.ndarray:
+    if activation == 'relu':
+        return np.maximum(x, 0.0, out=x)
+    if activation == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if activation == 'tanh':
+        return np.tanh(x)
+    if activation == 'softmax':
+        e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+        return e / np.sum(e, axis=-1, keepdims=True)
+    return x
+
+
+class BundleModel:
+    """
+    NumPy forward pass over the dense layers stored in a bundle
+
+    Exposes the subset of the Keras Model interface the rest of the code uses
+    (predict, input_shape, output_shape, count_params).
+    """
+
+    def __init__(self, layers: List[Dict[str, Any]]):
+        self.layers = layers
+
+    @property
+    def input_shape(self) -> Tuple[Optional[int], int]:
+        return (None, int(self.layers[0]['kernel'].shape[0]))
+
+    @property
+    def output_shape(self) -> Tuple[Optional[int], int]:
+        return (None, int(self.layers[-1]['kernel'].shape[1]))
+
+    def count_params(self) -> int:
+        return int(sum(layer['kernel'].size + layer['bias'].size for layer in self.layers))
+
+    def get_weights(self) -> List[np.ndarray]:
+        weights = []
+        for layer in self.layers:
+            weights.extend([layer['kernel'], layer['bias']])
+        return weights
+
+    def predict(self, x: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        out = np.asarray(x, dtype=np.float32)
+        for layer in self.layers:
+            out = _activate(out @ layer['kernel'] + layer['bias'], layer['activation'])
+        return out
+
+    __call__ = predict
+
+
+def export_dense_layers(keras_model) -> List[Dict[str, Any]]:
+    """
+    Convert a Sequential Dense/BatchNormalization/Dropout model to dense layers
+
+    Each BatchNormalization (inference mode: y = gamma * (x - mean) /
+    sqrt(var + eps) + beta) is an affine map x * s + t, which is folded into
+    the next dense layer as W' = diag(s) W, b' = b + t W. Dropout is the
+    identity at inference time and is dropped.
+    """
+    layers = []
+    pending_scale = None
+    pending_shift = None
+
+    for layer in keras_model.layers:
+        kind = type(layer).__name__
+        if kind in ('Dropout', 'InputLayer'):
+            continue
+        if kind == 'BatchNormalization':
+            weights = layer.get_weights()
+            gamma = weights.pop(0) if layer.scale else None
+            beta = weights.pop(0) if layer.center else None
+            moving_mean, moving_var = weights
+            scale = 1.0 / np.sqrt(moving_var + layer.epsilon)
+            if gamma is not None:
+                scale = scale * gamma
+            shift = -moving_mean * scale
+            if beta is not None:
+                shift = shift + beta
+            if pending_scale is not None:
+                shift = pending_shift * scale + shift
+                scale = pending_scale * scale
+            pending_scale, pending_shift = scale, shift
+            continue
+        if kind != 'Dense':
+            raise ValueError(f"Unsupported layer type for bundle export: {kind}")
+
+        activation = layer.get_config().get('activation', 'linear')
+        if activation not in SUPPORTED_ACTIVATIONS:
+            raise ValueError(f"Unsupported activation for bundle export: {activation}")
+        kernel, bias = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], None)
+        kernel = kernel.astype(np.float64)
+        bias = np.zeros(kernel.shape[1]) if bias is None else bias.astype(np.float64)
+        if pending_scale is not None:
+            bias = bias + pending_shift @ kernel
+            kernel = pending_scale[:, None] * kernel
+            pending_scale = pending_shift = None
+        layers.append({
+            'kernel': kernel.astype(np.float32),
+            'bias': bias.astype(np.float32),
+            'activation': activation
+        })
+
+    if pending_scale is not None:
+        # Trailing normalisation: express it as a diagonal dense layer
+        layers.append({
+            'kernel': np.diag(pending_scale).astype(np.float32),
+            'bias': pending_shift.astype(np.float32),
+            'activation': 'linear'
+        })
+    if not layers:
+        raise ValueError("Model has no dense layers to export")
+    return layers
+
+
+def write_bundle(path: str, layers: List[Dict[str, Any]], scaler, labels: List[str],
+                 feature_set: Dict[str, Any], audio_config: Dict[str, Any],
+                 threshold: float = 0.5, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Write a bundle file atomically and return its model version
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    layer_specs = []
+    for i, layer in enumerate(layers):
+        arrays[f'layers/{i}/kernel'] = layer['kernel']
+        arrays[f'layers/{i}/bias'] = layer['bias']
+        layer_specs.append({
+            'kernel': f'layers/{i}/kernel',
+            'bias': f'layers/{i}/bias',
+            'activation': layer['activation']
+        })
+
+    arrays['scaler/mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays['scaler/scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays['scaler/var'] = np.asarray(scaler.var_, dtype=np.float64)
+
+    # Lay out the payload
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+        arrays[name] = array
+        offset = _align(offset)
+        table[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset += array.nbytes
+    payload_size = _align(offset)
+
+    payload = bytearray(payload_size)
+    for name, array in arrays.items():
+        start = table[name]['offset']
+        payload[start:start + array.nbytes] = array.tobytes()
+    checksum = hashlib.sha256(payload).hexdigest()
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'model_version': checksum[:12],
+        'checksum': {'algorithm': 'sha256', 'value': checksum},
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'audio': audio_config,
+        'feature_set': feature_set,
+        'threshold': float(threshold),
+        'labels': [str(label) for label in labels],
+        'layers': layer_specs,
+        'scaler': {
+            'mean': 'scaler/mean',
+            'scale': 'scaler/scale',
+            'var': 'scaler/var',
+            'n_samples_seen': int(np.max(getattr(scaler, 'n_samples_seen_', 0)))
+        },
+        'arrays': table,
+        'metadata': metadata or {}
+    }
+    header_bytes = json.dumps(header, sort_keys=True, default=str).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+    header_bytes = header_bytes.ljust(data_start - _PREAMBLE.size, b' ')
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return header['model_version']
+
+
+def read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Read and parse the bundle header; returns (header, payload offset)
+    """
+    with open(path, 'rb') as f:
+        magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Bundle format version {version} is newer than supported ({FORMAT_VERSION})")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, _PREAMBLE.size + header_length
+
+
+class ModelBundle:
+    """
+    A loaded bundle: parsed header plus memory-mapped arrays
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = os.path.abspath(path)
+        self.header, self.payload_offset = read_header(self.path)
+        self._mmap = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if verify:
+            self.verify()
+
+    @property
+    def model_version(self) -> str:
+        return self.header['model_version']
+
+    @property
+    def labels(self) -> List[str]:
+        return self.header['labels']
+
+    @property
+    def threshold(self) -> float:
+        return self.header['threshold']
+
+    @property
+    def feature_set(self) -> Dict[str, Any]:
+        return self.header['feature_set']
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.header['metadata']
+
+    def verify(self):
+        payload = self._mmap[self.payload_offset:]
+        digest = hashlib.sha256(payload).hexdigest()
+        if digest != self.header['checksum']['value']:
+            raise ValueError(f"Checksum mismatch for bundle {self.path}")
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Read-only view of a stored array, backed by the memory map
+        """
+        spec = self.header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+        return np.frombuffer(self._mmap, dtype=dtype, count=count,
+                             offset=self.payload_offset + spec['offset']).reshape(spec['shape'])
+
+    def build_model(self) -> BundleModel:
+        return BundleModel([
+            {
+                'kernel': self.array(spec['kernel']),
+                'bias': self.array(spec['bias']),
+                'activation': spec['activation']
+            }
+            for spec in self.header['layers']
+        ])
+
+    def build_keras_model(self):
+        """
+        Rebuild the stored layers as a trainable Keras model (for fine-tuning)
+
+        BatchNormalization was folded into the Dense weights and Dropout
+        removed at export, so the result is a plain stack of Dense layers.
+        """
+        from tensorflow import keras
+
+        specs = self.header['layers']
+        model = keras.Sequential([keras.layers.InputLayer(input_shape=(self.array(specs[0]['kernel']).shape[0],))])
+        for spec in specs:
+            kernel = self.array(spec['kernel'])
+            layer = keras.layers.Dense(kernel.shape[1], activation=spec['activation'])
+            model.add(layer)
+            layer.set_weights([np.array(kernel, dtype=np.float32),
+                               np.array(self.array(spec['bias']), dtype=np.float32)])
+        return model
+
+    def build_scaler(self):
+        from sklearn.preprocessing import StandardScaler
+
+        spec = self.header['scaler']
+        scaler = StandardScaler()
+        scaler.mean_ = np.array(self.array(spec['mean']))
+        scaler.scale_ = np.array(self.array(spec['scale']))
+        scaler.var_ = np.array(self.array(spec['var']))
+        scaler.n_features_in_ = scaler.mean_.shape[0]
+        scaler.n_samples_seen_ = np.int64(spec['n_samples_seen'])
+        return scaler
+
+    def build_label_encoder(self):
+        from sklearn.preprocessing import LabelEncoder
+
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(self.labels)
+        return encoder
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or inspect emergency voice model bundles')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Convert a Keras model + pickles into a bundle')
+    convert.add_argument('--model', default='emergency_voice_model.h5')
+    convert.add_argument('--scaler', default=None, help='Defaults to scaler.pkl next to the model')
+    convert.add_argument('--label-encoder', default=None, help='Defaults to label_encoder.pkl next to the model')
+    convert.add_argument('--out', default=None, help='Defaults to the model path with a .evb extension')
+
+    inspect = subparsers.add_parser('inspect', help='Print a bundle header')
+    inspect.add_argument('bundle')
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        from emergency_voice_model import EmergencyVoiceClassifier
+
+        model_dir = os.path.dirname(os.path.abspath(args.model))
+        classifier = EmergencyVoiceClassifier(
+            args.model,
+            scaler_path=args.scaler or os.path.join(model_dir, 'scaler.pkl'),
+            label_encoder_path=args.label_encoder or os.path.join(model_dir, 'label_encoder.pkl')
+        )
+        classifier.load_model()
+        out = args.out or os.path.splitext(args.model)[0] + BUNDLE_EXTENSION
+        version = classifier.save_bundle(out, metadata={'converted_from': os.path.basename(args.model)})
+        print(f"Bundle written to {out} (model version {version})")
+    else:
+        header, _ = read_header(args.bundle)
+        header.pop('arrays')
+        print(json.dumps(header, indent=2))
+
+
+if __name__ == '__main__':
+    main()
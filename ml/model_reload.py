@@ -0,0 +1,168 @@
+"""
+Hot model reload for the Emergency Voice API
+
+A ModelReloader loads a candidate classifier on a background thread, warms it
+up, validates it on a reference clip set and only then hands it to the
+server's swap callback. The server swaps a single global reference, so
+requests that already picked up the old classifier finish on it while new
+requests see the new one.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from emergency_voice_model import EmergencyVoiceClassifier
+
+logger = logging.getLogger(__name__)
+
+
+def load_candidate(model_path: str, scaler_path: Optional[str] = None,
+                   label_encoder_path: Optional[str] = None) -> EmergencyVoiceClassifier:
+    """
+    Load a classifier, resolving preprocessing files next to the model file,
+    with the prefix models found next to it (for progressive prediction)
+    """
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    candidate = EmergencyVoiceClassifier(
+        model_path,
+        scaler_path=scaler_path or os.path.join(model_dir, 'scaler.pkl'),
+        label_encoder_path=label_encoder_path or os.path.join(model_dir, 'label_encoder.pkl')
+    )
+    candidate.load_model()
+    candidate.load_prefix_models()
+    return candidate
+
+
+def warm_up(candidate: EmergencyVoiceClassifier, iterations: int = 3):
+    """
+    Run a few predictions so lazy initialisation happens before traffic arrives
+    """
+    length = int(candidate.sample_rate * candidate.duration)
+    rng = np.random.default_rng(0)
+    for _ in range(iterations):
+        candidate.predict(rng.normal(0.0, 0.05, length).astype(np.float32))
+
+
+def validate_on_reference_clips(candidate: EmergencyVoiceClassifier, clips_dir: str) -> Dict[str, Any]:
+    """
+    Score the candidate on `clips_dir/emergency/*.wav` and `clips_dir/normal/*.wav`
+    """
+    correct = 0
+    total = 0
+    failures = []
+    for label in ('emergency', 'normal'):
+        label_dir = os.path.join(clips_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if not name.endswith('.wav'):
+                continue
+            result = candidate.predict_from_file(os.path.join(label_dir, name))
+            total += 1
+            if 'error' in result:
+                failures.append(name)
+                continue
+            # class_label, not is_emergency: is_emergency is `probability > threshold`
+            # for encoded class 1, which is 'normal' with the alphabetical label encoder
+            if result['class_label'] == label:
+                correct += 1
+    return {
+        'clips': total,
+        'correct': correct,
+        'accuracy': correct / total if total else None,
+        'failed_clips': failures
+    }
+
+
+class ModelReloader:
+    """
+    Serialises reloads and tracks the status of the most recent one
+    """
+
+    def __init__(self, on_swap: Callable[[EmergencyVoiceClassifier], None],
+                 reference_clips_dir: Optional[str] = None, min_accuracy: float = 0.8):
+        self.on_swap = on_swap
+        self.reference_clips_dir = reference_clips_dir
+        self.min_accuracy = min_accuracy
+        self._lock = threading.Lock()
+        self.status: Dict[str, Any] = {'state': 'idle'}
+
+    def start(self, model_path: str, scaler_path: Optional[str] = None,
+              label_encoder_path: Optional[str] = None) -> bool:
+        """
+        Start a background reload; returns False if one is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.status = {'state': 'loading', 'model_path': model_path, 'started_at': time.time()}
+        thread = threading.Thread(
+            target=self._run, args=(model_path, scaler_path, label_encoder_path),
+            name='model-reload', daemon=True
+        )
+        thread.start()
+        return True
+
+    def _run(self, model_path, scaler_path, label_encoder_path):
+        status = dict(self.status)
+        try:
+            candidate = load_candidate(model_path, scaler_path, label_encoder_path)
+            status['model_version'] = candidate.model_version
+            status['prefix_models'] = [prefix_model.duration for prefix_model in candidate.prefix_models]
+
+            status['state'] = 'warming'
+            self.status = dict(status)
+            warm_up(candidate)
+
+            if self.reference_clips_dir:
+                status['state'] = 'validating'
+                self.status = dict(status)
+                validation = validate_on_reference_clips(candidate, self.reference_clips_dir)
+                status['validation'] = validation
+                if validation['clips'] == 0:
+                    raise ValueError(f"No reference clips found in {self.reference_clips_dir}")
+                if validation['accuracy'] < self.min_accuracy:
+                    raise ValueError(
+                        f"Reference accuracy {validation['accuracy']:.3f} below required {self.min_accuracy:.3f}")
+            else:
+                logger.warning("No reference clip set configured, swapping in %s without validation", model_path)
+
+            self.on_swap(candidate)
+            status['state'] = 'succeeded'
+            logger.info("Model reloaded from %s (version %s)", model_path, candidate.model_version)
+        except Exception as e:
+            status['state'] = 'failed'
+            status['error'] = str(e)
+            logger.error("Model reload from %s failed: %s", model_path, e)
+        finally:
+            status['finished_at'] = time.time()
+            self.status = status
+            self._lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check a model against the reload gate on a reference clip set')
+    parser.add_argument('model_path')
+    parser.add_argument('clips_dir', help='Directory with emergency/ and normal/ WAV clips')
+    parser.add_argument('--min-accuracy', type=float, default=0.8)
+    args = parser.parse_args()
+
+    candidate = load_candidate(args.model_path)
+    validation = validate_on_reference_clips(candidate, args.clips_dir)
+    print(f"{validation['correct']}/{validation['clips']} reference clips correct "
+          f"(accuracy {validation['accuracy'] or 0.0:.3f}, gate {args.min_accuracy:.3f})")
+    if validation['failed_clips']:
+        print(f"Failed to score: {', '.join(validation['failed_clips'])}")
+    passed = validation['clips'] > 0 and validation['accuracy'] >= args.min_accuracy
+    print("PASS" if passed else "FAIL")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Parallel k-fold cross-validation and hyperparameter search
+
+Each trial is one build_model configuration (layer widths, dropout, learning
+rate, batch size) scored by stratified k-fold cross-validation: the scaler
+is fitted on the training folds only and every example is scored exactly
+once, on a fold it was not trained on. Early stopping monitors an inner,
+stratified split of the training folds (`early_stopping_split`), never the
+fold being scored, so the stopping epoch cannot be tuned to the score.
+
+Trials run on a pool of spawned CPU processes. Each worker pins TensorFlow
+to `threads_per_worker` intra-op threads (and one inter-op thread), so
+n_workers x threads_per_worker should roughly match the core count.
+
+Pruning: after each fold a trial compares its mean validation accuracy so
+far with the median that other trials reached after the same number of
+folds, and stops early if it is more than `prune_margin` below.
+
+Usage:
+    python model_search.py --trials 24 --folds 5 --workers 4 --threads-per-worker 2
+    python model_search.py --default-only --folds 5     # cross-validate the current model
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_SEARCH_SPACE = {
+    'hidden_units': [[256, 128, 64, 32, 16], [128, 64, 32, 16], [64, 32, 16], [32, 16]],
+    'dropout': [0.1, 0.2, 0.3],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+    'batch_size': [32, 64, 128],
+}
+
+# The configuration train_model.py trains today
+DEFAULT_TRIAL = {
+    'hidden_units': [256, 128, 64, 32, 16],
+    'dropout_rates': [0.3, 0.3, 0.2, 0.2, 0.0],
+    'learning_rate': 1e-3,
+    'batch_size': 32,
+}
+
+# Worker state, set by the initializer
+_worker: Dict[str, Any] = {}
+
+
+def dropout_schedule(dropout: float, n_layers: int) -> List[float]:
+    """
+    Per-layer dropout rates for a scalar dropout (no dropout before the output layer)
+    """
+    return [dropout] * (n_layers - 1) + [0.0]
+
+
+def expand_trials(space: Dict[str, List[Any]], n_trials: Optional[int] = None,
+                  seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Full grid over the search space, or a random sample of n_trials from it
+    """
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+    if n_trials is not None and n_trials < len(grid):
+        grid = random.Random(seed).sample(grid, n_trials)
+    trials = []
+    for params in grid:
+        params = dict(params)
+        params['dropout_rates'] = dropout_schedule(params.pop('dropout'), len(params['hidden_units']))
+        trials.append(params)
+    return trials
+
+
+def _init_search_worker(X: np.ndarray, y: np.ndarray, folds: List[Any], threads: int,
+                        epochs: int, patience: int, prune_margin: float, fold_scores):
+    # Thread settings must be in place before TensorFlow runs any op
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    _worker.update(X=X, y=y, folds=folds, epochs=epochs, patience=patience, prune_margin=prune_margin,
+                   fold_scores=fold_scores, classifier=EmergencyVoiceClassifier())
+
+
+def _should_prune(fold_index: int, mean_accuracy: float) -> bool:
+    """
+    True if this trial trails the median of other trials after the same number of folds
+    """
+    others = [score for fold, score in list(_worker['fold_scores']) if fold == fold_index]
+    if len(others) < 3:
+        return False
+    return mean_accuracy < float(np.median(others)) - _worker['prune_margin']
+
+
+def _run_trial(trial_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    from sklearn.preprocessing import StandardScaler
+    from tensorflow import keras
+
+    X, y = _worker['X'], _worker['y']
+    start = time.time()
+    accuracies = []
+    losses = []
+    epochs_run = []
+    pruned = False
+    n_params = 0
+    latency_ms = None
+
+    for fold_index, (train_idx, stop_idx, val_idx) in enumerate(_worker['folds']):
+        scaler = StandardScaler().fit(X[train_idx])
+        X_train, X_stop, X_val = (scaler.transform(X[train_idx]), scaler.transform(X[stop_idx]),
+                                  scaler.transform(X[val_idx]))
+
+        keras.backend.clear_session()
+        model = _worker['classifier'].build_model(X.shape[1], hidden_units=params['hidden_units'],
+                                                  dropout_rates=params['dropout_rates'],
+                                                  learning_rate=params['learning_rate'])
+        callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss', patience=_worker['patience'],
+                                                   restore_best_weights=True)]
+        # val_idx is only ever evaluated, after fitting
+        history = model.fit(X_train, y[train_idx], validation_data=(X_stop, y[stop_idx]),
+                            epochs=_worker['epochs'], batch_size=params['batch_size'],
+                            callbacks=callbacks, verbose=0)
+        loss, accuracy = model.evaluate(X_val, y[val_idx], verbose=0)[:2]
+        accuracies.append(float(accuracy))
+        losses.append(float(loss))
+        epochs_run.append(len(history.history['loss']))
+
+        if fold_index == 0:
+            n_params = int(model.count_params())
+            # Per-clip inference cost, as the API sees it (one row per call)
+            row = X_val[:1]
+            model(row, training=False)
+            timer = time.perf_counter()
+            for _ in range(50):
+                model(row, training=False)
+            latency_ms = (time.perf_counter() - timer) / 50 * 1000
+
+        mean_accuracy = float(np.mean(accuracies))
+        pruned = fold_index + 1 < len(_worker['folds']) and _should_prune(fold_index, mean_accuracy)
+        _worker['fold_scores'].append((fold_index, mean_accuracy))
+        if pruned:
+            break
+
+    return {
+        'trial': trial_id,
+        'hidden_units': '-'.join(str(units) for units in params['hidden_units']),
+        'dropout_rates': '/'.join(f"{rate:g}" for rate in params['dropout_rates']),
+        'learning_rate': params['learning_rate'],
+        'batch_size': params['batch_size'],
+        'folds': len(accuracies),
+        'pruned': pruned,
+        'val_accuracy': float(np.mean(accuracies)),
+        'val_accuracy_std': float(np.std(accuracies)),
+        'val_loss': float(np.mean(losses)),
+        'mean_epochs': float(np.mean(epochs_run)),
+        'params': n_params,
+        'latency_ms': latency_ms,
+        'seconds': time.time() - start,
+    }
+
+
+def run_search(X: np.ndarray, y: np.ndarray, trials: List[Dict[str, Any]], n_folds: int = 5,
+               n_workers: Optional[int] = None, threads_per_worker: int = 1, epochs: int = 100,
+               patience: int = 15, prune_margin: float = 0.02, early_stopping_split: float = 0.15,
+               seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Cross-validate every trial configuration on a process pool
+
+    `y` holds the encoded 0/1 labels. Each fold's training part is split
+    again, `early_stopping_split` of it going to the early-stopping monitor.
+    Returns one result row per trial, best mean validation accuracy first.
+    """
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    # (fit, early-stopping, scored) index triples, shared by every trial
+    folds = []
+    for train_idx, val_idx in StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X, y):
+        fit_idx, stop_idx = train_test_split(train_idx, test_size=early_stopping_split, random_state=seed,
+                                             stratify=y[train_idx])
+        folds.append((fit_idx, stop_idx, val_idx))
+
+    print(f"Running {len(trials)} trials x {n_folds} folds on {n_workers} workers "
+          f"({threads_per_worker} TF threads each)")
+    start = time.time()
+    results = []
+    # Spawned workers, so TensorFlow state from the parent is never forked
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        fold_scores = manager.list()
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_search_worker,
+                                 initargs=(X, y, folds, threads_per_worker, epochs, patience,
+                                           prune_margin, fold_scores)) as executor:
+            futures = [executor.submit(_run_trial, trial_id, params) for trial_id, params in enumerate(trials)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = 'pruned' if result['pruned'] else 'done'
+                print(f"[{len(results)}/{len(trials)}] trial {result['trial']} {status}: "
+                      f"acc {result['val_accuracy']:.4f} over {result['folds']} folds, "
+                      f"{result['params']} params, {result['seconds']:.0f}s")
+
+    print(f"Search finished in {time.time() - start:.0f}s")
+    return sorted(results, key=lambda result: (result['pruned'], -result['val_accuracy']))
+
+
+def format_results(results: List[Dict[str, Any]], limit: Optional[int] = None) -> str:
+    columns = [('trial', '{}'), ('hidden_units', '{}'), ('dropout_rates', '{}'), ('learning_rate', '{:g}'),
+               ('batch_size', '{}'), ('folds', '{}'), ('val_accuracy', '{:.4f}'), ('val_accuracy_std', '{:.4f}'),
+               ('val_loss', '{:.4f}'), ('params', '{}'), ('latency_ms', '{:.3f}'), ('pruned', '{}')]
+    rows = [[fmt.format(result[name]) if result[name] is not None else '-' for name, fmt in columns]
+            for result in results[:limit]]
+    widths = [max(len(name), *(len(row[i]) for row in rows)) if rows else len(name)
+              for i, (name, _) in enumerate(columns)]
+    lines = ['  '.join(name.ljust(width) for (name, _), width in zip(columns, widths))]
+    lines.extend('  '.join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+    return '\n'.join(lines)
+
+
+def save_results(results: List[Dict[str, Any]], path: str):
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='k-fold cross-validation and hyperparameter search')
+    parser.add_argument('--dataset-dir', default='dataset')
+    parser.add_argument('--shards-dir', default='dataset_shards')
+    parser.add_argument('--trials', type=int, default=None, help='Random sample of the grid (default: full grid)')
+    parser.add_argument('--space', default=None, help='JSON file overriding the search space')
+    parser.add_argument('--default-only', action='store_true', help='Only cross-validate the current configuration')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--patience', type=int, default=15)
+    parser.add_argument('--prune-margin', type=float, default=0.02)
+    parser.add_argument('--early-stopping-split', type=float, default=0.15,
+                        help='Fraction of each fold\'s training part held out for early stopping')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='search_results.csv', help='.csv or .json')
+    args = parser.parse_args()
+
+    from sklearn.preprocessing import LabelEncoder
+    from train_model import load_dataset_from_files, load_dataset_from_shards, use_shards
+
+    if use_shards(args.shards_dir, args.dataset_dir):
+        X, labels, _ = load_dataset_from_shards(args.shards_dir)
+    else:
+        X, labels, _ = load_dataset_from_files(args.dataset_dir)
+    y = LabelEncoder().fit_transform(labels).astype(np.float32)
+
+    if args.default_only:
+        trials = [DEFAULT_TRIAL]
+    else:
+        space = DEFAULT_SEARCH_SPACE
+        if args.space:
+            with open(args.space) as f:
+                space = json.load(f)
+        trials = expand_trials(space, args.trials, args.seed)
+
+    results = run_search(X, y, trials, n_folds=args.folds, n_workers=args.workers,
+                         threads_per_worker=args.threads_per_worker, epochs=args.epochs,
+                         patience=args.patience, prune_margin=args.prune_margin,
+                         early_stopping_split=args.early_stopping_split, seed=args.seed)
+    print()
+    print(format_results(results))
+    save_results(results, args.output)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-request profiling support for the Emergency Voice API
+
+A RequestProfile collects wall and CPU time for each processing stage of a
+single request, plus the per-feature-group breakdown reported by
+EmergencyVoiceClassifier.extract_features. When memory tracing is on (see
+memory_profiling.py) each stage and feature group also reports its peak
+traced allocation. Optionally a cProfile run of the request is written to a
+local directory for offline inspection.
+"""
+
+import cProfile
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from memory_profiling import PeakMeasurement
+
+
+class RequestProfile:
+    """
+    Stage-by-stage timing breakdown for one request
+    """
+
+    def __init__(self, endpoint: str, profile_dir: Optional[str] = None):
+        self.endpoint = endpoint
+        self.profile_dir = profile_dir
+        self.stages: List[Dict[str, Any]] = []
+        self.feature_groups: Dict[str, Dict[str, float]] = {}
+        self.cprofile_path = None
+        self._profiler = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        memory = PeakMeasurement().start()
+        try:
+            yield
+        finally:
+            entry = {
+                'stage': name,
+                'wall_ms': (time.perf_counter() - wall_start) * 1000.0,
+                'cpu_ms': (time.thread_time() - cpu_start) * 1000.0
+            }
+            if memory.stop() is not None:
+                entry['peak_memory_bytes'] = memory.peak_bytes
+            self.stages.append(entry)
+
+    def start_cprofile(self):
+        """
+        Start collecting a cProfile trace for the rest of the request
+        """
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop_cprofile(self) -> Optional[str]:
+        """
+        Stop the cProfile trace (if any) and dump it to the profile directory
+        """
+        if self._profiler is None:
+            return None
+        self._profiler.disable()
+        profiler, self._profiler = self._profiler, None
+        if not self.profile_dir:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        filename = f"{self.endpoint.strip('/') or 'root'}-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.prof"
+        self.cprofile_path = os.path.join(self.profile_dir, filename)
+        profiler.dump_stats(self.cprofile_path)
+        return self.cprofile_path
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.stop_cprofile()
+        report = {
+            'total_wall_ms': (time.perf_counter() - self._wall_start) * 1000.0,
+            'total_cpu_ms': (time.thread_time() - self._cpu_start) * 1000.0,
+            'stages': self.stages,
+            'feature_groups': self.feature_groups
+        }
+        if self.cprofile_path:
+            report['cprofile_file'] = self.cprofile_path
+        return report
+
+
+@contextmanager
+def time_feature_group(timings: Dict[str, Dict[str, float]], name: str):
+    """
+    Accumulate wall and CPU time for a feature group into `timings` (and its
+    largest peak traced allocation, when tracing)
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    memory = PeakMeasurement().start()
+    try:
+        yield
+    finally:
+        entry = timings.setdefault(name, {'wall_ms': 0.0, 'cpu_ms': 0.0})
+        entry['wall_ms'] += (time.perf_counter() - wall_start) * 1000.0
+        entry['cpu_ms'] += (time.thread_time() - cpu_start) * 1000.0
+        if memory.stop() is not None:
+            entry['peak_memory_bytes'] = max(entry.get('peak_memory_bytes', 0), memory.peak_bytes)
@@ -0,0 +1,264 @@
+"""
+Progressive early-decision prediction on partial audio
+
+The full model needs `duration` (3 s) of audio before it can score. Prefix
+models are the same network trained on only the first 1 s, 2 s, ... of
+each training clip, stored as bundles next to the main model:
+
+    emergency_voice_model.evb       full model (3 s)
+    emergency_voice_model.1s.evb    prefix model, first 1 s
+    emergency_voice_model.2s.evb    prefix model, first 2 s
+
+Progressive prediction scores growing prefixes of a recording with the
+matching prefix model, then the whole clip with the full model. Each
+prefix model has an early threshold on P(emergency), stored in its bundle
+metadata, that is stricter than the full model's decision: it is
+calibrated on held-out clips so that an early decision fires on no more
+than `max_false_alarm_rate` of non-emergency clips. The full model's
+result (its class_label) is final and refines (confirms or withdraws) any
+early decision.
+
+The network outputs the probability of encoded class 1, which is 'normal'
+with the sorted label encoder; calibration and decisions here go through
+EmergencyVoiceClassifier.emergency_probability().
+
+Usage:
+    python progressive.py train --dataset dataset --prefixes 1 2
+    python progressive.py score clip.wav --model emergency_voice_model.evb
+"""
+
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_PREFIX_SECONDS = (1.0, 2.0)
+DEFAULT_MAX_FALSE_ALARM_RATE = 0.01
+# A prefix stage counts as covered when the audio is at most this much shorter
+STAGE_TOLERANCE_SECONDS = 0.05
+
+_PREFIX_SUFFIX = re.compile(r'\.(\d+(?:\.\d+)?)s\.evb')
+
+
+def _model_stem(model_path: str) -> str:
+    stem, extension = os.path.splitext(model_path)
+    return stem if extension in ('.evb', '.h5', '.keras') else model_path
+
+
+def prefix_bundle_path(model_path: str, seconds: float) -> str:
+    """
+    Path of the prefix model for `seconds` next to a main model file
+    """
+    return f"{_model_stem(model_path)}.{seconds:g}s.evb"
+
+
+def find_prefix_bundles(model_path: str) -> List[Tuple[float, str]]:
+    """
+    (seconds, path) for every prefix bundle next to a main model file, shortest first
+    """
+    stem = _model_stem(model_path)
+    found = []
+    for path in glob.glob(glob.escape(stem) + '.*s.evb'):
+        match = _PREFIX_SUFFIX.fullmatch(path[len(stem):])
+        if match:
+            found.append((float(match.group(1)), path))
+    return sorted(found)
+
+
+def early_threshold(prefix_model) -> Optional[float]:
+    """
+    A prefix model's calibrated P(emergency) threshold, or None if its bundle
+    predates it (those were calibrated on P(normal) and must be retrained)
+    """
+    return prefix_model.bundle_metadata.get('progressive', {}).get('early_threshold')
+
+
+def calibrate_early_threshold(probabilities: np.ndarray, positives: np.ndarray,
+                              max_false_alarm_rate: float = DEFAULT_MAX_FALSE_ALARM_RATE,
+                              minimum: float = 0.5) -> float:
+    """
+    Lowest threshold (not below `minimum`) whose false-alarm rate on the
+    held-out negatives is at most `max_false_alarm_rate`
+    """
+    negatives = np.sort(np.asarray(probabilities)[~np.asarray(positives, dtype=bool)])[::-1]
+    allowed = int(max_false_alarm_rate * len(negatives))
+    if allowed >= len(negatives):
+        return float(minimum)
+    # At most `allowed` negatives score strictly above the (allowed+1)-th highest
+    return float(max(minimum, negatives[allowed]))
+
+
+def train_prefix_model(X: np.ndarray, y: np.ndarray, seconds: float, bundle_path: str,
+                       max_false_alarm_rate: float = DEFAULT_MAX_FALSE_ALARM_RATE,
+                       calibration_split: float = 0.2, epochs: int = 100) -> Dict[str, Any]:
+    """
+    Train a prefix model on features of the first `seconds` of each clip,
+    calibrate its early-decision threshold and save it as a bundle
+
+    Returns the calibration summary stored in the bundle metadata.
+    """
+    from sklearn.model_selection import train_test_split
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    X_fit, X_cal, y_fit, y_cal = train_test_split(X, y, test_size=calibration_split, random_state=42, stratify=y)
+    with tempfile.TemporaryDirectory() as work_dir:
+        # train() checkpoints the Keras model and pickles the scaler; keep those out of the model directory
+        classifier = EmergencyVoiceClassifier(os.path.join(work_dir, 'prefix_model.h5'),
+                                              scaler_path=os.path.join(work_dir, 'scaler.pkl'),
+                                              label_encoder_path=os.path.join(work_dir, 'label_encoder.pkl'))
+        classifier.duration = seconds
+        history = classifier.train(X_fit, y_fit, epochs=epochs, verbose=2)
+
+        probabilities = classifier.emergency_probability(
+            classifier.model.predict(classifier.scaler.transform(X_cal), verbose=0).reshape(-1))
+        positives = np.asarray(y_cal) == 'emergency'
+        threshold = calibrate_early_threshold(probabilities, positives, max_false_alarm_rate,
+                                              minimum=classifier.threshold)
+        fired = probabilities > threshold
+        calibration = {
+            'prefix_seconds': seconds,
+            'early_threshold': threshold,
+            'max_false_alarm_rate': max_false_alarm_rate,
+            'false_alarm_rate': float(fired[~positives].mean()) if (~positives).any() else 0.0,
+            'early_recall': float(fired[positives].mean()) if positives.any() else 0.0,
+            'calibration_clips': int(len(y_cal)),
+        }
+        # The bundle's own threshold stays the plain class decision; the early
+        # threshold is on P(emergency) and lives in the metadata
+        classifier.save_bundle(bundle_path, metadata={
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'samples': int(len(X_fit)),
+            'epochs_run': len(history.history['loss']),
+            'progressive': calibration,
+        })
+    return calibration
+
+
+def iter_progressive(classifier, audio_data: np.ndarray, sr: int = None, partial: bool = False,
+                     after_seconds: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """
+    Score growing prefixes of `audio_data`, yielding one result per stage
+
+    Prefix stages the audio does not cover are skipped. The full-model
+    stage is scored when the audio covers it or, unless `partial` (more
+    audio is still to come), on whatever audio there is, as predict() would.
+    Stages of `after_seconds` or less are skipped, so a client posting a
+    growing recording only pays for the new stages.
+
+    A prefix stage's is_emergency (and early_decision) is P(emergency)
+    above its early threshold; the final stage's is the full model's
+    class_label. `threshold` is the stage's threshold on P(emergency).
+    """
+    import librosa
+
+    if classifier.model is None:
+        raise ValueError("Model not loaded. Call load_model() first.")
+    if sr is None:
+        sr = classifier.sample_rate
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    if sr != classifier.sample_rate:
+        audio_data = librosa.resample(audio_data, orig_sr=sr, target_sr=classifier.sample_rate)
+        sr = classifier.sample_rate
+    available = len(audio_data) / sr
+
+    alert_seconds = None
+    for seconds, model in classifier.progressive_stages():
+        final = model is classifier
+        if seconds <= after_seconds:
+            continue
+        if available + STAGE_TOLERANCE_SECONDS < seconds and (partial or not final):
+            continue
+        result = model.predict(audio_data[:int(round(seconds * sr))], sr)
+        probability = float(model.emergency_probability(result['confidence']))
+        if final:
+            # class_label is `P(class 1) > model.threshold`; the same cut expressed on P(emergency)
+            threshold = float(model.emergency_probability(model.threshold))
+            is_emergency = result['class_label'] == 'emergency'
+        else:
+            threshold = early_threshold(model)
+            is_emergency = probability > threshold
+        audio_seconds = min(seconds, available)
+        if is_emergency and alert_seconds is None:
+            alert_seconds = round(audio_seconds, 3)
+        yield {
+            'stage_seconds': seconds,
+            'audio_seconds': round(audio_seconds, 3),
+            'is_emergency': is_emergency,
+            'confidence': result['confidence'],
+            'emergency_probability': probability,
+            'class_label': result['class_label'],
+            'threshold': threshold,
+            'early_decision': not final and is_emergency,
+            'final': final,
+            'alert_seconds': alert_seconds,
+            'stage_model_version': model.model_version,
+        }
+
+
+def train_main(args):
+    from emergency_voice_model import EmergencyVoiceClassifier
+    from train_model import load_dataset_from_files
+
+    main_duration = EmergencyVoiceClassifier().duration
+    for seconds in sorted(args.prefixes):
+        if not 0 < seconds < main_duration:
+            raise SystemExit(f"Prefix lengths must be between 0 and {main_duration}s, got {seconds}")
+        print(f"\nPrefix model: first {seconds:g}s")
+        X, y, _ = load_dataset_from_files(args.dataset, n_workers=args.workers, duration=seconds)
+        bundle_path = prefix_bundle_path(args.model, seconds)
+        calibration = train_prefix_model(X, y, seconds, bundle_path, max_false_alarm_rate=args.max_false_alarm_rate,
+                                         epochs=args.epochs)
+        print(f"Early threshold P(emergency) > {calibration['early_threshold']:.3f}: "
+              f"false alarms {calibration['false_alarm_rate']:.2%}, "
+              f"early recall {calibration['early_recall']:.2%} "
+              f"on {calibration['calibration_clips']} held-out clips -> {bundle_path}")
+
+
+def score_main(args):
+    import librosa
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    classifier = EmergencyVoiceClassifier(args.model)
+    classifier.load_model()
+    stages = classifier.load_prefix_models()
+    print(f"Prefix models: {', '.join(f'{s:g}s' for s in stages) or 'none'}")
+    audio_data, sr = librosa.load(args.path, sr=classifier.sample_rate, duration=classifier.duration)
+    for result in classifier.predict_progressive(audio_data, sr):
+        kind = 'final' if result['final'] else ('EARLY ALERT' if result['early_decision'] else 'no early decision')
+        print(f"  {result['stage_seconds']:>4g}s  P(emergency) {result['emergency_probability']:.3f} "
+              f"(threshold {result['threshold']:.3f})  {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train prefix models and score clips progressively')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Train and calibrate prefix models')
+    train_parser.add_argument('--dataset', default='dataset')
+    train_parser.add_argument('--model', default='emergency_voice_model.evb',
+                              help='Main model; prefix bundles are written next to it')
+    train_parser.add_argument('--prefixes', type=float, nargs='+', default=list(DEFAULT_PREFIX_SECONDS),
+                              help='Prefix lengths in seconds')
+    train_parser.add_argument('--max-false-alarm-rate', type=float, default=DEFAULT_MAX_FALSE_ALARM_RATE,
+                              help='Early-decision false alarms allowed on held-out normal clips')
+    train_parser.add_argument('--epochs', type=int, default=100)
+    train_parser.add_argument('--workers', type=int, default=None)
+
+    score_parser = subparsers.add_parser('score', help='Score one clip stage by stage')
+    score_parser.add_argument('path')
+    score_parser.add_argument('--model', default='emergency_voice_model.evb')
+
+    args = parser.parse_args()
+    if args.command == 'train':
+        train_main(args)
+    else:
+        score_main(args)
+
+
+if __name__ == '__main__':
+    main()
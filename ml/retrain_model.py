@@ -1,14 +1,224 @@
 #!/usr/bin/env python3
-"""Retrain the Emergency Voice Detection Model"""
+"""Retrain the Emergency Voice Detection Model
+
+Without arguments this runs the full training pipeline (train_model.main).
+
+With --incremental it warm-starts from the current model bundle instead:
+
+    1. load the bundle (weights, scaler, labels)
+    2. featurize only the newly labeled clips in --new-dir/{emergency,normal}/
+    3. update the scaler statistics with the new clips (partial_fit) and fold
+       the change into the first layer, so the network's function is unchanged
+       before fine-tuning starts
+    4. fine-tune from the existing weights on the new clips plus a replay
+       sample of the original training data
+    5. score the current and candidate models on held-out new clips and on
+       the original validation split recorded in the bundle, and promote the
+       candidate only if it does at least as well on the new clips without
+       regressing on the original data
+
+Usage:
+    python retrain_model.py --incremental --new-dir incoming
+"""
 
 import sys
 import os
+import argparse
+import copy
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from train_model import main
 
+
+def adapt_first_layer(model, old_scaler, new_scaler):
+    """
+    Rewrite the first Dense layer so the model gives the same outputs on
+    features scaled with new_scaler as it did with old_scaler
+    """
+    # (x - m_old) / s_old == ((x - m_new) / s_new) * (s_new / s_old) + (m_new - m_old) / s_old
+    ratio = (new_scaler.scale_ / old_scaler.scale_).astype(np.float32)
+    shift = ((new_scaler.mean_ - old_scaler.mean_) / old_scaler.scale_).astype(np.float32)
+    first = model.layers[0]
+    kernel, bias = first.get_weights()
+    first.set_weights([kernel * ratio[:, None], bias + shift @ kernel])
+
+
+def split_holdout(n: int, fraction: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    order = rng.permutation(n)
+    n_holdout = int(round(n * fraction)) if n > 1 else 0
+    return np.sort(order[n_holdout:]), np.sort(order[:n_holdout])
+
+
+def original_holdout(keys: List[str], validation_files: Optional[List[str]], fraction: float,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    (replay pool, held-out) indices into the original dataset, and whether
+    the held-out set is the validation split recorded at training time
+
+    `keys` are the dataset's clips as <label>/<filename>, the form train_model
+    stores in the bundle's `validation_files`. Without that list the model
+    has been trained on (almost) every original clip, so a random holdout
+    only measures fit on training data and the regression gate is optimistic.
+    """
+    held = set(validation_files or [])
+    mask = np.array([key in held for key in keys], dtype=bool)
+    if not mask.any():
+        if held:
+            print("Warning: none of the recorded validation clips are in the dataset any more")
+        pool, holdout = split_holdout(len(keys), fraction, rng)
+        return pool, holdout, False
+    missing = len(held) - int(mask.sum())
+    if missing:
+        print(f"Warning: {missing} of {len(held)} recorded validation clips are no longer in the dataset")
+    return np.flatnonzero(~mask), np.flatnonzero(mask), True
+
+
+def accuracy(model, scaler, threshold: float, X: np.ndarray, y: np.ndarray) -> float:
+    if len(X) == 0:
+        return float('nan')
+    probabilities = model.predict(scaler.transform(X), verbose=0).reshape(-1)
+    return float(np.mean((probabilities > threshold).astype(int) == y))
+
+
+def incremental_retrain(bundle_path: str = 'emergency_voice_model.evb', new_dir: str = 'incoming',
+                        dataset_dir: str = 'dataset', replay_ratio: float = 3.0, holdout_fraction: float = 0.25,
+                        epochs: int = 20, batch_size: int = 32, learning_rate: float = 1e-4,
+                        max_regression: float = 0.01, seed: int = 42, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Fine-tune the bundled model on new clips and promote it if it passes the gate
+    """
+    from tensorflow import keras
+    from emergency_voice_model import EmergencyVoiceClassifier
+    from model_bundle import ModelBundle
+    from train_model import load_dataset_from_files
+
+    rng = np.random.default_rng(seed)
+    keras.utils.set_random_seed(seed)
+
+    print("Step 1: Loading current model bundle...")
+    classifier = EmergencyVoiceClassifier()
+    classifier.load_bundle(bundle_path)
+    current_model = classifier.model
+    old_scaler = classifier.scaler
+    encoder = classifier.label_encoder
+    threshold = classifier.threshold
+
+    print("\nStep 2: Featurizing new clips...")
+    X_new, labels_new, _ = load_dataset_from_files(new_dir)
+    if len(X_new) == 0:
+        raise ValueError(f"No labeled clips found under {new_dir}/{{emergency,normal}}/")
+    y_new = encoder.transform(labels_new)
+    new_train, new_holdout = split_holdout(len(X_new), holdout_fraction, rng)
+
+    print("\nLoading original training data for replay and regression checks...")
+    X_old, labels_old, filenames_old = load_dataset_from_files(dataset_dir)
+    y_old = encoder.transform(labels_old)
+    validation_files = classifier.bundle_metadata.get('validation_files')
+    old_pool, old_holdout, recorded = original_holdout(
+        [f'{label}/{filename}' for label, filename in zip(labels_old, filenames_old)],
+        validation_files, holdout_fraction, rng)
+    if not recorded:
+        print("Warning: no recorded validation split applies, so original clips are held out at random. "
+              "The model was trained on them, and the regression check is optimistic.")
+    n_replay = min(len(old_pool), int(round(len(new_train) * replay_ratio)))
+    replay = rng.choice(old_pool, size=n_replay, replace=False)
+    print(f"New clips: {len(new_train)} train, {len(new_holdout)} held out; "
+          f"replay: {n_replay}; original held out: {len(old_holdout)}")
+
+    print("\nStep 3: Updating scaler statistics...")
+    new_scaler = copy.deepcopy(old_scaler)
+    new_scaler.partial_fit(X_new[new_train])
+    model = ModelBundle(bundle_path).build_keras_model()
+    adapt_first_layer(model, old_scaler, new_scaler)
+
+    print("\nStep 4: Fine-tuning on new clips + replay...")
+    X_train = np.vstack([X_new[new_train], X_old[replay]])
+    y_train = np.concatenate([y_new[new_train], y_old[replay]]).astype(np.float32)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='binary_crossentropy', metrics=['accuracy'])
+    history = model.fit(new_scaler.transform(X_train), y_train, epochs=epochs, batch_size=batch_size,
+                        validation_split=0.1 if len(X_train) >= 20 else 0.0, shuffle=True,
+                        callbacks=[keras.callbacks.EarlyStopping(
+                            monitor='val_loss' if len(X_train) >= 20 else 'loss',
+                            patience=5, restore_best_weights=True)],
+                        verbose=1)
+
+    print("\nStep 5: Evaluating on held-out data...")
+    scores = {
+        'current_new': accuracy(current_model, old_scaler, threshold, X_new[new_holdout], y_new[new_holdout]),
+        'candidate_new': accuracy(model, new_scaler, threshold, X_new[new_holdout], y_new[new_holdout]),
+        'current_original': accuracy(current_model, old_scaler, threshold, X_old[old_holdout], y_old[old_holdout]),
+        'candidate_original': accuracy(model, new_scaler, threshold, X_old[old_holdout], y_old[old_holdout]),
+    }
+    for name, value in scores.items():
+        print(f"  {name:<20} {value:.4f}")
+
+    # Without held-out new clips, only the regression check applies
+    new_ok = len(new_holdout) == 0 or scores['candidate_new'] >= scores['current_new']
+    no_regression = scores['candidate_original'] >= scores['current_original'] - max_regression
+    promote = new_ok and no_regression and not dry_run
+
+    classifier.model = model
+    classifier.scaler = new_scaler
+    candidate_path = bundle_path + '.candidate'
+    version = classifier.save_bundle(candidate_path, metadata={
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'incremental': True,
+        'parent_version': classifier.model_version,
+        'new_clips': int(len(X_new)),
+        'replay_clips': int(n_replay),
+        'epochs_run': len(history.history['loss']),
+        'holdout_scores': scores,
+        'original_holdout': 'validation_split' if recorded else 'random',
+        # Replay never trained on these, so the next retrain can gate on them too
+        'validation_files': validation_files if recorded else None,
+        'new_dir': os.path.abspath(new_dir),
+        'dataset_dir': os.path.abspath(dataset_dir)
+    })
+
+    if promote:
+        shutil.copy2(bundle_path, bundle_path + '.prev')
+        os.replace(candidate_path, bundle_path)
+        print(f"\nPromoted {version} to {bundle_path} (previous bundle kept as {bundle_path}.prev)")
+    else:
+        reason = 'dry run' if dry_run else ('worse on new clips' if not new_ok
+                                            else 'regression on original data')
+        print(f"\nCandidate {version} not promoted ({reason}); left at {candidate_path}")
+
+    return {'model_version': version, 'promoted': promote, 'scores': scores}
+
+
 if __name__ == "__main__":
-    print("Retraining Emergency Voice Detection Model...")
-    main()
+    parser = argparse.ArgumentParser(description='Retrain the emergency voice model')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Warm-start from the current bundle using newly labeled clips')
+    parser.add_argument('--bundle', default='emergency_voice_model.evb')
+    parser.add_argument('--new-dir', default='incoming', help='New clips under <dir>/emergency and <dir>/normal')
+    parser.add_argument('--dataset-dir', default='dataset')
+    parser.add_argument('--replay-ratio', type=float, default=3.0, help='Original clips replayed per new clip')
+    parser.add_argument('--holdout-fraction', type=float, default=0.25)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--max-regression', type=float, default=0.01,
+                        help='Allowed accuracy drop on held-out original data')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dry-run', action='store_true', help='Evaluate and write the candidate, never promote')
+    args = parser.parse_args()
+
+    if args.incremental:
+        print("Incrementally retraining Emergency Voice Detection Model...")
+        incremental_retrain(args.bundle, args.new_dir, args.dataset_dir, replay_ratio=args.replay_ratio,
+                            holdout_fraction=args.holdout_fraction, epochs=args.epochs,
+                            batch_size=args.batch_size, learning_rate=args.learning_rate,
+                            max_regression=args.max_regression, seed=args.seed, dry_run=args.dry_run)
+    else:
+        print("Retraining Emergency Voice Detection Model...")
+        main()
@@ -7,16 +7,18 @@ import os
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from api_server import app, initialize_model
+from api_server import app, configure_api_logging, initialize_model, install_reload_signal_handler, HOST, PORT
 
 if __name__ == "__main__":
     print("Starting Emergency Voice Detection API Server...")
+    configure_api_logging()
     
     if initialize_model():
+        install_reload_signal_handler()
         print("Model loaded successfully!")
-        print("API Server running on http://localhost:5000")
+        print(f"API Server running on http://localhost:{PORT}")
         print("Press Ctrl+C to stop")
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host=HOST, port=PORT, debug=False)
     else:
         print("Failed to load model. Please run setup.py first.")
         sys.exit(1)
@@ -0,0 +1,198 @@
+"""
+Streaming training for corpora larger than memory
+
+Instead of materialising the full feature matrix X, training reads examples
+by index from sharded storage through a tf.data pipeline:
+
+    indices -> parallel map (load clip + extract features, or read feature row)
+            -> cache (file or memory) -> shuffle -> scale -> batch -> prefetch
+
+Scaler statistics are computed with StandardScaler.partial_fit in one
+streaming pass over the training indices only (this pass also fills the
+cache), and the train/validation split is done on indices, so at no point
+does the whole corpus need to fit in memory.
+
+With `augment=True` the training branch skips the feature cache and instead
+applies a randomized audio_effects recipe to every clip before featurizing,
+so each epoch sees fresh variants of the base clips. The per-element seed is
+drawn inside the tf.data graph, so runs are reproducible under
+tf.random.set_seed.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from sklearn.model_selection import train_test_split
+
+from corpus_shards import ShardedCorpus
+from audio_effects import augment_clip
+from training_perf import ThroughputCallback
+
+
+class ClipSource:
+    """
+    Raw clips from a ShardedCorpus, featurized on the fly
+    """
+
+    def __init__(self, corpus: ShardedCorpus, classifier):
+        self.corpus = corpus
+        self.classifier = classifier
+        self.n_features = classifier.get_feature_count()
+
+    def __len__(self) -> int:
+        return len(self.corpus)
+
+    def label_names(self) -> List[str]:
+        return [self.corpus.label_name(i) for i in range(len(self.corpus))]
+
+    def load(self, index: int) -> np.ndarray:
+        clip = self.corpus[int(index)]
+        return self.classifier.extract_features(clip, self.corpus.sample_rate).astype(np.float32)
+
+    def load_augmented(self, index: int, seed: int) -> np.ndarray:
+        index = int(index)
+        clip = augment_clip(self.corpus[index], self.corpus.label_name(index), self.corpus.sample_rate,
+                            rng=np.random.default_rng(int(seed)), length=self.corpus.length)
+        return self.classifier.extract_features(clip, self.corpus.sample_rate).astype(np.float32)
+
+
+class FeatureArraySource:
+    """
+    Precomputed feature rows in a .npy matrix, read through a memory map
+    """
+
+    def __init__(self, features_path: str, labels: List[str]):
+        self.features = np.load(features_path, mmap_mode='r')
+        self.labels = list(labels)
+        self.n_features = self.features.shape[1]
+        if len(self.labels) != self.features.shape[0]:
+            raise ValueError("Number of labels does not match number of feature rows")
+
+    def __len__(self) -> int:
+        return self.features.shape[0]
+
+    def label_names(self) -> List[str]:
+        return self.labels
+
+    def load(self, index: int) -> np.ndarray:
+        return np.asarray(self.features[int(index)], dtype=np.float32)
+
+
+def split_indices(labels: np.ndarray, validation_split: float = 0.2,
+                  seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stratified train/validation split over example indices
+    """
+    indices = np.arange(len(labels))
+    train_idx, val_idx = train_test_split(indices, test_size=validation_split,
+                                          random_state=seed, stratify=labels)
+    return np.sort(train_idx), np.sort(val_idx)
+
+
+def make_feature_dataset(source, indices: np.ndarray, labels: np.ndarray,
+                         cache: Optional[str] = None, augment: bool = False) -> tf.data.Dataset:
+    """
+    Dataset of unscaled (features, label) pairs for the given indices
+
+    `cache` is a file prefix for tf.data's on-disk cache, '' for an in-memory
+    cache, or None to featurize on every pass. `augment` (ClipSource only)
+    featurizes a fresh random variant of each clip on every pass and is
+    incompatible with caching.
+    """
+    n_features = source.n_features
+    if augment and cache is not None:
+        raise ValueError("Augmented datasets cannot be cached")
+
+    def load(index):
+        return source.load(index)
+
+    def load_example(index, label):
+        if augment:
+            seed = tf.random.uniform((), maxval=2 ** 31 - 1, dtype=tf.int64)
+            features = tf.numpy_function(source.load_augmented, [index, seed], tf.float32)
+        else:
+            features = tf.numpy_function(load, [index], tf.float32)
+        features.set_shape((n_features,))
+        return features, label
+
+    dataset = tf.data.Dataset.from_tensor_slices((indices.astype(np.int64), labels[indices].astype(np.float32)))
+    dataset = dataset.map(load_example, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    if cache is not None:
+        if cache:
+            os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+        dataset = dataset.cache(cache)
+    return dataset
+
+
+def fit_scaler_streaming(scaler, dataset: tf.data.Dataset, batch_size: int = 1024):
+    """
+    Fit a StandardScaler with partial_fit over a (features, label) dataset
+    """
+    for features, _ in dataset.batch(batch_size).as_numpy_iterator():
+        scaler.partial_fit(features)
+    return scaler
+
+
+def train_streaming(classifier, source, validation_split: float = 0.2, epochs: int = 100,
+                    batch_size: int = 32, shuffle_buffer: int = 10000, cache_dir: Optional[str] = None,
+                    seed: int = 42, augment: bool = False):
+    """
+    Train `classifier` from a ClipSource or FeatureArraySource without loading X
+    """
+    label_names = np.array(source.label_names())
+    labels = classifier.label_encoder.fit_transform(label_names)
+    train_idx, val_idx = split_indices(labels, validation_split, seed)
+    classifier.validation_indices = val_idx
+
+    print(f"Training set size: {len(train_idx)}")
+    print(f"Validation set size: {len(val_idx)}")
+    print(f"Feature dimensions: {source.n_features}")
+
+    train_cache = os.path.join(cache_dir, 'train') if cache_dir else ''
+    val_cache = os.path.join(cache_dir, 'val') if cache_dir else ''
+    train_raw = make_feature_dataset(source, train_idx, labels, train_cache)
+    val_raw = make_feature_dataset(source, val_idx, labels, val_cache)
+
+    # One streaming pass over the training examples fits the scaler and fills the cache
+    print("Computing scaler statistics...")
+    classifier.scaler = type(classifier.scaler)()
+    fit_scaler_streaming(classifier.scaler, train_raw)
+    mean = tf.constant(classifier.scaler.mean_, dtype=tf.float32)
+    scale = tf.constant(classifier.scaler.scale_, dtype=tf.float32)
+
+    def standardize(features, label):
+        return (features - mean) / scale, label
+
+    # Augmented training re-featurizes a new variant of every clip each epoch;
+    # the scaler stays fitted on the clean clips
+    train_source = make_feature_dataset(source, train_idx, labels, augment=True) if augment else train_raw
+    train_ds = (train_source
+                .shuffle(min(shuffle_buffer, len(train_idx)), seed=seed, reshuffle_each_iteration=True)
+                .map(standardize, num_parallel_calls=tf.data.AUTOTUNE)
+                .batch(batch_size))
+    val_ds = (val_raw
+              .map(standardize, num_parallel_calls=tf.data.AUTOTUNE)
+              .batch(batch_size)
+              .prefetch(tf.data.AUTOTUNE))
+
+    # Prefetch through the throughput callback so it can time the wait for each batch
+    classifier.throughput = ThroughputCallback(len(train_idx))
+    train_ds = classifier.throughput.instrument(train_ds)
+
+    classifier.model = classifier.build_model(source.n_features)
+    callbacks = [
+        keras.callbacks.EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True),
+        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=10, min_lr=1e-7),
+        keras.callbacks.ModelCheckpoint(classifier.model_path, monitor='val_accuracy', save_best_only=True, verbose=1)
+    ]
+    callbacks.append(classifier.throughput)
+
+    print("Starting streaming training...")
+    history = classifier.model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks, verbose=1)
+    print(classifier.throughput.report())
+    # Keep the checkpoint's (best val_accuracy) weights, as EmergencyVoiceClassifier.train does
+    classifier.model.load_weights(classifier.model_path)
+    return history
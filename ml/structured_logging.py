@@ -0,0 +1,142 @@
+"""
+Non-blocking structured logging for the Emergency Voice API
+
+Request threads only build a LogRecord and push it onto a bounded in-memory
+queue; formatting (including %-style message interpolation) and the actual
+write happen on a background listener thread. Records are emitted as one JSON
+object per line. High-volume events can be sampled per event name so the hot
+path skips record creation entirely for the unsampled majority.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_sample_rates: Dict[str, float] = {}
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a LogRecord as a single-line JSON object
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller and defers formatting
+
+    The stock QueueHandler formats the message in the calling thread before
+    enqueueing it; here the record is passed through untouched and the
+    listener formats it. When the queue is full the record is dropped and
+    counted instead of stalling the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse "event=rate,event=rate" into a dict, e.g. "audio_processing=0.01"
+    """
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        event, rate = item.split('=', 1)
+        try:
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+def set_sample_rates(rates: Dict[str, float]):
+    _sample_rates.update(rates)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, msg: str, *args, **fields):
+    """
+    Log a structured event, subject to the event's sampling rate
+
+    `msg` is %-formatted with `args` lazily on the listener thread; keyword
+    `fields` are attached to the JSON record as-is. Events are unsampled
+    (rate 1.0) unless configured otherwise.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(event, 1.0)
+    if rate < 1.0:
+        if rate <= 0.0 or random.random() >= rate:
+            return
+        fields['sample_rate'] = rate
+    fields['event'] = event
+    logger.log(level, msg, *args, extra=fields)
+
+
+def configure_logging(level: int = logging.INFO, queue_size: int = 10000,
+                      sample_rates: Optional[Dict[str, float]] = None, stream=None):
+    """
+    Route all logging through a bounded queue to a background JSON writer
+
+    Sampling rates are taken from `sample_rates` and the LOG_SAMPLE_RATES
+    environment variable (the latter wins). Safe to call more than once.
+    """
+    global _listener
+
+    if sample_rates:
+        set_sample_rates(sample_rates)
+    set_sample_rates(parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', '')))
+
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
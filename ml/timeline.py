@@ -0,0 +1,206 @@
+"""
+Sliding-window scoring for long recordings
+
+The classifier only looks at `duration` seconds (3 s) of audio at a time.
+For long files (call recordings, hour-long captures) the file is streamed
+in blocks, resampled to the model rate with a streaming resampler, cut
+into overlapping windows every `hop_seconds`, and scored a batch of
+windows at a time (EmergencyVoiceClassifier.extract_features_batch plus
+one model call per batch). Memory stays bounded by one block, one window
+of carry-over and one batch of windows, whatever the file length.
+
+Windows classified as 'emergency' are merged into emergency segments:
+overlapping or back-to-back emergency windows become one segment. Each
+window also carries its emergency probability (the model outputs the
+probability of encoded class 1, which is 'normal'), and segment and
+recording confidences are taken from it.
+
+Usage:
+    python timeline.py recording.wav --hop 1.5 --model emergency_voice_model.evb
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+DEFAULT_HOP_SECONDS = 1.5
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_BLOCK_SECONDS = 30.0
+# A trailing remainder shorter than this is not scored as its own window
+MIN_TAIL_SECONDS = 0.5
+
+
+def _read_blocks(path: str, sample_rate: int, block_seconds: float) -> Iterator[np.ndarray]:
+    """
+    Yield mono float32 blocks of the file at sample_rate, streaming the decode
+    """
+    import soundfile as sf
+
+    try:
+        source = sf.SoundFile(path)
+    except RuntimeError:
+        # Not a soundfile format (WebM/Opus, AAC, ...): decode it whole instead
+        import librosa
+
+        audio, _ = librosa.load(path, sr=sample_rate, mono=True)
+        block = max(1, int(block_seconds * sample_rate))
+        for start in range(0, len(audio), block):
+            yield audio[start:start + block]
+        return
+
+    with source:
+        resampler = None
+        if source.samplerate != sample_rate:
+            import soxr
+
+            resampler = soxr.ResampleStream(source.samplerate, sample_rate, 1, dtype='float32', quality='HQ')
+        frames = max(1, int(block_seconds * source.samplerate))
+        while True:
+            block = source.read(frames, dtype='float32', always_2d=True)
+            last = len(block) < frames
+            block = block.mean(axis=1)
+            if resampler is not None:
+                block = resampler.resample_chunk(block, last=last)
+            if len(block):
+                yield block
+            if last:
+                return
+
+
+def iter_windows(path: str, sample_rate: int, window_seconds: float, hop_seconds: float,
+                 block_seconds: float = DEFAULT_BLOCK_SECONDS) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Yield (start_seconds, window) for overlapping windows over the whole file
+
+    The last window may be shorter than window_seconds (it is zero-padded by
+    feature extraction); a file shorter than one window yields one window.
+    """
+    window = int(round(window_seconds * sample_rate))
+    hop = max(1, int(round(hop_seconds * sample_rate)))
+    buffer = np.zeros(0, dtype=np.float32)
+    # Absolute sample index of buffer[0]; windows start at multiples of hop
+    buffer_start = 0
+    next_start = 0
+    total = 0
+    for block in _read_blocks(path, sample_rate, block_seconds):
+        buffer = np.concatenate([buffer, block])
+        total += len(block)
+        while next_start + window <= buffer_start + len(buffer):
+            offset = next_start - buffer_start
+            yield next_start / sample_rate, buffer[offset:offset + window]
+            next_start += hop
+        # Keep only what later windows still need
+        drop = min(next_start - buffer_start, len(buffer))
+        buffer = buffer[drop:]
+        buffer_start += drop
+
+    # Tail: audio past the last full window (or a file shorter than a window)
+    covered = next_start - hop + window if next_start > 0 else 0
+    if total > covered and (next_start == 0 or total - next_start >= MIN_TAIL_SECONDS * sample_rate):
+        offset = next_start - buffer_start
+        yield next_start / sample_rate, buffer[offset:]
+
+
+def merge_segments(windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge overlapping or adjacent emergency windows into segments
+    """
+    segments: List[Dict[str, Any]] = []
+    for entry in windows:
+        if entry['class_label'] != 'emergency':
+            continue
+        if segments and entry['start'] <= segments[-1]['end']:
+            segment = segments[-1]
+            segment['end'] = max(segment['end'], entry['end'])
+            segment['confidences'].append(entry['emergency_probability'])
+        else:
+            segments.append({'start': entry['start'], 'end': entry['end'],
+                             'confidences': [entry['emergency_probability']]})
+    for segment in segments:
+        confidences = segment.pop('confidences')
+        segment['windows'] = len(confidences)
+        segment['peak_confidence'] = float(max(confidences))
+        segment['mean_confidence'] = float(np.mean(confidences))
+    return segments
+
+
+def score_timeline(classifier, path: str, hop_seconds: float = DEFAULT_HOP_SECONDS,
+                   batch_size: int = DEFAULT_BATCH_SIZE, block_seconds: float = DEFAULT_BLOCK_SECONDS) -> Dict[str, Any]:
+    """
+    Score every window of a recording and return the timeline and emergency segments
+    """
+    if classifier.model is None:
+        raise ValueError("Model not loaded. Call load_model() first.")
+    start_time = time.perf_counter()
+    sample_rate = classifier.sample_rate
+    windows: List[Dict[str, Any]] = []
+    pending: List[Tuple[float, np.ndarray]] = []
+    audio_seconds = 0.0
+
+    def flush():
+        features = classifier.extract_features_batch([audio for _, audio in pending], sample_rate)
+        for (start, audio), result in zip(pending, classifier.predict_features_batch(features)):
+            windows.append({
+                'start': round(start, 3),
+                'end': round(start + len(audio) / sample_rate, 3),
+                'confidence': result['confidence'],
+                'emergency_probability': float(classifier.emergency_probability(result['confidence'])),
+                'class_label': result['class_label'],
+                'is_emergency': result['class_label'] == 'emergency',
+            })
+        pending.clear()
+
+    for start, audio in iter_windows(path, sample_rate, classifier.duration, hop_seconds, block_seconds):
+        pending.append((start, audio))
+        audio_seconds = max(audio_seconds, start + len(audio) / sample_rate)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+    elapsed = time.perf_counter() - start_time
+    segments = merge_segments(windows)
+    return {
+        'is_emergency': bool(segments),
+        'confidence': max((entry['emergency_probability'] for entry in windows), default=0.0),
+        'audio_seconds': round(audio_seconds, 3),
+        'window_seconds': classifier.duration,
+        'hop_seconds': hop_seconds,
+        'windows': windows,
+        'segments': segments,
+        'processing_seconds': elapsed,
+        'realtime_factor': audio_seconds / elapsed if elapsed > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a long recording with overlapping windows')
+    parser.add_argument('path')
+    parser.add_argument('--model', default='emergency_voice_model.evb')
+    parser.add_argument('--hop', type=float, default=DEFAULT_HOP_SECONDS, help='Seconds between window starts')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--output', default=None, help='Write the full timeline as JSON')
+    args = parser.parse_args()
+
+    from emergency_voice_model import EmergencyVoiceClassifier
+
+    classifier = EmergencyVoiceClassifier(args.model)
+    classifier.load_model()
+    result = classifier.predict_timeline(args.path, hop_seconds=args.hop, batch_size=args.batch_size)
+    print(f"{result['audio_seconds']:.1f}s scored in {len(result['windows'])} windows "
+          f"({result['realtime_factor']:.1f}x real time)")
+    for segment in result['segments']:
+        print(f"  emergency {segment['start']:8.2f}s - {segment['end']:8.2f}s  "
+              f"peak {segment['peak_confidence']:.3f}, {segment['windows']} windows")
+    if not result['segments']:
+        print("  no emergency segments")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
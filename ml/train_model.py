@@ -2,77 +2,200 @@ import numpy as np
 import pandas as pd
 import librosa
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from emergency_voice_model import EmergencyVoiceClassifier
 from dataset_generator import EmergencyVoiceDatasetGenerator
+from feature_cache import FeatureCache, array_content_hash, default_cache_dir, load_cached_features
+from corpus_shards import ShardedCorpus, INDEX_FILENAME, manifest_changes
+import memory_profiling
+from memory_profiling import record_peak, merge_peaks, format_peaks
 from sklearn.metrics import classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Tuple, List
+from typing import Dict, Tuple, List, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
-def load_dataset_from_files(dataset_dir: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+# Per-process classifier used by featurization workers
+_worker_classifier = None
+
+def _init_featurize_worker(duration: Optional[float] = None):
+    global _worker_classifier
+    _worker_classifier = EmergencyVoiceClassifier()
+    if duration is not None:
+        # Prefix models (progressive.py) see only the first `duration` seconds
+        _worker_classifier.duration = duration
+
+def _featurize_file(filepath: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    Load one audio file and extract its features; returns (features, error)
+    """
+    global _worker_classifier
+    if _worker_classifier is None:
+        _init_featurize_worker()
+    try:
+        audio_data, sr = librosa.load(filepath, sr=_worker_classifier.sample_rate, duration=_worker_classifier.duration)
+        return _worker_classifier.extract_features(audio_data, sr, raise_on_error=True), None
+    except Exception as e:
+        return None, str(e)
+
+def _featurize_file_traced(filepath: str) -> Tuple[Optional[np.ndarray], Optional[str], Dict[str, int]]:
+    """
+    _featurize_file with per-stage peak memory (and the worker's peak RSS)
+    """
+    global _worker_classifier
+    if _worker_classifier is None:
+        _init_featurize_worker()
+    memory_profiling.start_tracing()
+    stats = {}
+    try:
+        with record_peak(stats, 'audio_load'):
+            audio_data, sr = librosa.load(filepath, sr=_worker_classifier.sample_rate, duration=_worker_classifier.duration)
+        timings = {}
+        with record_peak(stats, 'extract_features'):
+            feature_vector = _worker_classifier.extract_features(audio_data, sr, timings=timings, raise_on_error=True)
+        for name, entry in timings.items():
+            stats[f'extract_features.{name}'] = entry['peak_memory_bytes']
+        result = feature_vector, None
+    except Exception as e:
+        result = None, str(e)
+    peak_rss = memory_profiling.peak_rss_bytes()
+    if peak_rss is not None:
+        stats['worker_peak_rss'] = peak_rss
+    return result + (stats,)
+
+def featurize_files(filepaths: List[str], n_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                    progress_every: int = 50, memory_stats: Optional[Dict[str, int]] = None,
+                    duration: Optional[float] = None) -> Tuple[List[Optional[np.ndarray]], List[Tuple[str, str]]]:
+    """
+    Extract features for many files on a process pool
+    
+    Results are returned in the same order as `filepaths` (None where a file
+    failed), together with a list of (filepath, error) pairs. If
+    `memory_stats` is given, workers trace their allocations and the largest
+    per-stage peaks (and worker peak RSS) over all files are merged into it.
+    `duration` overrides the classifier's clip length (for prefix models).
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(filepaths) or 1))
+    if chunksize is None:
+        # A few chunks per worker balances load without per-file IPC overhead
+        chunksize = max(1, len(filepaths) // (n_workers * 4))
+    
+    worker_fn = _featurize_file if memory_stats is None else _featurize_file_traced
+    if n_workers == 1:
+        _init_featurize_worker(duration)
+        results_iter = map(worker_fn, filepaths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_featurize_worker,
+                                       initargs=(duration,))
+        results_iter = executor.map(worker_fn, filepaths, chunksize=chunksize)
+    
+    features = []
+    errors = []
+    start = time.time()
+    try:
+        for i, (filepath, result) in enumerate(zip(filepaths, results_iter)):
+            feature_vector, error = result[:2]
+            if memory_stats is not None:
+                merge_peaks(memory_stats, result[2])
+            features.append(feature_vector)
+            if error is not None:
+                errors.append((filepath, error))
+            if (i + 1) % progress_every == 0 or i + 1 == len(filepaths):
+                elapsed = time.time() - start
+                print(f"Processed {i + 1}/{len(filepaths)} files "
+                      f"({(i + 1) / elapsed if elapsed > 0 else 0:.1f} files/s, {len(errors)} errors)")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    return features, errors
+
+def list_dataset_files(dataset_dir: str) -> List[Tuple[str, str]]:
+    """
+    List (filepath, label) pairs for every WAV under dataset_dir/<label>/, sorted
+    """
+    entries = []
+    for label in ('emergency', 'normal'):
+        label_dir = os.path.join(dataset_dir, label)
+        if not os.path.exists(label_dir):
+            continue
+        label_files = sorted(f for f in os.listdir(label_dir) if f.endswith('.wav'))
+        print(f"Found {len(label_files)} {label} files")
+        entries.extend((os.path.join(label_dir, f), label) for f in label_files)
+    return entries
+
+def load_dataset_from_files(dataset_dir: str, n_workers: Optional[int] = None,
+                            use_cache: bool = True, cache_dir: Optional[str] = None,
+                            memory_stats: Optional[Dict[str, int]] = None,
+                            duration: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
     """
     Load audio dataset from files and extract features
+    
+    Files are featurized in parallel on `n_workers` processes (default: all
+    CPUs); output order is deterministic (emergency then normal, sorted by name).
+    With `use_cache`, features are reused from an on-disk cache keyed by file
+    content and feature-set version, so only new or changed files are processed.
+    With `memory_stats`, peak allocation per stage (here and in the workers)
+    is recorded into it; see memory_profiling.py. `duration` featurizes only
+    the first `duration` seconds of each file (prefix models, progressive.py).
     """
     print("Loading dataset from files...")
+    if memory_stats is not None:
+        memory_profiling.start_tracing()
     
-    # Initialize classifier for feature extraction
-    classifier = EmergencyVoiceClassifier()
+    entries = list_dataset_files(dataset_dir)
+    filepaths = [filepath for filepath, _ in entries]
+    
+    cache = None
+    if use_cache:
+        feature_classifier = EmergencyVoiceClassifier()
+        if duration is not None:
+            feature_classifier.duration = duration
+        cache = FeatureCache(cache_dir or default_cache_dir(dataset_dir), feature_classifier.get_feature_set())
+    with record_peak(memory_stats, 'cache_lookup'):
+        features, hashes = load_cached_features(filepaths, cache)
+    
+    missing = [i for i, feature_vector in enumerate(features) if feature_vector is None]
+    if cache is not None:
+        print(f"Feature cache: {len(filepaths) - len(missing)} hits, {len(missing)} to extract")
+    
+    errors = []
+    if missing:
+        extracted, errors = featurize_files([filepaths[i] for i in missing], n_workers=n_workers,
+                                            memory_stats=memory_stats, duration=duration)
+        for i, feature_vector in zip(missing, extracted):
+            features[i] = feature_vector
+            if cache is not None and feature_vector is not None:
+                cache.add(hashes[i], feature_vector)
+    if cache is not None:
+        cache.save()
     
     features_list = []
     labels_list = []
     filenames_list = []
+    for (filepath, label), feature_vector in zip(entries, features):
+        if feature_vector is None:
+            continue
+        features_list.append(feature_vector)
+        labels_list.append(label)
+        filenames_list.append(os.path.basename(filepath))
     
-    # Load emergency samples
-    emergency_dir = os.path.join(dataset_dir, 'emergency')
-    if os.path.exists(emergency_dir):
-        emergency_files = [f for f in os.listdir(emergency_dir) if f.endswith('.wav')]
-        print(f"Found {len(emergency_files)} emergency files")
-        
-        for i, filename in enumerate(emergency_files):
-            try:
-                filepath = os.path.join(emergency_dir, filename)
-                audio_data, sr = librosa.load(filepath, sr=classifier.sample_rate, duration=classifier.duration)
-                features = classifier.extract_features(audio_data, sr)
-                
-                features_list.append(features)
-                labels_list.append('emergency')
-                filenames_list.append(filename)
-                
-                if (i + 1) % 50 == 0:
-                    print(f"Processed {i + 1}/{len(emergency_files)} emergency files")
-                    
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-                continue
-    
-    # Load normal samples
-    normal_dir = os.path.join(dataset_dir, 'normal')
-    if os.path.exists(normal_dir):
-        normal_files = [f for f in os.listdir(normal_dir) if f.endswith('.wav')]
-        print(f"Found {len(normal_files)} normal files")
-        
-        for i, filename in enumerate(normal_files):
-            try:
-                filepath = os.path.join(normal_dir, filename)
-                audio_data, sr = librosa.load(filepath, sr=classifier.sample_rate, duration=classifier.duration)
-                features = classifier.extract_features(audio_data, sr)
-                
-                features_list.append(features)
-                labels_list.append('normal')
-                filenames_list.append(filename)
-                
-                if (i + 1) % 50 == 0:
-                    print(f"Processed {i + 1}/{len(normal_files)} normal files")
-                    
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-                continue
+    if errors:
+        print(f"\n{len(errors)} files could not be processed:")
+        for filepath, error in errors[:20]:
+            print(f"  {filepath}: {error}")
+        if len(errors) > 20:
+            print(f"  ... and {len(errors) - 20} more")
     
     # Convert to numpy arrays
-    X = np.array(features_list)
-    y = np.array(labels_list)
+    with record_peak(memory_stats, 'assemble_arrays'):
+        X = np.array(features_list)
+        y = np.array(labels_list)
     
     print(f"\nDataset loaded successfully!")
     print(f"Total samples: {len(X)}")
@@ -82,6 +205,150 @@ def load_dataset_from_files(dataset_dir: str) -> Tuple[np.ndarray, np.ndarray, L
     
     return X, y, filenames_list
 
+# Per-process corpus used by shard featurization workers
+_worker_corpus = None
+
+def _init_shard_worker(corpus_dir: str):
+    global _worker_corpus
+    _init_featurize_worker()
+    _worker_corpus = ShardedCorpus(corpus_dir)
+
+def _featurize_shard_clips(indices: List[int]) -> List[Optional[np.ndarray]]:
+    """
+    Features for a chunk of corpus clips, None where extraction failed
+    """
+    clips = _worker_corpus.get_batch(indices)
+    features = []
+    for clip in clips:
+        try:
+            features.append(_worker_classifier.extract_features(clip, _worker_corpus.sample_rate, raise_on_error=True))
+        except Exception:
+            features.append(None)
+    return features
+
+def _featurize_shard_clips_traced(indices: List[int]) -> Tuple[List[Optional[np.ndarray]], Dict[str, int]]:
+    """
+    _featurize_shard_clips with per-stage peak memory (and the worker's peak RSS)
+    """
+    memory_profiling.start_tracing()
+    stats = {}
+    with record_peak(stats, 'shard_read'):
+        clips = _worker_corpus.get_batch(indices)
+    features = []
+    for clip in clips:
+        timings = {}
+        try:
+            with record_peak(stats, 'extract_features'):
+                features.append(_worker_classifier.extract_features(clip, _worker_corpus.sample_rate, timings=timings,
+                                                                    raise_on_error=True))
+        except Exception:
+            features.append(None)
+        for name, entry in timings.items():
+            stats[f'extract_features.{name}'] = max(stats.get(f'extract_features.{name}', 0),
+                                                    entry['peak_memory_bytes'])
+    peak_rss = memory_profiling.peak_rss_bytes()
+    if peak_rss is not None:
+        stats['worker_peak_rss'] = peak_rss
+    return features, stats
+
+def load_dataset_from_shards(corpus_dir: str, n_workers: Optional[int] = None, chunk_size: int = 64,
+                             use_cache: bool = True, cache_dir: Optional[str] = None,
+                             memory_stats: Optional[Dict[str, int]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Extract features from a corpus compacted by corpus_shards.py
+    
+    Clips are read from memory-mapped shards already at the classifier's
+    sample rate and duration, so no per-file decode or resampling happens.
+    With `use_cache`, features are reused from the same kind of on-disk
+    cache as load_dataset_from_files, keyed by each stored clip's content,
+    so only new or changed clips are featurized. `memory_stats` works as in
+    load_dataset_from_files.
+    """
+    print(f"Loading dataset from shards in {corpus_dir}...")
+    if memory_stats is not None:
+        memory_profiling.start_tracing()
+    corpus = ShardedCorpus(corpus_dir)
+    classifier = EmergencyVoiceClassifier()
+    if corpus.sample_rate != classifier.sample_rate or corpus.length != int(classifier.sample_rate * classifier.duration):
+        raise ValueError(f"Corpus was compacted at {corpus.sample_rate}Hz/{corpus.duration}s, "
+                         f"classifier expects {classifier.sample_rate}Hz/{classifier.duration}s")
+    
+    cache = None
+    features_list: List[Optional[np.ndarray]] = [None] * len(corpus)
+    with record_peak(memory_stats, 'cache_lookup'):
+        if use_cache:
+            cache = FeatureCache(cache_dir or default_cache_dir(corpus_dir), classifier.get_feature_set())
+            hashes = [array_content_hash(corpus.raw_clip(i)) for i in range(len(corpus))]
+            found, missing = cache.lookup(hashes)
+            for i, feature_vector in found.items():
+                features_list[i] = feature_vector
+            print(f"Feature cache: {len(found)} hits, {len(missing)} to extract")
+        else:
+            missing = list(range(len(corpus)))
+    
+    chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+    worker_fn = _featurize_shard_clips if memory_stats is None else _featurize_shard_clips_traced
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(chunks) or 1))
+    done = 0
+    start = time.time()
+    if chunks:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_shard_worker,
+                                 initargs=(corpus_dir,)) as executor:
+            for chunk, result in zip(chunks, executor.map(worker_fn, chunks)):
+                if memory_stats is not None:
+                    result, stats = result
+                    merge_peaks(memory_stats, stats)
+                for i, feature_vector in zip(chunk, result):
+                    features_list[i] = feature_vector
+                    # Failures are never cached, so they are retried next run
+                    if cache is not None and feature_vector is not None:
+                        cache.add(hashes[i], feature_vector)
+                done += len(chunk)
+                print(f"Processed {done}/{len(missing)} clips ({done / (time.time() - start):.1f} clips/s)")
+    if cache is not None:
+        cache.save()
+    
+    kept = [i for i, feature_vector in enumerate(features_list) if feature_vector is not None]
+    if len(kept) < len(corpus):
+        failed = [corpus.clips[i]['path'] for i in range(len(corpus)) if features_list[i] is None]
+        print(f"\n{len(failed)} clips could not be featurized and are excluded:")
+        for path in failed[:20]:
+            print(f"  {path}")
+        if len(failed) > 20:
+            print(f"  ... and {len(failed) - 20} more")
+    
+    with record_peak(memory_stats, 'assemble_arrays'):
+        X = np.array([features_list[i] for i in kept])
+        y = np.array([corpus.label_name(i) for i in kept])
+    filenames_list = [os.path.basename(corpus.clips[i]['path']) for i in kept]
+    
+    print(f"\nDataset loaded successfully!")
+    print(f"Total samples: {len(X)}")
+    print(f"Emergency samples: {np.sum(y == 'emergency')}")
+    print(f"Normal samples: {np.sum(y == 'normal')}")
+    
+    return X, y, filenames_list
+
+def use_shards(shards_dir: str, dataset_dir: str) -> bool:
+    """
+    True if shards_dir holds a compacted corpus that still matches dataset_dir
+    
+    Shards are a snapshot of the dataset; when it has drifted (or the index
+    predates the manifest) the differences are printed and False returned,
+    so callers load dataset_dir directly instead.
+    """
+    if not os.path.exists(os.path.join(shards_dir, INDEX_FILENAME)):
+        return False
+    changes = manifest_changes(ShardedCorpus(shards_dir).index, dataset_dir)
+    if not changes:
+        return True
+    print(f"Warning: {shards_dir}/ is out of date with {dataset_dir}/ ({len(changes)} differences):")
+    for change in changes[:20]:
+        print(f"  {change}")
+    print(f"Loading from {dataset_dir}/ instead. Re-run "
+          f"`python corpus_shards.py {dataset_dir} {shards_dir}` to rebuild the shards.")
+    return False
+
 def plot_training_history(history):
     """
     Plot training history
@@ -185,9 +452,15 @@ def main():
     else:
         print("\nStep 1: Dataset already exists, skipping generation...")
     
-    # Step 2: Load and prepare dataset
+    # Step 2: Load and prepare dataset (from compacted shards when available)
     print("\nStep 2: Loading dataset and extracting features...")
-    X, y, filenames = load_dataset_from_files(dataset_dir)
+    # (MEMORY_PROFILING=1 reports peak allocation per stage, see memory_profiling.py)
+    memory_stats = {} if os.environ.get('MEMORY_PROFILING', '0') == '1' else None
+    shards_dir = 'dataset_shards'
+    if use_shards(shards_dir, dataset_dir):
+        X, y, filenames = load_dataset_from_shards(shards_dir, memory_stats=memory_stats)
+    else:
+        X, y, filenames = load_dataset_from_files(dataset_dir, memory_stats=memory_stats)
     
     if len(X) == 0:
         print("Error: No data loaded. Please check the dataset directory.")
@@ -198,7 +471,28 @@ def main():
     classifier = EmergencyVoiceClassifier('emergency_voice_model.h5')
     
     # Train with 80% of data, validate with 20%
-    history = classifier.train(X, y, validation_split=0.2, epochs=100)
+    # (OPTIMIZED_TRAINING=1 opts into the CPU-optimized mode, see training_perf.py)
+    if memory_stats is not None:
+        memory_profiling.start_tracing()
+    history = classifier.train(X, y, validation_split=0.2, epochs=100,
+                               optimized=os.environ.get('OPTIMIZED_TRAINING', '0') == '1')
+    if memory_stats is not None:
+        merge_peaks(memory_stats, {f'train.{name}': value for name, value in classifier.memory_profile.items()})
+        peak_rss = memory_profiling.peak_rss_bytes()
+        if peak_rss is not None:
+            memory_stats['main_peak_rss'] = peak_rss
+        print(format_peaks(memory_stats))
+    
+    # Save a single-file bundle alongside the Keras model and pickles
+    classifier.save_bundle('emergency_voice_model.evb', metadata={
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'samples': int(len(X)),
+        'epochs_run': len(history.history['loss']),
+        'final_val_accuracy': float(history.history['val_accuracy'][-1]),
+        'dataset_dir': os.path.abspath(dataset_dir),
+        # Held-out clips as <label>/<filename>; retrain_model.py gates on these
+        'validation_files': [f'{y[i]}/{filenames[i]}' for i in classifier.validation_indices]
+    })
     
     # Step 4: Plot training history
     print("\nStep 4: Plotting training history...")
@@ -233,6 +527,7 @@ def main():
     print(f"Model saved as: emergency_voice_model.h5")
     print(f"Scaler saved as: scaler.pkl")
     print(f"Label encoder saved as: label_encoder.pkl")
+    print(f"Model bundle saved as: emergency_voice_model.evb")
     print(f"Final accuracy: {accuracy:.4f}")
     print("\nYou can now use the trained model for emergency voice detection!")
 
@@ -0,0 +1,169 @@
+"""
+Text-to-speech backends and a phrase-level audio cache
+
+Dataset generation synthesizes the same few hundred (phrase, language)
+utterances over and over; only the effects applied afterwards differ per
+sample. A Synthesizer turns text into an AudioSegment, and CachedSynthesizer
+stores each base utterance once as a WAV keyed by (phrase, lang, engine),
+so repeated samples are read from disk instead of re-synthesized.
+
+Engines:
+    gtts     Google Translate TTS (network)
+    espeak   espeak-ng run locally through subprocess (offline)
+
+Cache layout:
+    <cache_dir>/<key[:2]>/<key>.wav     key = sha256 of (phrase, lang, engine id)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from typing import Dict, Optional
+
+from pydub import AudioSegment
+
+
+class Synthesizer:
+    """
+    Base class for TTS engines
+    """
+
+    name = 'base'
+
+    @property
+    def engine_id(self) -> str:
+        """
+        Identifies the engine and any settings that change its output
+        """
+        return self.name
+
+    def synthesize(self, text: str, lang: str = 'en') -> AudioSegment:
+        raise NotImplementedError
+
+
+class GTTSSynthesizer(Synthesizer):
+    """
+    gTTS backend; needs network access and ffmpeg to decode the MP3
+    """
+
+    name = 'gtts'
+
+    def __init__(self, slow: bool = False):
+        self.slow = slow
+
+    @property
+    def engine_id(self) -> str:
+        return f"gtts:slow={int(self.slow)}"
+
+    def synthesize(self, text: str, lang: str = 'en') -> AudioSegment:
+        from gtts import gTTS
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
+            tmp_path = tmp_file.name
+        try:
+            gTTS(text=text, lang=lang, slow=self.slow).save(tmp_path)
+            return AudioSegment.from_mp3(tmp_path)
+        finally:
+            os.unlink(tmp_path)
+
+
+class EspeakSynthesizer(Synthesizer):
+    """
+    espeak-ng backend; runs locally with no network access
+    """
+
+    name = 'espeak'
+
+    # Dataset language codes (gTTS style) -> espeak-ng voices
+    VOICES = {
+        'en': 'en',
+        'en-us': 'en-us',
+        'en-uk': 'en-gb',
+        'en-gb': 'en-gb',
+        'en-au': 'en-gb-x-rp',
+    }
+
+    def __init__(self, executable: Optional[str] = None, words_per_minute: int = 160, pitch: int = 50):
+        self.executable = executable or shutil.which('espeak-ng') or shutil.which('espeak')
+        if self.executable is None:
+            raise RuntimeError("espeak-ng not found; install it (e.g. apt-get install espeak-ng)")
+        self.words_per_minute = words_per_minute
+        self.pitch = pitch
+
+    @property
+    def engine_id(self) -> str:
+        return f"espeak:wpm={self.words_per_minute}:pitch={self.pitch}"
+
+    def synthesize(self, text: str, lang: str = 'en') -> AudioSegment:
+        voice = self.VOICES.get(lang, 'en')
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
+            tmp_path = tmp_file.name
+        try:
+            # Written to a file rather than --stdout so the WAV header carries the real length
+            subprocess.run(
+                [self.executable, '-v', voice, '-s', str(self.words_per_minute), '-p', str(self.pitch),
+                 '-w', tmp_path, text],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True
+            )
+            return AudioSegment.from_wav(tmp_path)
+        finally:
+            os.unlink(tmp_path)
+
+
+ENGINES: Dict[str, type] = {
+    GTTSSynthesizer.name: GTTSSynthesizer,
+    EspeakSynthesizer.name: EspeakSynthesizer,
+}
+
+
+def get_synthesizer(name: str, **kwargs) -> Synthesizer:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine '{name}' (available: {', '.join(sorted(ENGINES))})")
+    return ENGINES[name](**kwargs)
+
+
+def utterance_key(text: str, lang: str, engine_id: str) -> str:
+    encoded = json.dumps([text, lang, engine_id]).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CachedSynthesizer(Synthesizer):
+    """
+    Wraps a Synthesizer with an on-disk WAV cache of base utterances
+
+    Writes go through a unique temporary file and a rename, so several
+    generation processes can share one cache directory.
+    """
+
+    def __init__(self, synthesizer: Synthesizer, cache_dir: str):
+        self.synthesizer = synthesizer
+        self.cache_dir = cache_dir
+        self.name = synthesizer.name
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def engine_id(self) -> str:
+        return self.synthesizer.engine_id
+
+    def cache_path(self, text: str, lang: str) -> str:
+        key = utterance_key(text, lang, self.engine_id)
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def synthesize(self, text: str, lang: str = 'en') -> AudioSegment:
+        path = self.cache_path(text, lang)
+        if os.path.exists(path):
+            self.hits += 1
+            return AudioSegment.from_wav(path)
+
+        self.misses += 1
+        audio = self.synthesizer.synthesize(text, lang)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        audio.export(tmp_path, format='wav')
+        os.replace(tmp_path, path)
+        return audio